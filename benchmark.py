@@ -0,0 +1,154 @@
+"""
+Performance benchmarks for compare_ocr.py
+
+Runs the main OCR_Analyzer operations on synthetic engine outputs of
+increasing size and writes the timings as JSON, so that regressions in the
+pairwise paths are caught before release.
+
+Usage:
+    python benchmark.py results.json --sizes 1000 10000 100000 1000000
+"""
+
+from compare_ocr import OCR_Analyzer
+from helpers import find_boundaries, extract_page
+from synthetic_ocr import write_engine_pair
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+BENCHMARKS = ['init', 'compare_ocr_outputs', 'find_boundaries', 'scale_bounds',
+              'load_images', 'render_overlay']
+
+
+def time_call(function, repeat=1):
+    """
+    Time a function call, keeping the best of several runs.
+
+    Arguments:
+    function (Callable) -- function taking no arguments
+    repeat (Int) -- number of runs, default is 1
+
+    Returns:
+    (Float) -- fastest run time in seconds
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def run_size(directory, n_words, n_pages, density=0.6, disagreement=0.05,
+             iou_threshold=0.4, repeat=1, benchmarks=BENCHMARKS):
+    """
+    Run the benchmarks on one synthetic document.
+
+    Arguments:
+    directory (String) -- working directory for synthetic files
+    n_words (Int) -- number of words of the first engine
+    n_pages (Int) -- number of pages
+    density (Float) -- fraction of each line covered by boxes, default is 0.6
+    disagreement (Float) -- fraction of words that disagree, default is 0.05
+    iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+    repeat (Int) -- runs per benchmark, the fastest is kept, default is 1
+    benchmarks (List) -- names of benchmarks to run, default is all
+
+    Returns:
+    (List) -- one result record per benchmark
+    """
+
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError('Unknown benchmarks: %s' % ', '.join(sorted(unknown)))
+    images = bool({'load_images', 'render_overlay'} & set(benchmarks))
+    path_1, path_2 = write_engine_pair(directory, n_words, n_pages, density, disagreement,
+                                       images=images)
+    settings = {'n_words': n_words, 'n_pages': n_pages, 'density': density,
+                'disagreement': disagreement}
+    new_analyzer = lambda: OCR_Analyzer(path_1, path_2, 'engine_1', 'engine_2', sidecar=False)
+    ocr = new_analyzer()
+    word = ocr.words_1.word(0)[2]
+    table = extract_page(ocr.ocr_1, 1)
+
+    timings = {
+        'init': new_analyzer,
+        'compare_ocr_outputs': lambda: ocr.compare_ocr_outputs(iou_threshold=iou_threshold),
+        'find_boundaries': lambda: find_boundaries(table, word, 80),
+        'scale_bounds': lambda: (ocr.scale_bounds(0.5), ocr._plot_bounds(0, slice(None)),
+                                 ocr.reverse_scaling()),
+        'load_images': lambda: (ocr.load_images(directory), ocr.images.prefetch()),
+        'render_overlay': lambda: ocr.export_boundary_boxes(
+            [(1, word)], os.path.join(directory, 'overlays')),
+    }
+    results = []
+    for name in benchmarks:
+        if name == 'render_overlay' and not hasattr(ocr, 'images'):
+            ocr.load_images(directory)
+        results.append(dict(settings, benchmark=name,
+                            seconds=time_call(timings[name], repeat)))
+
+    return results
+
+
+def run_benchmarks(sizes, n_pages=None, density=0.6, disagreement=0.05, iou_threshold=0.4,
+                   repeat=1, benchmarks=BENCHMARKS):
+    """
+    Run the benchmarks over documents of several sizes.
+
+    Arguments:
+    sizes (List) -- numbers of words to benchmark
+    n_pages (Int) -- pages per document, default is one page per 1000 words
+    density (Float) -- fraction of each line covered by boxes, default is 0.6
+    disagreement (Float) -- fraction of words that disagree, default is 0.05
+    iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+    repeat (Int) -- runs per benchmark, the fastest is kept, default is 1
+    benchmarks (List) -- names of benchmarks to run, default is all
+
+    Returns:
+    (Dict) -- environment description and one result record per benchmark and size
+    """
+
+    results = []
+    for n_words in sizes:
+        pages = n_pages or max(n_words // 1000, 1)
+        with tempfile.TemporaryDirectory() as directory:
+            results.extend(run_size(directory, n_words, pages, density, disagreement,
+                                    iou_threshold, repeat, benchmarks))
+
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark compare_ocr on synthetic documents.')
+    parser.add_argument('output', help='path of JSON results file')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--pages', type=int, default=None)
+    parser.add_argument('--density', type=float, default=0.6)
+    parser.add_argument('--disagreement', type=float, default=0.05)
+    parser.add_argument('--iou-threshold', type=float, default=0.4)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--benchmarks', nargs='+', default=BENCHMARKS, choices=BENCHMARKS)
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.pages, args.density, args.disagreement,
+                            args.iou_threshold, args.repeat, args.benchmarks)
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=4)
+    for result in report['results']:
+        print('%-20s %9d words %10.4fs' % (result['benchmark'], result['n_words'],
+                                           result['seconds']))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
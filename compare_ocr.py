@@ -2,15 +2,28 @@
 Core class for compare_ocr.py
 """
 
-from helpers import *
-import json
-import glob
-from fuzzywuzzy import fuzz
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+from helpers import (IDENTITY_TRANSFORM, as_boxes, as_region, box_values, compose_transforms,
+                     apply_transform, overlapping_pairs, match_pairs, connected_components,
+                     compare_page, group_pages, iter_page_shards, plot_page,
+                     plot_boundary_boxes, build_legend)
+# Helpers compare_ocr has always exposed, kept importable from here.
+from helpers import iou, find_boundaries, extract_page
+from word_store import WordStore, WordIndex
+from image_store import ImageSequence, render_overlay
+from result_cache import shared_cache
+from text_scorer import default_scorer, ratio_lower_bound
+from instrumentation import NULL_STATS
+from summary import DiscrepancySummary
+import argparse
 import itertools
+import json
+import os
+import sys
+import numpy as np
 import functools
+import heapq
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 
 def catch_exception(f):
@@ -22,11 +35,102 @@ def catch_exception(f):
         try:
             return f(*args, **kwargs)
         except Exception as e:
+            if args:
+                getattr(args[0], 'stats', NULL_STATS).error(f.__name__, e)
             print('Caught exception in', f.__name__)
             print(str(e))
     return func
 
 
+def make_discrepancy(names, word_1, word_2, verbose=0, iou_score=None, ratio=None):
+    """
+    Build the output record for one pair of disagreeing words.
+
+    Arguments:
+    names (List) -- names of both ocr engines
+    word_1 (Tuple) -- (page, bounds, text) of the word from engine 1
+    word_2 (Tuple) -- (page, bounds, text) of the word from engine 2
+    verbose (Int) -- level of verbosity in output, default is 0
+    iou_score (Float) -- IoU of both boundary boxes, used when verbose is 1
+    ratio (Int) -- fuzz ratio of both words, used when verbose is 1
+
+    Returns:
+    discrepency (Dict) -- discrepancy record
+    """
+
+    discrepency = {names[0]: {'page': int(word_1[0]),
+                              'bounds': word_1[1],
+                              'text': word_1[2]},
+                   names[1]: {'page': int(word_2[0]),
+                              'bounds': word_2[1],
+                              'text': word_2[2]}}
+    if verbose == 1:
+        discrepency = {'ocr_output': discrepency,
+                       'iou_of_bounds': float(iou_score),
+                       'fuzz_ratio': int(ratio)}
+
+    return discrepency
+
+
+def compare_ocr_files(ocr_path_1, ocr_path_2, ocr_name_1, ocr_name_2,
+                      iou_threshold=0.4, verbose=0, indent=4, max_records=2**18):
+    """
+    Compare two OCR JSON files without loading either file whole.
+
+    Both files are streamed and compared one page at a time, so peak memory
+    depends on the largest page rather than the whole document. The output
+    is identical to OCR_Analyzer.compare_ocr_outputs.
+
+    Arguments:
+    ocr_path_1 (String) -- path to JSON file 1
+    ocr_path_2 (String) -- path to JSON file 2
+    ocr_name_1 (String) -- name of ocr engine 1
+    ocr_name_2 (String) -- name of ocr engine 2
+    iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+    verbose (Int) -- level of verbosity in output, default is 0
+    indent (Int) -- level of indentation in JSON output
+    max_records (Int) -- maximum number of records buffered per file
+
+    Returns:
+    (JSON) -- JSON object showing comparison between both OCR engines.
+    """
+
+    if verbose not in [0, 1]:
+        raise ValueError('Verbose level must be 0 or 1.')
+
+    names = [ocr_name_1.lower(), ocr_name_2.lower()]
+    shards_1 = iter_page_shards(ocr_path_1, max_records)
+    shards_2 = iter_page_shards(ocr_path_2, max_records)
+    shard_2 = next(shards_2, None)
+    found = []
+
+    for page, index_1, bounds_1, text_1, bits_1 in shards_1:
+        while shard_2 is not None and shard_2[0] < page:
+            shard_2 = next(shards_2, None)
+        if shard_2 is None:
+            break
+        if shard_2[0] != page:
+            continue
+        _, index_2, bounds_2, text_2, bits_2 = shard_2
+        rows, cols, scores, ratios, _ = compare_page((bounds_1, text_1, bounds_2, text_2,
+                                                      iou_threshold, verbose))
+        for n, (r, c) in enumerate(zip(rows, cols)):
+            discrepency = make_discrepancy(names,
+                                           (page, box_values(bounds_1[r].tolist(), bits_1[r]),
+                                            text_1[r]),
+                                           (page, box_values(bounds_2[c].tolist(), bits_2[c]),
+                                            text_2[c]),
+                                           verbose,
+                                           scores[n],
+                                           ratios[n] if verbose == 1 else None)
+            found.append((index_1[r], index_2[c], discrepency))
+
+    # Restore the row-major order of the original pairwise comparison.
+    found.sort(key=lambda item: item[:2])
+
+    return json.dumps([item[2] for item in found], indent=indent, sort_keys=True)
+
+
 class OCR_Analyzer:
     """
     Compare the JSON outputs of 2 different OCR engines.
@@ -48,62 +152,147 @@ class OCR_Analyzer:
     ocr_path_2 (String) -- path to JSON file 2
     ocr_name_1 (String) -- name of ocr engine 1
     ocr_path_2 (String) -- name of ocr engine 2
+    sidecar (Bool) -- read and write binary sidecars of parsed words, default is True
+    stats (Stats) -- optional instrumentation.Stats recording timings and counters
     """
 
     @catch_exception
-    def __init__(self, ocr_path_1, ocr_path_2, ocr_name_1, ocr_name_2):
-        with open(ocr_path_1) as ocr_file_1:
-            self.ocr_1 = pd.DataFrame(json.load(ocr_file_1))
-        with open(ocr_path_2) as ocr_file_2:
-            self.ocr_2 = pd.DataFrame(json.load(ocr_file_2))
-        self.ocr_1_plot = self.ocr_1.copy()
-        self.ocr_2_plot = self.ocr_2.copy()
+    def __init__(self, ocr_path_1, ocr_path_2, ocr_name_1, ocr_name_2, sidecar=True,
+                 stats=None):
+        self.stats = NULL_STATS if stats is None else stats
+        with self.stats.stage('load'):
+            self.words_1 = WordStore.open_json(ocr_path_1, sidecar)
+            self.words_2 = WordStore.open_json(ocr_path_2, sidecar)
+        self.stats.count('records_loaded', len(self.words_1) + len(self.words_2))
+        self.transform = IDENTITY_TRANSFORM
         self.ocr_name_1 = ocr_name_1.lower()
         self.ocr_name_2 = ocr_name_2.lower()
         self.image_scale = 100
         self.scale_trail = []
+        self.pair_counts = {'pairs_tested': 0, 'pairs_pruned': 0}
+        self.word_indexes = [None, None]
+        self._plot_frames = [None, None]
+
+
+    @property
+    def ocr_1(self):
+        """
+        (pd.DataFrame) -- words of engine 1
+        """
+
+        return self.words_1.frame
+
+
+    @property
+    def ocr_2(self):
+        """
+        (pd.DataFrame) -- words of engine 2
+        """
+
+        return self.words_2.frame
+
+
+    @property
+    def ocr_1_plot(self):
+        """
+        (pd.DataFrame) -- words of engine 1 with scaled boundary boxes
+        """
+
+        return self._plot_frame(0)
+
+
+    @property
+    def ocr_2_plot(self):
+        """
+        (pd.DataFrame) -- words of engine 2 with scaled boundary boxes
+        """
+
+        return self._plot_frame(1)
+
+
+    def _plot_frame(self, n):
+        """
+        Cached DataFrame view of an engine's words with the current transform applied.
+        """
+
+        words = [self.words_1, self.words_2][n]
+        if self.transform == IDENTITY_TRANSFORM:
+            return words.frame
+        if self._plot_frames[n] is None or self._plot_frames[n][0] != self.transform:
+            store = words.with_bounds(apply_transform(words.bounds, self.transform))
+            self._plot_frames[n] = (self.transform, store.frame)
+        return self._plot_frames[n][1]
+
+
+    def _plot_bounds(self, n, indices):
+        """
+        Boundary boxes of selected words with the current transform applied.
+
+        Arguments:
+        n (Int) -- engine index, 0 or 1
+        indices (np.array) -- word indices
+
+        Returns:
+        (np.array) -- (N, 4) int64 array of transformed boxes
+        """
+
+        return apply_transform([self.words_1, self.words_2][n].bounds[indices], self.transform)
 
 
     @catch_exception
-    def load_images(self, directory):
+    def load_images(self, directory, cache_bytes=512 * 2**20, scale=1.0, workers=0):
         """
         Load source images.
 
-        Images must be in .jpg format.
-            
+        Images must be in .jpg format, with file names sorting in page order.
+        Pages are decoded lazily on first access and kept in a least recently
+        used cache bounded by cache_bytes.
+
+        A scale below 1.0 decodes reduced resolution pages directly; use
+        scale_bounds with the same value so boxes line up with the images.
+            
         Arguments:
         directory (String) -- path to image directory
-        """
+        cache_bytes (Int) -- memory budget for decoded pages, default is 512MB
+        scale (Float) -- scale to decode pages at, default is 1.0
+        workers (Int) -- if set, decode as many pages as fit cache_bytes up front
+                         on this many threads
+        """
 
-        self.images = [plt.imread(image) for image in glob.glob(directory + '/*.jpg')]
+        self.images = ImageSequence.from_directory(directory, cache_bytes, scale)
         if len(self.images) == 0:
             raise IOError('No images found.')
+        if workers:
+            self.images.prefetch(workers=workers)
 
 
     @catch_exception
     def scale_bounds(self, scale=1.0):
         """
         Scale boundary box values.
-            
+
+        Scaling is held as a transform that composes with earlier calls and
+        is only applied to the boxes being plotted, so it costs nothing up
+        front and does not accumulate rounding errors.
+            
         Arguments:
         scale (Float) -- value to scale boundary boxes by.
-        """
+        """
 
         if scale == 0:
             raise ValueError('Scale value can not be zero.')
-        scale_func = lambda l: [round(i*scale) for i in l]
-        self.ocr_1_plot['bounds'] = self.ocr_1_plot['bounds'].apply(scale_func)
-        self.ocr_2_plot['bounds'] = self.ocr_2_plot['bounds'].apply(scale_func)
+        self.transform = compose_transforms(self.transform, (scale, scale, 0.0, 0.0))
+        self.scale_trail.append(scale)
 
 
     @catch_exception
     def reverse_scaling(self):
         """
         Return boundary boxes to original values.
-        """
+        """
 
-        self.ocr_1_plot['bounds'] = self.ocr_1['bounds']
-        self.ocr_2_plot['bounds'] = self.ocr_2['bounds']
+        self.transform = IDENTITY_TRANSFORM
+        self.scale_trail = []
 
 
     @catch_exception
@@ -122,6 +311,7 @@ class OCR_Analyzer:
             raise IndexError('Page does not exist.')
         im_data = self.images[page-1]
         ax = plot_page(im_data, self.image_scale)
+        import matplotlib.pyplot as plt
         plt.show()
 
         return ax
@@ -148,21 +338,7 @@ class OCR_Analyzer:
         if page > len(self.images):
             raise IndexError('Page does not exist.')
         im_data = self.images[page-1]
-        tables = [self.ocr_1_plot, self.ocr_2_plot]
-        t_names = [self.ocr_name_1, self.ocr_name_2]
-        if engine == 'both':
-            page_data_1 = extract_page(tables[0], page)
-            page_data_2 = extract_page(tables[1], page)
-            red_boxes = find_boundaries(page_data_1,word, fuzz_threshold)
-            green_boxes = find_boundaries(page_data_2, word, fuzz_threshold)
-        else:
-            if engine not in t_names:
-                raise ValueError('OCR data not detected.')
-            table = tables[t_names.index(engine)]
-            page_data = extract_page(table, page)
-            red_boxes = find_boundaries(page_data, word, fuzz_threshold)
-            t_names = [engine]
-            green_boxes = []
+        red_boxes, green_boxes, t_names = self._find_boxes(page, word, engine, fuzz_threshold)
 
         red_count, green_count = len(red_boxes), len(green_boxes)
 
@@ -173,56 +349,1251 @@ class OCR_Analyzer:
                           red_count,
                           green_count)
 
+        import matplotlib.pyplot as plt
         plt.show()
 
         return ax
 
 
     @catch_exception
-    def compare_ocr_outputs(self, iou_threshold=0.4, verbose=0, indent=4):
+    def search_word(self, page, word, engine, fuzz_threshold=100, region=None):
+        """
+        Find the scaled boundary boxes of a word on a page for one engine.
+
+        Uses a word index built on first search, so only words of plausible
+        length and spelling are scored. Matches are the same as
+        helpers.find_boundaries.
+
+        Arguments:
+        page (Int) -- page to search
+        word (String) -- word to search for
+        engine (String) -- engine to use
+        fuzz_treshold (Int) -- strictness of string matching. default is 100
+        region (Tuple) -- optional (x1, y1, x2, y2) region to search within, in
+                          the coordinates of the OCR output
+
+        Returns:
+        (List) -- list of matching boundaries
+        """
+
+        return self._plot_bounds(*self._search(page, word, engine, fuzz_threshold,
+                                               region)).tolist()
+
+
+    def _search(self, page, word, engine, fuzz_threshold, region=None):
+        """
+        Find the words on a page matching a search word for one engine.
+
+        Arguments:
+        page (Int) -- page to search
+        word (String) -- word to search for
+        engine (String) -- engine to use
+        fuzz_treshold (Int) -- strictness of string matching
+        region (Tuple) -- optional (x1, y1, x2, y2) region to search within
+
+        Returns:
+        n (Int) -- engine index, 0 or 1
+        indices (np.array) -- ascending array of matching word indices
+        """
+
+        t_names = [self.ocr_name_1, self.ocr_name_2]
+        if engine not in t_names:
+            raise ValueError('OCR data not detected.')
+        n = t_names.index(engine)
+        words = [self.words_1, self.words_2][n]
+        if self.word_indexes[n] is None:
+            self.word_indexes[n] = WordIndex(words)
+        candidates = None
+        if region is not None:
+            candidates = words.region_indices(page, region)
+        indices = self.word_indexes[n].search(page, word, fuzz_threshold, candidates)
+
+        return n, indices
+
+
+    @catch_exception
+    def find_word(self, word, engine, fuzz_threshold=100, pages=None, region=None):
+        """
+        Find the scaled boundary boxes of a word on many pages for one engine.
+
+        Arguments:
+        word (String) -- word to search for
+        engine (String) -- engine to use
+        fuzz_treshold (Int) -- strictness of string matching. default is 100
+        pages (List) -- optional page numbers to search, default is all pages
+        region (Tuple) -- optional (x1, y1, x2, y2) region to search within
+
+        Returns:
+        (Dict) -- mapping of page number to list of matching boundaries, for
+                  pages with at least one match
+        """
+
+        t_names = [self.ocr_name_1, self.ocr_name_2]
+        if engine not in t_names:
+            raise ValueError('OCR data not detected.')
+        page_index = [self.words_1, self.words_2][t_names.index(engine)].page_index
+        selected = page_index if pages is None else sorted(set(int(page) for page in pages))
+        found = {}
+        for page in selected:
+            if page not in page_index:
+                continue
+            n, indices = self._search(page, word, engine, fuzz_threshold, region)
+            if len(indices):
+                found[page] = self._plot_bounds(n, indices).tolist()
+
+        return found
+
+
+    @catch_exception
+    def find_boxes(self, page, word, engine='both', fuzz_threshold=100):
+        """
+        Find the scaled boundary boxes of a word on a page, as drawn by
+        show_boundary_boxes.
+
+        Arguments:
+        page (Int) -- page to search
+        word (String) -- word to search for
+        engine (String) -- engine to use, default is 'both'
+        fuzz_treshold (Int) -- strictness of string matching. default is 100
+
+        Returns:
+        red_boxes (List) -- boxes found by the first engine searched
+        green_boxes (List) -- boxes found by engine 2 when both are searched
+        t_names (List) -- names of the engines searched
+        """
+
+        return self._find_boxes(page, word, engine, fuzz_threshold)
+
+
+    def _find_boxes(self, page, word, engine, fuzz_threshold):
+        """
+        Find the scaled boundary boxes of a word on a page.
+
+        Arguments:
+        page (Int) -- page to search
+        word (String) -- word to search for
+        engine (String) -- engine to use, or 'both'
+        fuzz_treshold (Int) -- strictness of string matching
+
+        Returns:
+        red_boxes (List) -- boxes found by the first engine searched
+        green_boxes (List) -- boxes found by engine 2 when both are searched
+        t_names (List) -- names of the engines searched
+        """
+
+        t_names = [self.ocr_name_1, self.ocr_name_2]
+        if engine == 'both':
+            red_boxes = self.search_word(page, word, t_names[0], fuzz_threshold)
+            green_boxes = self.search_word(page, word, t_names[1], fuzz_threshold)
+        else:
+            if engine not in t_names:
+                raise ValueError('OCR data not detected.')
+            red_boxes = self.search_word(page, word, engine, fuzz_threshold)
+            t_names = [engine]
+            green_boxes = []
+
+        return red_boxes, green_boxes, t_names
+
+
+    @catch_exception
+    def export_boundary_boxes(self, queries, directory, engine='both', fuzz_threshold=100,
+                              iou_threshold=0.4, image_format='png', workers=1):
+        """
+        Write boundary box overlays of many pages to image files.
+
+        Boxes are drawn straight into the page images without matplotlib, so
+        no plotting backend is needed. Colours match show_boundary_boxes:
+        red for engine 1 and green for engine 2.
+
+        Queries are either a list of (page, word) pairs, written as
+        '<n>_page_<page>.<format>', or 'discrepancies' to draw every
+        discrepancy found by compare_ocr_outputs, written as
+        'page_<page>.<format>'.
+
+        Arguments:
+        queries (List or String) -- (page, word) pairs, or 'discrepancies'
+        directory (String) -- output directory, created if missing
+        engine (String) -- engine to use for word queries, default is 'both'
+        fuzz_treshold (Int) -- strictness of string matching. default is 100
+        iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+        image_format (String) -- 'png' or 'jpg', default is 'png'
+        workers (Int) -- number of worker processes, default is 1
+
+        Returns:
+        (List) -- paths of written images
+        """
+
+        if image_format not in ['png', 'jpg']:
+            raise ValueError('Image format must be png or jpg.')
+        os.makedirs(directory, exist_ok=True)
+        jobs = []
+
+        if queries == 'discrepancies':
+            rows, cols, _, _ = self._compare_pairs(iou_threshold, 0)
+            for page, idx_1 in group_pages(self.words_1.pages[rows]).items():
+                red = np.unique(rows[idx_1])
+                green = np.unique(cols[idx_1])
+                out_path = os.path.join(directory, 'page_%d.%s' % (page, image_format))
+                jobs.append((page,
+                             self._plot_bounds(0, red),
+                             self._plot_bounds(1, green),
+                             out_path))
+        else:
+            for n, (page, word) in enumerate(queries):
+                red_boxes, green_boxes, _ = self._find_boxes(page, word, engine,
+                                                             fuzz_threshold)
+                out_path = os.path.join(directory,
+                                        '%d_page_%d.%s' % (n, page, image_format))
+                jobs.append((page, red_boxes, green_boxes, out_path))
+
+        for page, _, _, _ in jobs:
+            if not 0 < page <= len(self.images):
+                raise IndexError('Page does not exist.')
+        jobs = [(self.images.paths[page-1], self.images.scale,
+                 np.asarray(red, dtype=np.int64).reshape(-1, 4),
+                 np.asarray(green, dtype=np.int64).reshape(-1, 4),
+                 out_path) for page, red, green, out_path in jobs]
+
+        if workers is not None and workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(render_overlay, jobs))
+        return [render_overlay(job) for job in jobs]
+
+
+    def _page_shards(self, iou_threshold, verbose, pages=None, region=None):
+        """
+        Split both engines into per-page comparison shards.
+
+        Only the selected pages are visited, and with a region only the words
+        overlapping it are looked up, through each engine's per-page index.
+
+        Arguments:
+        iou_threshold (Float) -- threshold for overlapping boxes
+        verbose (Int) -- level of verbosity in output
+        pages (List) -- optional page numbers to compare, default is all pages
+        region (Tuple) -- optional (x1, y1, x2, y2) region to compare on each page
+
+        Returns:
+        (Generator) -- yields (idx_1, idx_2, shard) for every selected page
+                       present in both engines, in ascending page order
+        """
+
+        bounds_1, text_1 = self.words_1.bounds, self.words_1.text
+        bounds_2, text_2 = self.words_2.bounds, self.words_2.text
+        pages_1, pages_2 = self.words_1.page_index, self.words_2.page_index
+        if region is not None:
+            region = as_region(region)
+        selected = pages_1 if pages is None else sorted(set(int(page) for page in pages))
+
+        for page in selected:
+            if page not in pages_1 or page not in pages_2:
+                continue
+            idx_1, idx_2 = pages_1[page], pages_2[page]
+            if region is not None:
+                idx_1 = self.words_1.region_indices(page, region)
+                idx_2 = self.words_2.region_indices(page, region)
+                if not len(idx_1) or not len(idx_2):
+                    continue
+            shard = (bounds_1[idx_1], text_1[idx_1],
+                     bounds_2[idx_2], text_2[idx_2],
+                     iou_threshold, verbose)
+            yield idx_1, idx_2, shard
+
+
+    def _compare_shard(self, shard, cache=None):
+        """
+        Compare one page shard, using cached results where available.
+
+        Arguments:
+        shard (Tuple) -- page shard from _page_shards
+        cache (ResultCache) -- optional per-page result cache
+
+        Returns:
+        (Tuple) -- (rows, cols, scores, ratios, counts) as from helpers.compare_page
+        """
+
+        if cache is None:
+            result = compare_page(shard)
+        else:
+            key = cache.key(shard)
+            cached = cache.get(key)
+            self.stats.count('cache_misses' if cached is None else 'cache_hits')
+            if cached is not None:
+                return cached + ({'pairs_tested': 0, 'pairs_pruned': 0},)
+            result = compare_page(shard)
+            cache.put(key, result[:4])
+        self._record_counts(result[4])
+
+        return result
+
+
+    def _record_counts(self, counts):
+        """
+        Add the counters and timings of one compared page to the analyzer's stats.
+
+        Arguments:
+        counts (Dict) -- counts returned by helpers.compare_page
+        """
+
+        self.stats.add_time('iou', counts['iou_seconds'])
+        self.stats.add_time('fuzz', counts['fuzz_seconds'])
+        self.stats.count('pairs_evaluated', counts['pairs_tested'])
+        self.stats.count('pairs_passing_iou', counts['pairs_overlapping'])
+
+
+    def _compare_pairs(self, iou_threshold, verbose, workers=1, cache=None, pages=None,
+                       region=None):
+        """
+        Find all overlapping word pairs with differing text.
+
+        Arguments:
+        iou_threshold (Float) -- threshold for overlapping boxes
+        verbose (Int) -- level of verbosity in output
+        workers (Int) -- number of worker processes, pages are compared serially if 1
+        cache (ResultCache) -- optional per-page result cache
+        pages (List) -- optional page numbers to compare, default is all pages
+        region (Tuple) -- optional (x1, y1, x2, y2) region to compare on each page
+
+        Returns:
+        rows (np.array) -- row indices into ocr_1, in original pairwise order
+        cols (np.array) -- row indices into ocr_2
+        scores (np.array) -- IoU value of each pair
+        ratios (np.array) -- fuzz ratio of each pair, empty when verbose is 0
+        """
+
+        shards = list(self._page_shards(iou_threshold, verbose, pages, region))
+        if workers is None or workers <= 1 or len(shards) <= 1:
+            results = [self._compare_shard(shard, cache) for _, _, shard in shards]
+        else:
+            results, keys = [None] * len(shards), [None] * len(shards)
+            if cache is not None:
+                for n, (_, _, shard) in enumerate(shards):
+                    keys[n] = cache.key(shard)
+                    cached = cache.get(keys[n])
+                    self.stats.count('cache_misses' if cached is None else 'cache_hits')
+                    if cached is not None:
+                        results[n] = cached + ({'pairs_tested': 0, 'pairs_pruned': 0},)
+            pending = [n for n, result in enumerate(results) if result is None]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, len(pending) // (4 * workers))
+                computed = executor.map(compare_page,
+                                        [shards[n][2] for n in pending],
+                                        chunksize=chunksize)
+                for n, result in zip(pending, computed):
+                    results[n] = result
+                    self._record_counts(result[4])
+                    if cache is not None:
+                        cache.put(keys[n], result[:4])
+
+        rows, cols, scores, ratios = [], [], [], []
+        self.pair_counts = {'pairs_tested': 0, 'pairs_pruned': 0}
+        for (idx_1, idx_2, _), (r, c, s, f, counts) in zip(shards, results):
+            rows.append(idx_1[r])
+            cols.append(idx_2[c])
+            scores.append(s)
+            ratios.append(f)
+            for key in self.pair_counts:
+                self.pair_counts[key] += counts[key]
+        if not shards:
+            return (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp),
+                    np.empty(0), np.empty(0, dtype=np.int64))
+
+        # Restore the row-major order of the original pairwise comparison.
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        scores, ratios = np.concatenate(scores), np.concatenate(ratios)
+        order = np.lexsort((cols, rows))
+        if verbose == 1:
+            ratios = ratios[order]
+
+        return rows[order], cols[order], scores[order], ratios
+
+
+    @catch_exception
+    def discrepancy_pairs(self, iou_threshold=0.4, verbose=0, pages=None, region=None):
+        """
+        Find the discrepancies of compare_ocr_outputs as arrays of word indices.
+
+        Arguments:
+        iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+        verbose (Int) -- 1 to also score fuzz ratios, default is 0
+        pages (List) -- optional page numbers to compare, default is all pages
+        region (Tuple) -- optional (x1, y1, x2, y2) region to compare on each page
+
+        Returns:
+        rows (np.array) -- word indices of engine 1, in compare_ocr_outputs order
+        cols (np.array) -- word indices of engine 2
+        scores (np.array) -- IoU value of each pair
+        ratios (np.array) -- fuzz ratio of each pair, empty when verbose is 0
+        """
+
+        if verbose not in [0, 1]:
+            raise ValueError('Verbose level must be 0 or 1.')
+
+        return self._compare_pairs(iou_threshold, verbose, pages=pages, region=region)
+
+
+    @catch_exception
+    def compare_ocr_outputs(self, iou_threshold=0.4, verbose=0, indent=4, workers=1,
+                            cache=None, pages=None, region=None):
         """
         Compare the outputs of both OCR engines.
 
         Uses 'Intersection over Union' algorithm to calculate similarity between
-        boundary boxes.
-            
+        boundary boxes. Boxes are only compared against boxes on the same page.
+        With a positive iou_threshold a spatial index limits the comparison to
+        intersecting boxes; the number of box pairs tested and pruned is kept
+        in the pair_counts attribute.
+
+        Pages can be compared in parallel by a pool of worker processes. The
+        output is identical to the serial comparison. With a ResultCache,
+        pages whose OCR output is unchanged since a previous run are read
+        from the cache instead of being compared again.
+
+        The comparison can be limited to a range of pages, and to the words
+        overlapping a rectangular region of each page, given in the
+        coordinates of the OCR output. Its cost then depends on the words
+        selected rather than on the whole document.
+            
         Arguments:
         iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
         verbose (Int) -- level of verbosity in output, default is 0
         indent (Int) -- level of indentation in JSON output
+        workers (Int) -- number of worker processes, default is 1
+        cache (ResultCache) -- optional per-page result cache
+        pages (List) -- optional page numbers to compare, such as range(10, 13)
+        region (Tuple) -- optional (x1, y1, x2, y2) region to compare on each page
 
         Returns:
         (JSON) -- JSON object showing comparison between both OCR engines.
-        """
+        """
+
+        if verbose not in [0, 1]:
+            raise ValueError('Verbose level must be 0 or 1.')
+
+        rows, cols, scores, ratios = self._compare_pairs(iou_threshold, verbose, workers, cache,
+                                                         pages, region)
+        output = []
+        names = [self.ocr_name_1, self.ocr_name_2]
+
+        with self.stats.stage('serialize'):
+            for n, (i, j) in enumerate(zip(rows, cols)):
+                output.append(make_discrepancy(names,
+                                               self.words_1.word(i),
+                                               self.words_2.word(j),
+                                               verbose,
+                                               scores[n],
+                                               ratios[n] if verbose == 1 else None))
+            output = json.dumps(output, indent=indent, sort_keys=True)
+        self.stats.count('discrepancies', len(rows))
+
+        return output
+
+
+    @catch_exception
+    def sweep_thresholds(self, iou_thresholds, verbose=0, indent=4, outputs=True, pages=None,
+                         region=None):
+        """
+        Compare the outputs of both OCR engines at several IoU thresholds at once.
+
+        Overlapping pairs and their IoU values are computed a single time at
+        the lowest threshold, then filtered for each threshold, so a sweep
+        costs about as much as one compare_ocr_outputs call. Fuzz ratios are
+        also scored once. Each threshold's output is identical to
+        compare_ocr_outputs with that threshold.
+
+        Arguments:
+        iou_thresholds (List) -- thresholds for overlapping boxes, such as [0.1, 0.2, 0.3]
+        verbose (Int) -- level of verbosity in output, default is 0
+        indent (Int) -- level of indentation in JSON output
+        outputs (Bool) -- include the discrepancies of each threshold, default is True
+        pages (List) -- optional page numbers to compare, default is all pages
+        region (Tuple) -- optional (x1, y1, x2, y2) region to compare on each page
+
+        Returns:
+        (JSON) -- one object per threshold, in the order given, with the number
+                  of overlapping pairs, of matches with identical text and of
+                  discrepancies, and the discrepancies themselves if requested
+        """
+
+        if verbose not in [0, 1]:
+            raise ValueError('Verbose level must be 0 or 1.')
+        thresholds = [float(t) for t in iou_thresholds]
+        if not thresholds:
+            raise ValueError('At least one threshold is required.')
+
+        lowest = min(thresholds)
+        rows, cols, scores, same = [], [], [], []
+        for idx_1, idx_2, shard in self._page_shards(lowest, verbose, pages, region):
+            bounds_1, text_1, bounds_2, text_2 = shard[:4]
+            counts = {'pairs_tested': 0, 'pairs_pruned': 0}
+            with self.stats.stage('iou'):
+                r, c, s = overlapping_pairs(bounds_1, bounds_2, lowest, counts=counts)
+            self.stats.count('pairs_evaluated', counts['pairs_tested'])
+            self.stats.count('pairs_passing_iou', len(r))
+            rows.append(idx_1[r])
+            cols.append(idx_2[c])
+            scores.append(s)
+            same.append(text_1[r] == text_2[c])
+        if rows:
+            rows, cols = np.concatenate(rows), np.concatenate(cols)
+            scores, same = np.concatenate(scores), np.concatenate(same)
+            order = np.lexsort((cols, rows))
+            rows, cols, scores, same = rows[order], cols[order], scores[order], same[order]
+        else:
+            rows = cols = np.empty(0, dtype=np.intp)
+            scores, same = np.empty(0), np.empty(0, dtype=bool)
+
+        # Only pairs that are a discrepancy at some threshold are scored and serialised.
+        differ = np.flatnonzero(~same)
+        ratios = np.zeros(len(rows), dtype=np.int64)
+        if verbose == 1 and len(differ):
+            with self.stats.stage('fuzz'):
+                ratios[differ] = default_scorer.ratios(self.words_1.text[rows[differ]],
+                                                       self.words_2.text[cols[differ]])
+        names = [self.ocr_name_1, self.ocr_name_2]
+        records = {}
+        if outputs:
+            with self.stats.stage('serialize'):
+                for n in differ:
+                    records[n] = make_discrepancy(names,
+                                                  self.words_1.word(rows[n]),
+                                                  self.words_2.word(cols[n]),
+                                                  verbose,
+                                                  scores[n],
+                                                  ratios[n] if verbose == 1 else None)
+
+        sweep = []
+        for threshold in thresholds:
+            overlapping = scores >= threshold
+            result = {'iou_threshold': threshold,
+                      'pairs': int(overlapping.sum()),
+                      'matches': int((overlapping & same).sum()),
+                      'discrepancies': int((overlapping & ~same).sum())}
+            if outputs:
+                result['output'] = [records[n] for n in differ[overlapping[differ]]]
+            sweep.append(result)
+
+        with self.stats.stage('serialize'):
+            return json.dumps(sweep, indent=indent, sort_keys=True)
+
+
+    @catch_exception
+    def worst_discrepancies(self, k=50, iou_threshold=0.4, indent=4, pages=None, region=None):
+        """
+        Find the k discrepancies whose words overlap but whose text differs most.
+
+        Discrepancies are ranked by ascending fuzz ratio, then by descending
+        IoU, then in compare_ocr_outputs order. The k worst seen so far are
+        kept in a bounded heap. Pairs are visited in order of a cheap lower
+        bound on their fuzz ratio, so once the bound can no longer beat the
+        heap, the remaining pairs are skipped without being scored. The
+        number of skipped pairs is counted as 'ratios_pruned' in the
+        analyzer's stats.
+
+        Arguments:
+        k (Int) -- number of discrepancies to return, default is 50
+        iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+        indent (Int) -- level of indentation in JSON output
+        pages (List) -- optional page numbers to compare, default is all pages
+        region (Tuple) -- optional (x1, y1, x2, y2) region to compare on each page
+
+        Returns:
+        (JSON) -- up to k discrepancy records as with verbose 1, worst first
+        """
+
+        if k < 1:
+            raise ValueError('Number of discrepancies must be positive.')
+
+        rows, cols, scores, _ = self._compare_pairs(iou_threshold, 0, pages=pages, region=region)
+        text_1, text_2 = self.words_1.text, self.words_2.text
+        bounds = np.array([ratio_lower_bound(text_1[i], text_2[j]) for i, j in zip(rows, cols)],
+                          dtype=np.int64)
+        # The heap root is the least bad discrepancy kept, so keys are negated.
+        heap = []
+        scored = 0
+        with self.stats.stage('fuzz'):
+            for n in np.lexsort((cols, rows, -scores, bounds)):
+                best = (-bounds[n], scores[n], -rows[n], -cols[n])
+                if len(heap) == k and best <= heap[0][:4]:
+                    break
+                ratio = default_scorer.ratio(text_1[rows[n]], text_2[cols[n]])
+                scored += 1
+                item = (-ratio, scores[n], -rows[n], -cols[n], n)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item[:4] > heap[0][:4]:
+                    heapq.heapreplace(heap, item)
+        self.stats.count('ratios_pruned', len(rows) - scored)
+
+        names = [self.ocr_name_1, self.ocr_name_2]
+        output = [make_discrepancy(names,
+                                   self.words_1.word(rows[n]),
+                                   self.words_2.word(cols[n]),
+                                   1,
+                                   scores[n],
+                                   -negated_ratio)
+                  for negated_ratio, _, _, _, n in sorted(heap, reverse=True)]
+        self.stats.count('discrepancies', len(output))
+
+        with self.stats.stage('serialize'):
+            return json.dumps(output, indent=indent, sort_keys=True)
+
+
+    @catch_exception
+    def match_ocr_outputs(self, iou_threshold=0.4, method='greedy', verbose=0, indent=4):
+        """
+        Match words of both OCR engines one-to-one and compare the matches.
+
+        Unlike compare_ocr_outputs, each word takes part in at most one pair,
+        so a wide box overlapping several split words is reported once. Pairs
+        with IoU at or above iou_threshold form a sparse graph per page, from
+        which a matching is chosen greedily by descending IoU, or optimally
+        by maximum total IoU. Words left without a match are reported as
+        unmatched for each engine.
+
+        Arguments:
+        iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+        method (String) -- 'greedy' or 'optimal', default is 'greedy'
+        verbose (Int) -- level of verbosity in output, default is 0
+        indent (Int) -- level of indentation in JSON output
+
+        Returns:
+        (JSON) -- JSON object with the number of matched words, discrepancies
+                  between matched words and unmatched words of each engine
+        """
+
+        if verbose not in [0, 1]:
+            raise ValueError('Verbose level must be 0 or 1.')
+        if method not in ['greedy', 'optimal']:
+            raise ValueError('Matching method must be greedy or optimal.')
+
+        names = [self.ocr_name_1, self.ocr_name_2]
+        matched_1 = np.zeros(len(self.words_1), dtype=bool)
+        matched_2 = np.zeros(len(self.words_2), dtype=bool)
+        discrepancies = []
+
+        for idx_1, idx_2, shard in self._page_shards(iou_threshold, verbose):
+            bounds_1, text_1, bounds_2, text_2 = shard[:4]
+            counts = {'pairs_tested': 0, 'pairs_pruned': 0}
+            with self.stats.stage('iou'):
+                rows, cols, scores = overlapping_pairs(bounds_1, bounds_2, iou_threshold,
+                                                       counts=counts)
+                selected = match_pairs(rows, cols, scores, method)
+            self.stats.count('pairs_evaluated', counts['pairs_tested'])
+            self.stats.count('pairs_passing_iou', len(rows))
+            rows, cols, scores = rows[selected], cols[selected], scores[selected]
+            matched_1[idx_1[rows]] = True
+            matched_2[idx_2[cols]] = True
+            for r, c, iou_score in zip(rows, cols, scores):
+                if text_1[r] == text_2[c]:
+                    continue
+                ratio = default_scorer.ratio(text_1[r], text_2[c]) if verbose == 1 else None
+                discrepancies.append(make_discrepancy(names,
+                                                      self.words_1.word(idx_1[r]),
+                                                      self.words_2.word(idx_2[c]),
+                                                      verbose,
+                                                      iou_score,
+                                                      ratio))
+
+        unmatched = {}
+        for name, words, matched in [(names[0], self.words_1, matched_1),
+                                     (names[1], self.words_2, matched_2)]:
+            unmatched[name] = [dict(zip(['page', 'bounds', 'text'], words.word(i)))
+                               for i in np.flatnonzero(~matched)]
+        output = {'matched': int(matched_1.sum()),
+                  'discrepancies': discrepancies,
+                  'unmatched': unmatched}
+        self.stats.count('discrepancies', len(discrepancies))
+
+        with self.stats.stage('serialize'):
+            return json.dumps(output, indent=indent, sort_keys=True)
+
+
+    def iter_discrepancies(self, iou_threshold=0.4, verbose=0, cache=None, pages=None,
+                           region=None):
+        """
+        Generate discrepancies between both OCR engines as they are found.
+
+        Yields the same records as compare_ocr_outputs without holding them
+        all in memory. Records are produced page by page in ascending page
+        order, and in compare_ocr_outputs order within each page.
+
+        Arguments:
+        iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+        verbose (Int) -- level of verbosity in output, default is 0
+        cache (ResultCache) -- optional per-page result cache
+        pages (List) -- optional page numbers to compare, default is all pages
+        region (Tuple) -- optional (x1, y1, x2, y2) region to compare on each page
+
+        Returns:
+        (Generator) -- yields discrepancy records
+        """
+
+        # Arguments are checked on the call rather than on the first record,
+        # so callers can fail before producing any output.
+        if verbose not in [0, 1]:
+            raise ValueError('Verbose level must be 0 or 1.')
+        if region is not None:
+            region = as_region(region)
+
+        return self._iter_discrepancies(iou_threshold, verbose, cache, pages, region)
+
+
+    def _iter_discrepancies(self, iou_threshold, verbose, cache, pages, region):
+        """
+        Generate discrepancies between both OCR engines, for iter_discrepancies.
+        """
+
+        names = [self.ocr_name_1, self.ocr_name_2]
+        for idx_1, idx_2, shard in self._page_shards(iou_threshold, verbose, pages, region):
+            rows, cols, scores, ratios, _ = self._compare_shard(shard, cache)
+            self.stats.count('discrepancies', len(rows))
+            for n, (i, j) in enumerate(zip(idx_1[rows], idx_2[cols])):
+                yield make_discrepancy(names,
+                                       self.words_1.word(i),
+                                       self.words_2.word(j),
+                                       verbose,
+                                       scores[n],
+                                       ratios[n] if verbose == 1 else None)
+
+
+    @catch_exception
+    def summarize_discrepancies(self, iou_threshold=0.4, top_k=100, bins=10, cache=None,
+                                summary=None):
+        """
+        Summarise the discrepancies between both OCR engines without listing them.
+
+        Discrepancies of each page are folded into a DiscrepancySummary as
+        soon as they are found, so memory use does not grow with the number
+        of discrepancies. Pages present in only one engine count towards the
+        word totals.
+
+        Arguments:
+        iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+        top_k (Int) -- number of confusions and substitutions tracked, default is 100
+        bins (Int) -- number of histogram bins, default is 10
+        cache (ResultCache) -- optional per-page result cache
+        summary (DiscrepancySummary) -- optional summary to add to, such as one
+                                        shared by a corpus
+
+        Returns:
+        summary (DiscrepancySummary) -- the updated summary
+        """
+
+        if summary is None:
+            summary = DiscrepancySummary(top_k, bins)
+        summary.documents += 1
+        compared_1, compared_2 = 0, 0
+        for idx_1, idx_2, shard in self._page_shards(iou_threshold, 1):
+            rows, cols, scores, ratios, _ = self._compare_shard(shard, cache)
+            self.stats.count('discrepancies', len(rows))
+            summary.add_page(len(idx_1), len(idx_2), shard[1][rows], shard[3][cols],
+                             scores, ratios)
+            compared_1 += len(idx_1)
+            compared_2 += len(idx_2)
+        summary.words_1 += len(self.words_1) - compared_1
+        summary.words_2 += len(self.words_2) - compared_2
+
+        return summary
+
+
+    @catch_exception
+    def write_discrepancies(self, file, iou_threshold=0.4, verbose=0, json_lines=True,
+                            indent=4, cache=None, pages=None, region=None):
+        """
+        Stream discrepancies between both OCR engines to a file.
+
+        Records are written as they are found, either as JSON Lines (one
+        record per line) or as an incrementally written JSON array formatted
+        like compare_ocr_outputs. Output is ASCII, so the 'bytes_written'
+        counter of the analyzer's stats equals the characters written.
+
+        Arguments:
+        file (File) -- writable text file object
+        iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+        verbose (Int) -- level of verbosity in output, default is 0
+        json_lines (Bool) -- write JSON Lines rather than a JSON array, default is True
+        indent (Int) -- level of indentation in JSON array output
+        cache (ResultCache) -- optional per-page result cache
+        pages (List) -- optional page numbers to compare, default is all pages
+        region (Tuple) -- optional (x1, y1, x2, y2) region to compare on each page
+
+        Returns:
+        count (Int) -- number of discrepancies written
+        """
+
+        count = 0
+        discrepancies = self.iter_discrepancies(iou_threshold, verbose, cache, pages, region)
+        if json_lines:
+            for discrepency in discrepancies:
+                with self.stats.stage('serialize'):
+                    line = json.dumps(discrepency, sort_keys=True) + '\n'
+                    file.write(line)
+                self.stats.count('bytes_written', len(line))
+                count += 1
+            return count
+
+        file.write('[')
+        written = 1
+        prefix = '\n' + ' ' * indent if indent is not None else ''
+        separator = ',' if indent is not None else ', '
+        for discrepency in discrepancies:
+            with self.stats.stage('serialize'):
+                item = json.dumps(discrepency, indent=indent, sort_keys=True)
+                item = (separator if count else '') + prefix + item.replace('\n', prefix)
+                file.write(item)
+            written += len(item)
+            count += 1
+        file.write(('\n' if count and indent is not None else '') + ']')
+        written += 2 if count and indent is not None else 1
+        self.stats.count('bytes_written', written)
+
+        return count
+
+
+class Multi_OCR_Analyzer:
+    """
+    Compare the JSON outputs of any number of OCR engines at once.
+
+    Each engine's output is loaded once. Overlapping words of every pair of
+    engines are found in one pass per page, with a single spatial index over
+    the boxes of all engines, and are shared by the pairwise comparison and
+    the consensus vote.
+
+    Arguments:
+    ocr_paths (List) -- paths to the JSON file of each engine
+    ocr_names (List) -- names of the ocr engines
+    sidecar (Bool) -- read and write binary sidecars of parsed words, default is True
+    stats (Stats) -- optional instrumentation.Stats recording timings and counters
+    """
+
+    @catch_exception
+    def __init__(self, ocr_paths, ocr_names, sidecar=True, stats=None):
+        self.stats = NULL_STATS if stats is None else stats
+        if len(ocr_paths) != len(ocr_names):
+            raise ValueError('Each OCR file needs one engine name.')
+        if len(ocr_paths) < 2:
+            raise ValueError('At least 2 OCR engines are needed.')
+        self.ocr_names = [name.lower() for name in ocr_names]
+        if len(set(self.ocr_names)) != len(self.ocr_names):
+            raise ValueError('Engine names must be unique.')
+        with self.stats.stage('load'):
+            self.words = [WordStore.open_json(path, sidecar) for path in ocr_paths]
+        self.stats.count('records_loaded', sum(len(words) for words in self.words))
+        self._pairs = None
+
+
+    def _page_pairs(self, iou_threshold):
+        """
+        Find overlapping words of every pair of engines, page by page.
+
+        The boxes of all engines on a page are indexed together, so each page
+        is scanned once however many engines there are. Results are kept for
+        the last threshold used.
+
+        Arguments:
+        iou_threshold (Float) -- threshold for overlapping boxes
+
+        Returns:
+        (Dict) -- maps each page to (indices, engines, rows, cols, scores), where
+                  indices holds each engine's word indices on the page, and
+                  rows and cols index the page's words of all engines in turn,
+                  with engines[rows] < engines[cols]
+        """
+
+        if self._pairs is not None and self._pairs[0] == iou_threshold:
+            return self._pairs[1]
+
+        empty = np.empty(0, dtype=np.intp)
+        pages = sorted(set().union(*[words.page_index for words in self.words]))
+        found = {}
+        for page in pages:
+            indices = [words.page_index.get(page, empty) for words in self.words]
+            engines = np.repeat(np.arange(len(self.words)), [len(idx) for idx in indices])
+            bounds = np.concatenate([as_boxes(words.bounds[idx]).reshape(-1, 4)
+                                     for words, idx in zip(self.words, indices)])
+            counts = {'pairs_tested': 0, 'pairs_pruned': 0}
+            with self.stats.stage('iou'):
+                rows, cols, scores = overlapping_pairs(
+                    bounds, bounds, iou_threshold, counts=counts,
+                    pair_filter=lambda r, c: engines[r] < engines[c])
+            self.stats.count('pairs_evaluated', counts['pairs_tested'])
+            self.stats.count('pairs_passing_iou', len(rows))
+            found[page] = (indices, engines, rows, cols, scores)
+        self._pairs = (iou_threshold, found)
+
+        return found
+
+
+    @catch_exception
+    def compare_ocr_outputs(self, iou_threshold=0.4, verbose=0, indent=4):
+        """
+        Compare the outputs of every pair of OCR engines.
+
+        The discrepancies of each pair of engines match those of an
+        OCR_Analyzer built for that pair.
+
+        Arguments:
+        iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+        verbose (Int) -- level of verbosity in output, default is 0
+        indent (Int) -- level of indentation in JSON output
+
+        Returns:
+        (JSON) -- JSON object mapping '<name_1>_vs_<name_2>' to the discrepancies
+                  of that pair of engines
+        """
 
         if verbose not in [0, 1]:
             raise ValueError('Verbose level must be 0 or 1.')
 
+        engine_pairs = list(itertools.combinations(range(len(self.words)), 2))
+        empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0))
+        found = {pair: [empty] for pair in engine_pairs}
+        for page, (indices, engines, rows, cols, scores) in self._page_pairs(iou_threshold).items():
+            offsets = np.concatenate([[0], np.cumsum([len(idx) for idx in indices])])
+            for a, b in engine_pairs:
+                keep = (engines[rows] == a) & (engines[cols] == b)
+                i = indices[a][rows[keep] - offsets[a]]
+                j = indices[b][cols[keep] - offsets[b]]
+                differs = self.words[a].text[i] != self.words[b].text[j]
+                found[(a, b)].append((i[differs], j[differs], scores[keep][differs]))
+
+        output = {}
+        for a, b in engine_pairs:
+            names = [self.ocr_names[a], self.ocr_names[b]]
+            i, j, s = (np.concatenate(column) for column in zip(*found[(a, b)]))
+            # Restore the row-major order of the pairwise comparison.
+            order = np.lexsort((j, i))
+            i, j, s = i[order], j[order], s[order]
+            text_1, text_2 = self.words[a].text[i], self.words[b].text[j]
+            ratios = None
+            if verbose == 1:
+                with self.stats.stage('fuzz'):
+                    ratios = default_scorer.ratios(text_1, text_2)
+            with self.stats.stage('serialize'):
+                output['%s_vs_%s' % tuple(names)] = [
+                    make_discrepancy(names,
+                                     self.words[a].word(i[n]),
+                                     self.words[b].word(j[n]),
+                                     verbose,
+                                     s[n],
+                                     ratios[n] if verbose == 1 else None)
+                    for n in range(len(i))]
+            self.stats.count('discrepancies', len(i))
+
+        with self.stats.stage('serialize'):
+            return json.dumps(output, indent=indent, sort_keys=True)
+
+
+    @catch_exception
+    def consensus_disagreements(self, iou_threshold=0.4, indent=4):
+        """
+        Find words on which the OCR engines do not all agree, by majority vote.
+
+        Words of each pair of engines are matched one-to-one by IoU, and
+        matched words are grouped across all engines. Each engine votes with
+        the text of its words in a group, or with null if it has none. The
+        vote of more than half of the engines is the consensus, and
+        'agreement' is the number of engines voting for it; a null consensus
+        means most engines found no word there. Without a majority, the
+        consensus is null and agreement is 0. Groups on which every engine
+        agrees are left out.
+
+        Arguments:
+        iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+        indent (Int) -- level of indentation in JSON output
+
+        Returns:
+        (JSON) -- JSON list of disagreements, with the page, the consensus
+                  text, the number of engines voting for it, and the words
+                  of each engine
+        """
+
+        n_engines = len(self.words)
         output = []
+        for page, (indices, engines, rows, cols, scores) in self._page_pairs(iou_threshold).items():
+            matched = []
+            for a, b in itertools.combinations(range(n_engines), 2):
+                keep = np.flatnonzero((engines[rows] == a) & (engines[cols] == b))
+                matched.append(keep[match_pairs(rows[keep], cols[keep], scores[keep])])
+            matched = np.concatenate(matched)
+            labels = connected_components(len(engines), rows[matched], cols[matched])
+
+            offsets = np.concatenate([[0], np.cumsum([len(idx) for idx in indices])])
+            groups = {}
+            for node, label in enumerate(labels.tolist()):
+                groups.setdefault(label, []).append(node)
+            for nodes in groups.values():
+                words = {name: [] for name in self.ocr_names}
+                for node in nodes:
+                    a = int(engines[node])
+                    _, bounds, text = self.words[a].word(indices[a][node - offsets[a]])
+                    words[self.ocr_names[a]].append({'bounds': bounds, 'text': text})
+                votes = [' '.join(word['text'] for word in words[name]) if words[name] else None
+                         for name in self.ocr_names]
+                if len(set(votes)) == 1:
+                    continue
+                text, agreement = Counter(votes).most_common(1)[0]
+                if 2 * agreement <= n_engines:
+                    text, agreement = None, 0
+                output.append({'page': int(page),
+                               'consensus': text,
+                               'agreement': agreement,
+                               'words': words})
+        self.stats.count('discrepancies', len(output))
+
+        with self.stats.stage('serialize'):
+            return json.dumps(output, indent=indent, sort_keys=True)
+
+
+def compare_document(job):
+    """
+    Compare one pair of OCR files and write the discrepancies to file.
+
+    Discrepancies are written as JSON Lines, followed by a small statistics
+    file. Both are written to temporary names and renamed into place, so a
+    document only counts as done once its statistics file exists.
+
+    Arguments:
+    job (Tuple) -- (ocr_path_1, ocr_path_2, names, output_path, iou_threshold, verbose,
+                    cache_directory), cache_directory may be None
+
+    Returns:
+    stats (Dict) -- document name, word counts and number of discrepancies,
+                    or the error raised while comparing
+    """
+
+    ocr_path_1, ocr_path_2, names, output_path, iou_threshold, verbose, cache_directory = job
+    stats = {'document': os.path.basename(ocr_path_1)}
+    try:
+        cache = shared_cache(cache_directory) if cache_directory else None
+        ocr = OCR_Analyzer(ocr_path_1, ocr_path_2, names[0], names[1])
+        if not hasattr(ocr, 'words_2'):
+            raise IOError('Could not load OCR data.')
+        count = 0
+        with open(output_path + '.tmp', 'w') as output_file:
+            for discrepency in ocr.iter_discrepancies(iou_threshold, verbose, cache):
+                output_file.write(json.dumps(discrepency, sort_keys=True) + '\n')
+                count += 1
+        os.replace(output_path + '.tmp', output_path)
+        stats.update({'words_1': len(ocr.words_1),
+                      'words_2': len(ocr.words_2),
+                      'discrepancies': count})
+    except Exception as e:
+        stats['error'] = str(e)
+        return stats
+
+    stats_path = os.path.splitext(output_path)[0] + '.stats.json'
+    with open(stats_path + '.tmp', 'w') as stats_file:
+        json.dump(stats, stats_file, sort_keys=True)
+    os.replace(stats_path + '.tmp', stats_path)
+
+    return stats
+
+
+def compare_corpus(directory_1, directory_2, ocr_name_1, ocr_name_2, output_directory,
+                   iou_threshold=0.4, verbose=0, workers=1, resume=True,
+                   cache_directory=None):
+    """
+    Compare two directories of OCR JSON files, document by document.
+
+    Files are paired by name. Each document's discrepancies are written to
+    '<name>.jsonl' in output_directory, with its statistics in
+    '<name>.stats.json', and a corpus summary is written to 'summary.json'.
+    With resume, documents that already have statistics are skipped, so an
+    interrupted run continues where it stopped. With a cache directory,
+    unchanged pages are served from a ResultCache shared by all workers.
+
+    Arguments:
+    directory_1 (String) -- directory of JSON files from engine 1
+    directory_2 (String) -- directory of JSON files from engine 2
+    ocr_name_1 (String) -- name of ocr engine 1
+    ocr_name_2 (String) -- name of ocr engine 2
+    output_directory (String) -- directory for results, created if missing
+    iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+    verbose (Int) -- level of verbosity in output, default is 0
+    workers (Int) -- number of worker processes, default is 1
+    resume (Bool) -- skip documents with existing results, default is True
+    cache_directory (String) -- optional directory of a shared ResultCache
+
+    Returns:
+    summary (Dict) -- corpus totals and per document statistics
+    """
+
+    if verbose not in [0, 1]:
+        raise ValueError('Verbose level must be 0 or 1.')
+    os.makedirs(output_directory, exist_ok=True)
+    names = [ocr_name_1.lower(), ocr_name_2.lower()]
+    files_1 = {f for f in os.listdir(directory_1) if f.endswith('.json')}
+    files_2 = {f for f in os.listdir(directory_2) if f.endswith('.json')}
+
+    documents, jobs = [], []
+    for file_name in sorted(files_1 & files_2):
+        stem = os.path.splitext(file_name)[0]
+        output_path = os.path.join(output_directory, stem + '.jsonl')
+        stats_path = os.path.join(output_directory, stem + '.stats.json')
+        if resume and os.path.exists(stats_path):
+            with open(stats_path) as stats_file:
+                documents.append(json.load(stats_file))
+            continue
+        jobs.append((os.path.join(directory_1, file_name),
+                     os.path.join(directory_2, file_name),
+                     names, output_path, iou_threshold, verbose, cache_directory))
+
+    if workers is not None and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, min(16, len(jobs) // (4 * workers)))
+            documents.extend(executor.map(compare_document, jobs, chunksize=chunksize))
+    else:
+        documents.extend(compare_document(job) for job in jobs)
 
-        for t_1 in self.ocr_1.itertuples():
+    documents.sort(key=lambda stats: stats['document'])
+    completed = [stats for stats in documents if 'error' not in stats]
+    summary = {'engines': names,
+               'iou_threshold': iou_threshold,
+               'documents': len(completed),
+               'failed': [stats for stats in documents if 'error' in stats],
+               'unpaired': sorted(files_1 ^ files_2),
+               'words_1': sum(stats['words_1'] for stats in completed),
+               'words_2': sum(stats['words_2'] for stats in completed),
+               'discrepancies': sum(stats['discrepancies'] for stats in completed),
+               'per_document': completed}
+    with open(os.path.join(output_directory, 'summary.json'), 'w') as summary_file:
+        json.dump(summary, summary_file, indent=4, sort_keys=True)
 
-            for t_2 in self.ocr_2.itertuples():
+    return summary
 
-                iou_score = iou(t_1.bounds, t_2.bounds)
 
-                if t_1.page == t_2.page and iou_score >= iou_threshold and t_1.text != t_2.text:
-                    discrepency = {self.ocr_name_1: {'page': t_1.page,
-                                                     'bounds': t_1.bounds,
-                                                     'text': t_1.text},
-                                   self.ocr_name_2: {'page': t_2.page,
-                                                     'bounds': t_2.bounds,
-                                                     'text': t_2.text}}
-                    if verbose == 1:
-                        discrepency = {'ocr_output': discrepency,
-                                       'iou_of_bounds': iou_score,
-                                       'fuzz_ratio': fuzz.ratio(t_1.text,
-                                                                t_2.text)}
+def summarize_document(job):
+    """
+    Summarise the discrepancies of one pair of OCR files.
+
+    Arguments:
+    job (Tuple) -- (ocr_path_1, ocr_path_2, names, iou_threshold, top_k, bins,
+                    cache_directory), cache_directory may be None
+
+    Returns:
+    summary (DiscrepancySummary) -- summary of the document, or an empty summary
+                                    listing the document and its error if it failed
+    """
+
+    ocr_path_1, ocr_path_2, names, iou_threshold, top_k, bins, cache_directory = job
+    try:
+        cache = shared_cache(cache_directory) if cache_directory else None
+        ocr = OCR_Analyzer(ocr_path_1, ocr_path_2, names[0], names[1])
+        if not hasattr(ocr, 'words_2'):
+            raise IOError('Could not load OCR data.')
+        summary = ocr.summarize_discrepancies(iou_threshold, top_k, bins, cache)
+        if summary is None:
+            raise ValueError('Could not summarize discrepancies.')
+    except Exception as e:
+        summary = DiscrepancySummary(top_k, bins)
+        summary.failed.append({'document': os.path.basename(ocr_path_1), 'error': str(e)})
+
+    return summary
+
+
+def summarize_corpus(directory_1, directory_2, ocr_name_1, ocr_name_2, iou_threshold=0.4,
+                     top_k=100, bins=10, workers=1, cache_directory=None):
+    """
+    Summarise the discrepancies of two directories of OCR JSON files.
+
+    Files are paired by name as in compare_corpus. Document summaries are
+    merged as they complete, so memory use does not grow with the size of
+    the corpus. Documents that fail are listed in the summary's failed
+    statistics, as in compare_corpus.
+
+    Arguments:
+    directory_1 (String) -- directory of JSON files from engine 1
+    directory_2 (String) -- directory of JSON files from engine 2
+    ocr_name_1 (String) -- name of ocr engine 1
+    ocr_name_2 (String) -- name of ocr engine 2
+    iou_threshold (Float) -- threshold for overlapping boxes, default is 0.4
+    top_k (Int) -- number of confusions and substitutions tracked, default is 100
+    bins (Int) -- number of histogram bins, default is 10
+    workers (Int) -- number of worker processes, default is 1
+    cache_directory (String) -- optional directory of a shared ResultCache
+
+    Returns:
+    summary (DiscrepancySummary) -- summary of all documents compared
+    """
+
+    names = [ocr_name_1.lower(), ocr_name_2.lower()]
+    files_1 = {f for f in os.listdir(directory_1) if f.endswith('.json')}
+    files_2 = {f for f in os.listdir(directory_2) if f.endswith('.json')}
+    jobs = [(os.path.join(directory_1, file_name), os.path.join(directory_2, file_name),
+             names, iou_threshold, top_k, bins, cache_directory)
+            for file_name in sorted(files_1 & files_2)]
+
+    summary = DiscrepancySummary(top_k, bins)
+    if workers is not None and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for document in executor.map(summarize_document, jobs):
+                summary.merge(document)
+    else:
+        for job in jobs:
+            summary.merge(summarize_document(job))
+
+    return summary
+
+
+def main(argv=None):
+    """
+    Command line entry point for corpus comparison.
+
+    Arguments:
+    argv (List) -- command line arguments, default is sys.argv[1:]
+
+    Returns:
+    (Int) -- exit status, 1 if any document failed
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Compare the JSON outputs of 2 OCR engines over a corpus of documents.')
+    parser.add_argument('directory_1', help='directory of JSON files from engine 1')
+    parser.add_argument('directory_2', help='directory of JSON files from engine 2')
+    parser.add_argument('ocr_name_1', help='name of ocr engine 1')
+    parser.add_argument('ocr_name_2', help='name of ocr engine 2')
+    parser.add_argument('output_directory', help='directory for results')
+    parser.add_argument('--iou-threshold', type=float, default=0.4,
+                        help='threshold for overlapping boxes, default is 0.4')
+    parser.add_argument('--verbose', type=int, choices=[0, 1], default=0,
+                        help='level of verbosity in output, default is 0')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of worker processes, default is one per CPU')
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help='recompare documents that already have results')
+    parser.add_argument('--cache', dest='cache_directory', default=None,
+                        help='directory of a per-page result cache to reuse across runs')
+    parser.add_argument('--summarize', action='store_true',
+                        help='only write a summary of the discrepancies to discrepancy_summary.json')
+    args = parser.parse_args(argv)
 
-                    output.append(discrepency)
+    if args.summarize:
+        summary = summarize_corpus(args.directory_1, args.directory_2,
+                                   args.ocr_name_1, args.ocr_name_2,
+                                   iou_threshold=args.iou_threshold,
+                                   workers=args.workers,
+                                   cache_directory=args.cache_directory).as_dict()
+        os.makedirs(args.output_directory, exist_ok=True)
+        with open(os.path.join(args.output_directory, 'discrepancy_summary.json'), 'w') as summary_file:
+            json.dump(summary, summary_file, indent=4, sort_keys=True)
+    else:
+        summary = compare_corpus(args.directory_1, args.directory_2,
+                                 args.ocr_name_1, args.ocr_name_2,
+                                 args.output_directory,
+                                 iou_threshold=args.iou_threshold,
+                                 verbose=args.verbose,
+                                 workers=args.workers,
+                                 resume=args.resume,
+                                 cache_directory=args.cache_directory)
+    print(json.dumps({key: summary[key] for key in ['documents', 'discrepancies',
+                                                     'words_1', 'words_2']}, sort_keys=True))
+    for stats in summary['failed']:
+        print('Failed:', stats['document'], stats['error'], file=sys.stderr)
 
-        return json.dumps(output, indent=indent, sort_keys=True)
+    return 1 if summary['failed'] else 0
 
 
 if __name__ == '__main__':
-    pass
+    sys.exit(main())
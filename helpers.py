@@ -2,11 +2,14 @@
 Utility functions for compare_ocr.py
 """
 
-import pandas as pd
+import numpy as np
 import itertools
-from fuzzywuzzy import fuzz
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+import json
+import os
+import sys
+import tempfile
+import time
+from text_scorer import default_scorer
 
 
 def iou(box1, box2):
@@ -42,22 +45,760 @@ def iou(box1, box2):
     return iou
 
 
+def as_boxes(boxes):
+    """
+    Convert boundary boxes to an (N, 4) array safe for area arithmetic.
+
+    Integer coordinates are widened to int64 so box areas can not overflow.
+
+    Arguments:
+    boxes (List or np.array) -- boxes with coordinates (x1, y1, x2, y2)
+
+    Returns:
+    (np.array) -- (N, 4) array of boxes
+    """
+
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    if boxes.dtype.kind in 'iub':
+        boxes = boxes.astype(np.int64, copy=False)
+
+    return boxes
+
+
+def float_bits(box):
+    """
+    Flag the coordinates of a box that were given as floats.
+
+    Arguments:
+    box (List) -- coordinates (x1, y1, x2, y2)
+
+    Returns:
+    (Int) -- bitmask with bit n set if coordinate n is a float
+    """
+
+    return sum(1 << n for n, value in enumerate(box) if isinstance(value, float))
+
+
+def box_values(box, bits):
+    """
+    Restore the original number types of a box's coordinates.
+
+    Arguments:
+    box (List) -- coordinates (x1, y1, x2, y2)
+    bits (Int) -- bitmask from float_bits
+
+    Returns:
+    (List) -- coordinates, as ints unless flagged as floats
+    """
+
+    return [value if bits >> n & 1 else int(value) for n, value in enumerate(box)]
+
+
+IDENTITY_TRANSFORM = (1.0, 1.0, 0.0, 0.0)
+
+
+def compose_transforms(first, second):
+    """
+    Combine two box transforms into one.
+
+    A transform (scale_x, scale_y, offset_x, offset_y) maps x to
+    x * scale_x + offset_x and y to y * scale_y + offset_y.
+
+    Arguments:
+    first (Tuple) -- transform applied first
+    second (Tuple) -- transform applied second
+
+    Returns:
+    (Tuple) -- transform equal to applying first then second
+    """
+
+    sx_1, sy_1, tx_1, ty_1 = first
+    sx_2, sy_2, tx_2, ty_2 = second
+
+    return (sx_1 * sx_2, sy_1 * sy_2, tx_1 * sx_2 + tx_2, ty_1 * sy_2 + ty_2)
+
+
+def apply_transform(boxes, transform):
+    """
+    Apply a box transform, rounding to whole pixels.
+
+    The identity transform returns the boxes unchanged, so fractional
+    coordinates are only rounded once the boxes are scaled.
+
+    Arguments:
+    boxes (np.array) -- (N, 4) array of boxes with coordinates (x1, y1, x2, y2)
+    transform (Tuple) -- (scale_x, scale_y, offset_x, offset_y)
+
+    Returns:
+    (np.array) -- (N, 4) array of transformed boxes, int64 unless unscaled
+                  fractional boxes
+    """
+
+    boxes = as_boxes(boxes)
+    if tuple(transform) == IDENTITY_TRANSFORM:
+        return boxes
+    scale_x, scale_y, offset_x, offset_y = transform
+    scaled = (boxes * np.array([scale_x, scale_y, scale_x, scale_y]) +
+              np.array([offset_x, offset_y, offset_x, offset_y]))
+
+    return np.round(scaled).astype(np.int64)
+
+
+def as_region(region):
+    """
+    Normalise a rectangular region of interest.
+
+    Arguments:
+    region (Tuple) -- (x1, y1, x2, y2) corners of the region, in either order
+
+    Returns:
+    (Tuple) -- (x1, y1, x2, y2) with x1 <= x2 and y1 <= y2
+    """
+
+    if len(region) != 4:
+        raise ValueError('Region must be given as (x1, y1, x2, y2).')
+    x1, y1, x2, y2 = region
+
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+def in_region(boxes, region):
+    """
+    Find the boxes overlapping a region of interest.
+
+    Arguments:
+    boxes (np.array) -- (N, 4) array of boxes (x1, y1, x2, y2)
+    region (Tuple) -- (x1, y1, x2, y2) region, as from as_region
+
+    Returns:
+    (np.array) -- (N,) boolean mask of boxes sharing a positive area with the region
+    """
+
+    boxes = as_boxes(boxes).reshape(-1, 4)
+    x1, y1, x2, y2 = region
+
+    return (boxes[:, 0] < x2) & (boxes[:, 2] > x1) & (boxes[:, 1] < y2) & (boxes[:, 3] > y1)
+
+
+def iou_pairs(boxes_1, boxes_2):
+    """
+    Vectorized intersection over union (IoU) between corresponding boxes.
+
+    Gives the same values as iou() applied to each pair of rows. Inputs are
+    broadcast against each other, so a single box may be compared to many.
+
+    Arguments:
+    boxes_1 (np.array) -- (..., 4) array of boxes with coordinates (x1, y1, x2, y2)
+    boxes_2 (np.array) -- (..., 4) array of boxes with coordinates (x1, y1, x2, y2)
+
+    Returns:
+    (np.array) -- array of IoU values
+    """
+
+    inter_width = np.maximum(np.minimum(boxes_1[..., 2], boxes_2[..., 2]) -
+                             np.maximum(boxes_1[..., 0], boxes_2[..., 0]), 0)
+    inter_height = np.maximum(np.minimum(boxes_1[..., 3], boxes_2[..., 3]) -
+                              np.maximum(boxes_1[..., 1], boxes_2[..., 1]), 0)
+    inter_area = inter_width * inter_height
+    box1_area = (boxes_1[..., 3] - boxes_1[..., 1]) * (boxes_1[..., 2] - boxes_1[..., 0])
+    box2_area = (boxes_2[..., 3] - boxes_2[..., 1]) * (boxes_2[..., 2] - boxes_2[..., 0])
+    union_area = (box1_area + box2_area) - inter_area
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = inter_area / union_area
+
+    return iou
+
+
+def iou_matrix(boxes_1, boxes_2):
+    """
+    Vectorized intersection over union (IoU) between every pair of boxes.
+
+    Gives the same values as iou() applied to each pair, computed in a single
+    broadcasted NumPy operation.
+
+    Arguments:
+    boxes_1 (np.array) -- (N, 4) array of boxes with coordinates (x1, y1, x2, y2)
+    boxes_2 (np.array) -- (M, 4) array of boxes with coordinates (x1, y1, x2, y2)
+
+    Returns:
+    (np.array) -- (N, M) array of IoU values
+    """
+
+    return iou_pairs(as_boxes(boxes_1)[:, None, :], as_boxes(boxes_2)[None, :, :])
+
+
+def _cell_span(boxes, cell_w, cell_h):
+    """
+    Find the range of grid cells covered by each box.
+
+    Arguments:
+    boxes (np.array) -- (N, 4) array of boxes
+    cell_w (Int) -- grid cell width
+    cell_h (Int) -- grid cell height
+
+    Returns:
+    cx0, cy0 (np.array) -- column and row of each box's first cell
+    nx, ny (np.array) -- number of columns and rows of cells covered
+    """
+
+    cx0 = (boxes[:, 0] // cell_w).astype(np.int64)
+    cy0 = (boxes[:, 1] // cell_h).astype(np.int64)
+    # Boxes cover the half-open ranges [x1, x2) and [y1, y2).
+    nx = np.maximum((-(-boxes[:, 2] // cell_w)).astype(np.int64) - cx0, 1)
+    ny = np.maximum((-(-boxes[:, 3] // cell_h)).astype(np.int64) - cy0, 1)
+
+    return cx0, cy0, nx, ny
+
+
+def _grid_cells(boxes, valid, cell_w, cell_h, n_cols):
+    """
+    List the grid cells covered by each valid box.
+
+    Arguments:
+    boxes (np.array) -- (N, 4) array of boxes
+    valid (np.array) -- (N,) boolean mask of boxes to index
+    cell_w (Int) -- grid cell width
+    cell_h (Int) -- grid cell height
+    n_cols (Int) -- number of grid columns
+
+    Returns:
+    cells (np.array) -- grid cell id of each (box, cell) entry
+    owners (np.array) -- box index of each (box, cell) entry
+    """
+
+    owners = np.flatnonzero(valid)
+    cx0, cy0, nx, ny = _cell_span(boxes[owners], cell_w, cell_h)
+    counts = nx * ny
+    owner = np.repeat(np.arange(len(owners)), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cx = cx0[owner] + offset % nx[owner]
+    cy = cy0[owner] + offset // nx[owner]
+
+    return cy * n_cols + cx, owners[owner]
+
+
+def _intersects(box, boxes):
+    """
+    Mask of the boxes whose rectangles intersect one box.
+    """
+
+    return ((np.minimum(box[2], boxes[:, 2]) > np.maximum(box[0], boxes[:, 0])) &
+            (np.minimum(box[3], boxes[:, 3]) > np.maximum(box[1], boxes[:, 1])))
+
+
+def candidate_pairs(boxes_1, boxes_2, max_cells=64):
+    """
+    Find every pair of boxes whose rectangles intersect.
+
+    Boxes are bucketed into a uniform grid sized to the median box, so only
+    boxes sharing a grid cell are tested. Cost grows with the number of
+    boxes rather than the number of possible pairs. Boxes covering more than
+    max_cells cells, such as a figure or page-sized box among words, are
+    kept out of the grid and tested against every box of the other set.
+
+    Arguments:
+    boxes_1 (np.array) -- (N, 4) array of boxes with coordinates (x1, y1, x2, y2)
+    boxes_2 (np.array) -- (M, 4) array of boxes with coordinates (x1, y1, x2, y2)
+    max_cells (Int) -- maximum number of grid cells a box is added to, default is 64
+
+    Returns:
+    rows (np.array) -- indices into boxes_1, sorted
+    cols (np.array) -- indices into boxes_2, sorted within each row
+    """
+
+    boxes_1, boxes_2 = as_boxes(boxes_1), as_boxes(boxes_2)
+    # Boxes with no area can not overlap anything.
+    valid_1 = (boxes_1[:, 2] > boxes_1[:, 0]) & (boxes_1[:, 3] > boxes_1[:, 1])
+    valid_2 = (boxes_2[:, 2] > boxes_2[:, 0]) & (boxes_2[:, 3] > boxes_2[:, 1])
+    if not valid_1.any() or not valid_2.any():
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    both = np.concatenate([boxes_1[valid_1], boxes_2[valid_2]])
+    cell_w = max(int(np.median(both[:, 2] - both[:, 0])), 1)
+    cell_h = max(int(np.median(both[:, 3] - both[:, 1])), 1)
+    origin = both[:, :2].min(axis=0)
+    n_cols = int(-(-(both[:, 2].max() - origin[0]) // cell_w)) + 1
+    shift = np.array([origin[0], origin[1], origin[0], origin[1]])
+    spans = []
+    for boxes, valid in [(boxes_1, valid_1), (boxes_2, valid_2)]:
+        _, _, nx, ny = _cell_span(boxes - shift, cell_w, cell_h)
+        spans.append(valid & (nx * ny > max_cells))
+    large_1, large_2 = spans
+    cells_1, owners_1 = _grid_cells(boxes_1 - shift, valid_1 & ~large_1, cell_w, cell_h, n_cols)
+    cells_2, owners_2 = _grid_cells(boxes_2 - shift, valid_2 & ~large_2, cell_w, cell_h, n_cols)
+
+    # Join the two cell lists on cell id.
+    order = np.argsort(cells_2, kind='stable')
+    cells_2, owners_2 = cells_2[order], owners_2[order]
+    left = np.searchsorted(cells_2, cells_1, side='left')
+    counts = np.searchsorted(cells_2, cells_1, side='right') - left
+    rows = np.repeat(owners_1, counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = owners_2[np.repeat(left, counts) + offset]
+
+    # Test large boxes against every box of the other set.
+    rows, cols = [rows], [cols]
+    for i in np.flatnonzero(large_1):
+        found = np.flatnonzero(valid_2 & _intersects(boxes_1[i], boxes_2))
+        rows.append(np.full(len(found), i))
+        cols.append(found)
+    for j in np.flatnonzero(large_2):
+        found = np.flatnonzero(valid_1 & ~large_1 & _intersects(boxes_2[j], boxes_1))
+        rows.append(found)
+        cols.append(np.full(len(found), j))
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+
+    # Remove duplicates from boxes sharing several cells and keep true overlaps.
+    keys = np.unique(rows.astype(np.int64) * len(boxes_2) + cols)
+    rows, cols = keys // len(boxes_2), keys % len(boxes_2)
+    b_1, b_2 = boxes_1[rows], boxes_2[cols]
+    overlap = ((np.minimum(b_1[:, 2], b_2[:, 2]) > np.maximum(b_1[:, 0], b_2[:, 0])) &
+               (np.minimum(b_1[:, 3], b_2[:, 3]) > np.maximum(b_1[:, 1], b_2[:, 1])))
+
+    return rows[overlap].astype(np.intp), cols[overlap].astype(np.intp)
+
+
+def overlapping_pairs(bounds_1, bounds_2, iou_threshold, max_block_size=2**20,
+                      counts=None, pair_filter=None):
+    """
+    Find pairs of boxes with IoU at or above a threshold.
+
+    For a positive iou_threshold only pairs of intersecting boxes can match,
+    so candidates are found with a spatial grid index. Otherwise IoU values
+    are computed in dense row blocks of at most max_block_size pairs to cap
+    memory use.
+
+    Arguments:
+    bounds_1 (np.array) -- (N, 4) array of boundary boxes
+    bounds_2 (np.array) -- (M, 4) array of boundary boxes
+    iou_threshold (Float) -- threshold for overlapping boxes
+    max_block_size (Int) -- maximum number of box pairs evaluated at once
+    counts (Dict) -- optional counters, 'pairs_tested' and 'pairs_pruned'
+                     are incremented in place
+    pair_filter (Function) -- optional, maps (rows, cols) to a mask of pairs to keep
+
+    Returns:
+    rows (np.array) -- indices into the first set, sorted
+    cols (np.array) -- indices into the second set, sorted within each row
+    scores (np.array) -- IoU value of each pair
+    """
+
+    bounds_1, bounds_2 = as_boxes(bounds_1), as_boxes(bounds_2)
+    n_pairs = len(bounds_1) * len(bounds_2)
+
+    if iou_threshold > 0:
+        rows, cols = candidate_pairs(bounds_1, bounds_2)
+        scores = iou_pairs(bounds_1[rows], bounds_2[cols])
+        if counts is not None:
+            counts['pairs_tested'] += len(rows)
+            counts['pairs_pruned'] += n_pairs - len(rows)
+        keep = scores >= iou_threshold
+        if pair_filter is not None:
+            keep &= pair_filter(rows, cols)
+        return rows[keep], cols[keep], scores[keep]
+
+    if counts is not None:
+        counts['pairs_tested'] += n_pairs
+    rows, cols, scores = [], [], []
+    step = max(1, max_block_size // max(len(bounds_2), 1))
+    for start in range(0, len(bounds_1), step):
+        block = iou_matrix(bounds_1[start:start+step], bounds_2)
+        r, c = np.nonzero(block >= iou_threshold)
+        if pair_filter is not None:
+            keep = pair_filter(start + r, c)
+            r, c = r[keep], c[keep]
+        rows.append(start + r)
+        cols.append(c)
+        scores.append(block[r, c])
+    if not rows:
+        return (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp),
+                np.empty(0, dtype=np.float64))
+
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
+
+
+def compare_boxes(bounds_1, text_1, bounds_2, text_2, iou_threshold,
+                  max_block_size=2**20, counts=None):
+    """
+    Find overlapping boxes with differing text between two sets of words.
+
+    Arguments:
+    bounds_1 (np.array) -- (N, 4) array of boundary boxes
+    text_1 (np.array) -- (N,) array of word strings
+    bounds_2 (np.array) -- (M, 4) array of boundary boxes
+    text_2 (np.array) -- (M,) array of word strings
+    iou_threshold (Float) -- threshold for overlapping boxes
+    max_block_size (Int) -- maximum number of box pairs evaluated at once
+    counts (Dict) -- optional counters, 'pairs_tested' and 'pairs_pruned'
+                     are incremented in place
+
+    Returns:
+    rows (np.array) -- indices into the first set, sorted
+    cols (np.array) -- indices into the second set, sorted within each row
+    scores (np.array) -- IoU value of each pair
+    """
+
+    return overlapping_pairs(bounds_1, bounds_2, iou_threshold, max_block_size, counts,
+                             lambda rows, cols: text_1[rows] != text_2[cols])
+
+
+def _assignment(cost):
+    """
+    Solve a rectangular assignment problem with the Hungarian algorithm.
+
+    Arguments:
+    cost (np.array) -- (N, M) cost matrix with N <= M
+
+    Returns:
+    (List) -- assigned column of each row
+    """
+
+    n, m = cost.shape
+    cost = cost.tolist()
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    p, way = [0] * (m + 1), [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0], j0 = i, 0
+        minv, used = [float('inf')] * (m + 1), [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0, delta, j1 = p[j0], float('inf'), 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j], way[j] = cur, j0
+                    if minv[j] < delta:
+                        delta, j1 = minv[j], j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    assigned = [-1] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assigned[p[j] - 1] = j - 1
+
+    return assigned
+
+
+def match_pairs(rows, cols, scores, method='greedy'):
+    """
+    Select a one-to-one matching from a sparse graph of candidate pairs.
+
+    'greedy' takes pairs in order of descending score whenever both boxes
+    are still free. 'optimal' maximises the total score, solving each
+    connected group of overlapping boxes separately.
+
+    Arguments:
+    rows (np.array) -- first set index of each candidate pair
+    cols (np.array) -- second set index of each candidate pair
+    scores (np.array) -- score of each candidate pair
+    method (String) -- 'greedy' or 'optimal', default is 'greedy'
+
+    Returns:
+    (np.array) -- ascending positions of the selected pairs
+    """
+
+    if method not in ['greedy', 'optimal']:
+        raise ValueError('Matching method must be greedy or optimal.')
+    rows, cols, scores = np.asarray(rows), np.asarray(cols), np.asarray(scores)
+
+    if method == 'greedy':
+        used_1, used_2, selected = set(), set(), []
+        for n in np.lexsort((cols, rows, -scores)).tolist():
+            r, c = int(rows[n]), int(cols[n])
+            if r not in used_1 and c not in used_2:
+                used_1.add(r)
+                used_2.add(c)
+                selected.append(n)
+        return np.array(sorted(selected), dtype=np.intp)
+
+    # Group the bipartite graph into connected components with union-find.
+    parent = {}
+    def find(node):
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        parent[find((0, r))] = find((1, c))
+    components = {}
+    for n, r in enumerate(rows.tolist()):
+        components.setdefault(find((0, r)), []).append(n)
+
+    selected = []
+    for edges in components.values():
+        if len(edges) == 1:
+            selected.extend(edges)
+            continue
+        r_ids, r_pos = np.unique(rows[edges], return_inverse=True)
+        c_ids, c_pos = np.unique(cols[edges], return_inverse=True)
+        weight = np.zeros((len(r_ids), len(c_ids)))
+        edge_at = {}
+        for n, i, j in zip(edges, r_pos.reshape(-1).tolist(), c_pos.reshape(-1).tolist()):
+            weight[i, j] = scores[n]
+            edge_at[(i, j)] = n
+        if len(r_ids) <= len(c_ids):
+            pairs = enumerate(_assignment(-weight))
+        else:
+            pairs = ((i, j) for j, i in enumerate(_assignment(-weight.T)))
+        selected.extend(edge_at[(i, j)] for i, j in pairs if (i, j) in edge_at)
+
+    return np.array(sorted(selected), dtype=np.intp)
+
+
+def connected_components(n_nodes, rows, cols):
+    """
+    Label the connected components of an undirected graph.
+
+    Arguments:
+    n_nodes (Int) -- number of nodes
+    rows (np.array) -- first node of each edge
+    cols (np.array) -- second node of each edge
+
+    Returns:
+    (np.array) -- label of each node, the smallest node index in its component
+    """
+
+    parent = list(range(n_nodes))
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+    for r, c in zip(np.asarray(rows).tolist(), np.asarray(cols).tolist()):
+        r, c = find(r), find(c)
+        parent[max(r, c)] = min(r, c)
+
+    return np.array([find(node) for node in range(n_nodes)], dtype=np.intp)
+
+
+def compare_page(shard):
+    """
+    Compare one page shard of both OCR engines.
+
+    Takes and returns plain arrays only, so shards can be shipped cheaply to
+    worker processes.
+
+    Arguments:
+    shard (Tuple) -- (bounds_1, text_1, bounds_2, text_2, iou_threshold, verbose)
+
+    Returns:
+    rows (np.array) -- indices into the first engine's page words
+    cols (np.array) -- indices into the second engine's page words
+    scores (np.array) -- IoU value of each pair
+    ratios (np.array) -- fuzz ratio of each pair, empty when verbose is 0
+    counts (Dict) -- number of box pairs tested, pruned and overlapping, and
+                     seconds spent on IoU and fuzz scoring
+    """
+
+    bounds_1, text_1, bounds_2, text_2, iou_threshold, verbose = shard
+    counts = {'pairs_tested': 0, 'pairs_pruned': 0}
+    start = time.perf_counter()
+    rows, cols, scores = overlapping_pairs(bounds_1, bounds_2, iou_threshold, counts=counts)
+    counts['pairs_overlapping'] = len(rows)
+    keep = text_1[rows] != text_2[cols]
+    rows, cols, scores = rows[keep], cols[keep], scores[keep]
+    counts['iou_seconds'] = time.perf_counter() - start
+    ratios = np.empty(0, dtype=np.int64)
+    start = time.perf_counter()
+    if verbose == 1:
+        ratios = default_scorer.ratios(text_1[rows], text_2[cols])
+    counts['fuzz_seconds'] = time.perf_counter() - start
+
+    return rows, cols, scores, ratios, counts
+
+
+def group_pages(pages):
+    """
+    Group row indices by page number.
+
+    Arguments:
+    pages (np.array) -- page number of each row
+
+    Returns:
+    (Dict) -- mapping of page number to ascending array of row indices
+    """
+
+    pages = np.asarray(pages)
+    order = np.argsort(pages, kind='stable')
+    unique, starts = np.unique(pages[order], return_index=True)
+
+    return dict(zip(unique.tolist(), np.split(order, starts[1:])))
+
+
+def iter_json_records(file, chunk_size=2**16):
+    """
+    Parse a JSON array one record at a time.
+
+    Only one chunk of the file and the record being parsed are held in
+    memory, instead of the whole document.
+
+    Arguments:
+    file (File) -- text file object containing a JSON array
+    chunk_size (Int) -- number of characters read at a time
+
+    Returns:
+    (Generator) -- yields each element of the array
+    """
+
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    # What may come next: 'array' before '[', 'first' after it, 'value' after
+    # a comma and 'separator' after a record.
+    expect = 'array'
+
+    while True:
+        # Skip whitespace, refilling the buffer as needed.
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            chunk = file.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+        if pos == len(buffer):
+            raise ValueError('Unexpected end of JSON array.')
+        char = buffer[pos]
+        if expect == 'array':
+            if char != '[':
+                raise ValueError('Expected JSON array.')
+            expect = 'first'
+            pos += 1
+            continue
+        if char == ']' and expect != 'value':
+            return
+        if expect == 'separator':
+            if char != ',':
+                raise ValueError('Expected \',\' or \']\' after JSON array element.')
+            expect = 'value'
+            pos += 1
+            continue
+        if char in ',]':
+            raise ValueError('Expected JSON array element.')
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            # Record is split across chunks, read more before retrying.
+            if eof:
+                raise
+            chunk = file.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        if end == len(buffer) and not eof:
+            # A number may continue into the next chunk.
+            chunk = file.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        pos = end
+        expect = 'separator'
+        yield record
+
+
+def iter_page_shards(path, max_records=2**18):
+    """
+    Stream an OCR JSON file grouped into one shard per page.
+
+    Records are buffered by page. Whenever more than max_records are buffered
+    they are spilled to temporary files, so memory use is bounded by
+    max_records plus the largest page rather than the whole document.
+
+    Arguments:
+    path (String) -- path to OCR JSON file
+    max_records (Int) -- maximum number of records buffered in memory
+
+    Returns:
+    (Generator) -- yields (page, index, bounds, text, bits) in ascending page
+                   order, where index holds each record's position in the file
+                   and bits flags the coordinates given as floats
+    """
+
+    buffers, spilled, n_buffered = {}, {}, 0
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        with open(path) as ocr_file:
+            for index, record in enumerate(iter_json_records(ocr_file)):
+                buffers.setdefault(record['page'], []).append(
+                    (index, record['bounds'], record['text'], float_bits(record['bounds'])))
+                n_buffered += 1
+                if n_buffered > max_records:
+                    for page, records in buffers.items():
+                        spill_path = os.path.join(spill_dir, '%d.jsonl' % len(spilled)) \
+                            if page not in spilled else spilled[page]
+                        spilled[page] = spill_path
+                        with open(spill_path, 'a') as spill_file:
+                            for item in records:
+                                spill_file.write(json.dumps(item) + '\n')
+                    buffers, n_buffered = {}, 0
+
+        for page in sorted(set(buffers) | set(spilled)):
+            records = []
+            if page in spilled:
+                with open(spilled[page]) as spill_file:
+                    records = [tuple(json.loads(line)) for line in spill_file]
+                os.remove(spilled[page])
+            records.extend(buffers.pop(page, []))
+            index, bounds, text, bits = zip(*records)
+            yield (page,
+                   np.array(index, dtype=np.intp),
+                   as_boxes(list(bounds)),
+                   np.array(text, dtype=object),
+                   np.array(bits, dtype=np.uint8))
+
+
+def is_frame(table):
+    """
+    Check whether a table is a DataFrame, without importing pandas.
+
+    Pandas is only loaded when a DataFrame view is first requested, and no
+    DataFrame can exist before then.
+
+    Arguments:
+    table (pd.DataFrame or WordStore) -- table to check
+
+    Returns:
+    (Bool) -- True if table is a DataFrame
+    """
+
+    pd = sys.modules.get('pandas')
+
+    return pd is not None and isinstance(table, pd.DataFrame)
+
+
 def find_boundaries(table, word, fuzz_threshold):
     """
     Find the boundary boxes for a specified word.
     String match strictness can be tuned using fuzz_threshold.
-    
+    
     Arguments:
-    table (pd.DataFrame) -- table containing text field and bounds field
+    table (pd.DataFrame or WordStore) -- table containing text field and bounds field
     word (Str) -- search word
     fuzz_threshold (Int) -- accepted closeness between string values
 
     Returns:
     (List) -- list of matching boundaries
-    """
+    """
+
+    if not is_frame(table):
+        # Score each distinct string of a word store once.
+        hits = default_scorer.ratios([text.lower() for text in table.vocab],
+                                     [word]) >= fuzz_threshold
+        return table.bounds[hits[table.text_ids]].tolist() if len(hits) else []
 
-    filter = lambda x: fuzz.ratio(x.lower(), word) >= fuzz_threshold
-    boundaries = table[table['text'].apply(filter)]['bounds'].values
+    hits = default_scorer.ratios([text.lower() for text in table['text']],
+                                 [word]) >= fuzz_threshold
+    boundaries = table[hits]['bounds'].values
 
     return list(boundaries)
 
@@ -65,14 +806,17 @@ def find_boundaries(table, word, fuzz_threshold):
 def extract_page(table, page):
     """
     Filter table by page number field.
-        
+        
     Arguments:
-    table (pd.DataFrame) -- table containing "page" field
+    table (pd.DataFrame or WordStore) -- table containing "page" field
     page (Int) -- page value
 
     Returns:
-    extracted (pd.DataFrame) -- filtered table
-    """
+    extracted (pd.DataFrame or WordStore) -- filtered table
+    """
+
+    if not is_frame(table):
+        return table.take(table.page_indices(page))
 
     extracted = table[table['page'] == page]
 
@@ -91,6 +835,8 @@ def plot_page(im_data, scale):
     ax (matplotlib.axes) -- axes with image data plotted
     """
 
+    import matplotlib.pyplot as plt
+
     height, width = im_data.shape[:2]
     figsize = height/scale, width/scale
     fig = plt.figure(figsize=figsize)
@@ -114,6 +860,8 @@ def plot_boundary_boxes(ax, red_boxes, green_boxes):
     ax (matplotlib.axes) -- axes with boundary boxes plotted
     """
 
+    import matplotlib.patches as patches
+
     for r, g in itertools.zip_longest(red_boxes, green_boxes):
         if r:
             r_x, r_y, r_w, r_h = r[0], r[1], r[2]-r[0], r[3]-r[1]
@@ -147,6 +895,8 @@ def build_legend(ax, names, red_count, green_count):
     ax (matplotlib.axes) -- axes with legend plotted
     """
 
+    import matplotlib.patches as patches
+
     handles = []
     red_patch = patches.Patch(linewidth=2,
                               edgecolor='r',
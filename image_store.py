@@ -0,0 +1,244 @@
+"""
+Lazy page image loading for compare_ocr.py
+"""
+
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import os
+import threading
+import numpy as np
+
+
+def decode_image(path, scale=1.0):
+    """
+    Decode an image file, optionally at reduced resolution.
+
+    When downscaling a JPEG, the decoder's draft mode is used so that only
+    the nearest larger DCT scale (1/2, 1/4 or 1/8) is decoded before the
+    final resize; full resolution pixels are never produced.
+
+    Arguments:
+    path (String) -- path to image file
+    scale (Float) -- scale to decode the image at, default is 1.0
+
+    Returns:
+    (np.array) -- array containing image data
+    """
+
+    from PIL import Image
+
+    with Image.open(path) as image:
+        if scale != 1.0:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            if scale < 1.0:
+                image.draft(image.mode, size)
+            image = image.resize(size)
+        return np.asarray(image)
+
+
+BOX_COLOURS = {'r': (255, 0, 0), 'g': (0, 128, 0)}
+
+
+def draw_boxes(im_data, boxes, colour, linewidth=2):
+    """
+    Draw boundary box outlines directly into image data.
+
+    Arguments:
+    im_data (np.array) -- RGB image array, modified in place
+    boxes (np.array) -- (N, 4) array of box coordinates (x1, y1, x2, y2)
+    colour (String) -- box colour, 'r' or 'g'
+    linewidth (Int) -- outline width in pixels, default is 2
+
+    Returns:
+    im_data (np.array) -- image array with boxes drawn
+    """
+
+    height, width = im_data.shape[:2]
+    rgb = BOX_COLOURS[colour]
+    for x1, y1, x2, y2 in np.asarray(boxes, dtype=np.int64).reshape(-1, 4).tolist():
+        x1, x2 = max(min(x1, x2), 0), min(max(x1, x2), width - 1)
+        y1, y2 = max(min(y1, y2), 0), min(max(y1, y2), height - 1)
+        if x1 > x2 or y1 > y2:
+            continue
+        im_data[y1:min(y1+linewidth, y2+1), x1:x2+1] = rgb
+        im_data[max(y2-linewidth+1, y1):y2+1, x1:x2+1] = rgb
+        im_data[y1:y2+1, x1:min(x1+linewidth, x2+1)] = rgb
+        im_data[y1:y2+1, max(x2-linewidth+1, x1):x2+1] = rgb
+
+    return im_data
+
+
+def render_overlay(job):
+    """
+    Render boundary boxes over a page image and write it to file.
+
+    Takes only plain values and arrays, so jobs can be sent to worker
+    processes. No plotting backend is used.
+
+    Arguments:
+    job (Tuple) -- (image_path, scale, red_boxes, green_boxes, out_path)
+
+    Returns:
+    out_path (String) -- path of written image
+    """
+
+    image_path, scale, red_boxes, green_boxes, out_path = job
+    im_data = decode_image(image_path, scale)
+    if im_data.ndim == 2:
+        im_data = np.stack([im_data] * 3, axis=-1)
+    im_data = np.array(im_data[..., :3], dtype=np.uint8)
+    draw_boxes(im_data, red_boxes, 'r')
+    draw_boxes(im_data, green_boxes, 'g')
+    from PIL import Image
+
+    Image.fromarray(im_data).save(out_path)
+
+    return out_path
+
+
+class ImageSequence(Sequence):
+    """
+    Lazily decoded sequence of page images.
+
+    The sorted list of image files is recorded up front, but a page is only
+    decoded the first time it is accessed. Decoded pages are kept in a least
+    recently used cache bounded by cache_bytes; the most recent page is
+    always kept, even if it alone exceeds the budget.
+
+    Pages can be decoded at a reduced scale, and decoded in parallel on a
+    thread pool with prefetch().
+
+    Arguments:
+    paths (List) -- paths to image files, one per page in page order
+    cache_bytes (Int) -- memory budget for decoded pages, default is 512MB
+    scale (Float) -- scale to decode pages at, default is 1.0
+    """
+
+    def __init__(self, paths, cache_bytes=512 * 2**20, scale=1.0):
+        if scale <= 0:
+            raise ValueError('Scale value must be positive.')
+        self.paths = list(paths)
+        self.cache_bytes = cache_bytes
+        self.scale = scale
+        self.cached_bytes = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    @classmethod
+    def from_directory(cls, directory, cache_bytes=512 * 2**20, scale=1.0):
+        """
+        Build a sequence from the .jpg images in a directory, sorted by file name.
+
+        Arguments:
+        directory (String) -- path to image directory
+        cache_bytes (Int) -- memory budget for decoded pages
+        scale (Float) -- scale to decode pages at
+
+        Returns:
+        (ImageSequence) -- sequence of the directory's images
+        """
+
+        return cls(sorted(glob.glob(os.path.join(directory, '*.jpg'))), cache_bytes, scale)
+
+
+    def __len__(self):
+        return len(self.paths)
+
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Page does not exist.')
+
+        with self._lock:
+            if index in self._cache:
+                self._cache.move_to_end(index)
+                return self._cache[index]
+
+        return self._store(index, self.decode(self.paths[index]))
+
+
+    def _store(self, index, im_data):
+        """
+        Add a decoded page to the cache, evicting least recently used pages.
+        """
+
+        with self._lock:
+            if index in self._cache:
+                self._cache.move_to_end(index)
+                return self._cache[index]
+            self._cache[index] = im_data
+            self.cached_bytes += im_data.nbytes
+            while self.cached_bytes > self.cache_bytes and len(self._cache) > 1:
+                _, evicted = self._cache.popitem(last=False)
+                self.cached_bytes -= evicted.nbytes
+
+        return im_data
+
+
+    def prefetch(self, indices=None, workers=None):
+        """
+        Decode pages in parallel on a thread pool and add them to the cache.
+
+        Stops once the pages decoded fill the cache budget, as any further
+        page would only evict one decoded before it. The first page is
+        decoded alone to measure the size of a page.
+
+        Arguments:
+        indices (List) -- page indices to decode in order, default is all pages
+        workers (Int) -- number of decoding threads, default chosen by the executor
+
+        Returns:
+        (List) -- page indices decoded
+        """
+
+        indices = range(len(self)) if indices is None else indices
+        with self._lock:
+            missing = [i for i in indices if i not in self._cache]
+        decoded, fetched_bytes, page_bytes = [], 0, 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while missing:
+                batch = 1
+                if page_bytes:
+                    batch = min((self.cache_bytes - fetched_bytes) // page_bytes, len(missing))
+                    if batch <= 0:
+                        break
+                batch, missing = missing[:batch], missing[batch:]
+                for index, im_data in zip(batch, executor.map(self.decode,
+                                                              [self.paths[i] for i in batch])):
+                    self._store(index, im_data)
+                    decoded.append(index)
+                    fetched_bytes += im_data.nbytes
+                    page_bytes = max(page_bytes, im_data.nbytes)
+
+        return decoded
+
+
+    def decode(self, path):
+        """
+        Decode one image file at the sequence's scale.
+
+        Arguments:
+        path (String) -- path to image file
+
+        Returns:
+        (np.array) -- array containing image data
+        """
+
+        return decode_image(path, self.scale)
+
+
+    def clear_cache(self):
+        """
+        Drop all decoded pages.
+        """
+
+        with self._lock:
+            self._cache.clear()
+            self.cached_bytes = 0
@@ -0,0 +1,139 @@
+"""
+Opt-in timing and counter instrumentation for compare_ocr.py
+"""
+
+from contextlib import contextmanager, nullcontext
+import time
+
+
+class Stats:
+    """
+    Wall time per stage, counters and caught exceptions of an OCR_Analyzer.
+
+    Stages used by OCR_Analyzer are 'load', 'iou', 'fuzz' and 'serialize';
+    counters are 'records_loaded', 'pairs_evaluated', 'pairs_passing_iou',
+    'discrepancies', 'bytes_written', 'cache_hits', 'cache_misses' and
+    'ratios_pruned'.
+
+    An optional callback is called with (event, name, value) for every
+    update, where event is 'stage', 'count' or 'error'. Long running users
+    can cap the number of errors kept, in which case only the latest are
+    kept.
+
+    Arguments:
+    callback (Function) -- optional hook called on every update
+    max_errors (Int) -- optional maximum number of errors kept
+    """
+
+    enabled = True
+
+    def __init__(self, callback=None, max_errors=None):
+        self.callback = callback
+        self.max_errors = max_errors
+        self.timings = {}
+        self.counters = {}
+        self.errors = []
+
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a block of code as part of a stage.
+
+        Arguments:
+        name (String) -- stage name
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+
+    def add_time(self, name, seconds):
+        """
+        Add wall time measured elsewhere, such as in a worker process, to a stage.
+
+        Arguments:
+        name (String) -- stage name
+        seconds (Float) -- time spent in the stage
+        """
+
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+        if self.callback is not None:
+            self.callback('stage', name, seconds)
+
+
+    def count(self, name, n=1):
+        """
+        Increment a counter.
+
+        Arguments:
+        name (String) -- counter name
+        n (Int) -- amount to add, default is 1
+        """
+
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+        if self.callback is not None:
+            self.callback('count', name, int(n))
+
+
+    def error(self, name, exception):
+        """
+        Record an exception caught in a method.
+
+        Arguments:
+        name (String) -- name of the method that raised
+        exception (Exception) -- the exception raised
+        """
+
+        record = {'function': name, 'type': type(exception).__name__, 'message': str(exception)}
+        self.errors.append(record)
+        if self.max_errors is not None and len(self.errors) > self.max_errors:
+            del self.errors[:len(self.errors) - self.max_errors]
+        if self.callback is not None:
+            self.callback('error', name, exception)
+
+
+    def as_dict(self):
+        """
+        Returns:
+        (Dict) -- JSON serialisable copy of timings, counters and errors
+        """
+
+        return {'timings': dict(self.timings),
+                'counters': dict(self.counters),
+                'errors': list(self.errors)}
+
+
+    def reset(self):
+        """
+        Clear all timings, counters and errors.
+        """
+
+        self.timings, self.counters, self.errors = {}, {}, []
+
+
+class NullStats:
+    """
+    Stats stand-in used when instrumentation is disabled; every update is a no-op.
+    """
+
+    enabled = False
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def error(self, name, exception):
+        pass
+
+
+NULL_STATS = NullStats()
@@ -0,0 +1,220 @@
+"""
+Persistent per-page comparison cache for compare_ocr.py
+"""
+
+import hashlib
+import os
+import uuid
+import numpy as np
+
+
+class ResultCache:
+    """
+    On-disk cache of per-page comparison results.
+
+    Results are keyed by a hash of the page's words from both engines along
+    with the comparison settings, so a page is only recomputed when its OCR
+    output changes. The cache is bounded by max_bytes; once over budget,
+    least recently used entries are evicted until the cache is down to
+    low_water of the budget, so the directory is not rescanned on every
+    write.
+
+    Several processes may share one directory. Each only sees the others'
+    writes when it rescans the directory, which it does at least every
+    rescan_bytes of its own writes, so the limit is approximate: with N
+    writing processes the cache may exceed max_bytes by up to about
+    N * rescan_bytes.
+
+    Arguments:
+    directory (String) -- cache directory, created if missing
+    max_bytes (Int) -- size budget of the cache, default is 1GB
+    low_water (Float) -- fraction of the budget evicted down to, default is 0.9
+    rescan_bytes (Int) -- bytes written between rescans, default is a quarter
+                          of the space freed by one eviction
+    """
+
+    def __init__(self, directory, max_bytes=2**30, low_water=0.9, rescan_bytes=None):
+        if not 0 <= low_water <= 1:
+            raise ValueError('Low water mark must be between 0 and 1.')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        if rescan_bytes is None:
+            rescan_bytes = max(int(max_bytes * (1 - low_water) / 4), 1)
+        self.rescan_bytes = rescan_bytes
+        self.hits = 0
+        self.misses = 0
+        self._cached_bytes = None
+        self._written = 0
+
+
+    @property
+    def cached_bytes(self):
+        """
+        (Int) -- size of the cached entries, measured on first use
+        """
+
+        if self._cached_bytes is None:
+            self._cached_bytes = sum(size for _, size, _ in self._entries())
+        return self._cached_bytes
+
+
+    def _entries(self):
+        """
+        List the cached entries as (mtime, size, path), least recently used first.
+        """
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        return entries
+
+
+    @staticmethod
+    def key(shard):
+        """
+        Hash a page shard and its comparison settings.
+
+        Arguments:
+        shard (Tuple) -- (bounds_1, text_1, bounds_2, text_2, iou_threshold, verbose)
+
+        Returns:
+        (String) -- hex digest identifying the shard
+        """
+
+        bounds_1, text_1, bounds_2, text_2, iou_threshold, verbose = shard
+        digest = hashlib.sha256(repr((float(iou_threshold), int(verbose))).encode())
+        for bounds, text in [(bounds_1, text_1), (bounds_2, text_2)]:
+            bounds = np.asarray(bounds)
+            if bounds.dtype.kind == 'f':
+                digest.update(b'float64')
+                digest.update(np.ascontiguousarray(bounds, dtype=np.float64).tobytes())
+            else:
+                digest.update(np.ascontiguousarray(bounds, dtype=np.int64).tobytes())
+            digest.update(np.array([len(t) for t in text], dtype=np.int64).tobytes())
+            digest.update(''.join(text).encode('utf-8', 'surrogatepass'))
+
+        return digest.hexdigest()
+
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+
+    def get(self, key):
+        """
+        Look up a cached page result.
+
+        Arguments:
+        key (String) -- shard key
+
+        Returns:
+        (Tuple) -- (rows, cols, scores, ratios), or None if not cached
+        """
+
+        try:
+            with np.load(self._path(key)) as data:
+                result = (data['rows'], data['cols'], data['scores'], data['ratios'])
+            os.utime(self._path(key))
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        return result
+
+
+    def put(self, key, result):
+        """
+        Store a page result, evicting old entries over the size budget.
+
+        Arguments:
+        key (String) -- shard key
+        result (Tuple) -- (rows, cols, scores, ratios)
+        """
+
+        rows, cols, scores, ratios = result
+        temp_path = os.path.join(self.directory, '%s.%s.tmp' % (key, uuid.uuid4().hex))
+        try:
+            with open(temp_path, 'wb') as cache_file:
+                np.savez(cache_file, rows=rows, cols=cols, scores=scores, ratios=ratios)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        if self._cached_bytes is not None:
+            self._cached_bytes += size
+        self._written += size
+        if self.cached_bytes > self.max_bytes or self._written >= self.rescan_bytes:
+            self.evict()
+
+
+    def evict(self, target=None):
+        """
+        Rescan the cache, removing least recently used entries if over budget.
+
+        Arguments:
+        target (Int) -- size to evict down to, default is low_water of max_bytes
+                        once the cache is over max_bytes
+        """
+
+        entries = self._entries()
+        self._cached_bytes = sum(size for _, size, _ in entries)
+        self._written = 0
+        if target is None:
+            if self._cached_bytes <= self.max_bytes:
+                return
+            target = int(self.max_bytes * self.low_water)
+        for _, size, path in entries:
+            if self._cached_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._cached_bytes -= size
+
+
+    def clear(self):
+        """
+        Remove every cached entry.
+        """
+
+        self.evict(target=-1)
+
+
+_shared_caches = {}
+
+
+def shared_cache(directory, max_bytes=2**30):
+    """
+    Per-process ResultCache of a directory, created on first use.
+
+    Corpus workers compare many documents against the same cache, so they
+    reuse one instance instead of measuring the directory for each document.
+
+    Arguments:
+    directory (String) -- cache directory, created if missing
+    max_bytes (Int) -- size budget of the cache, default is 1GB
+
+    Returns:
+    (ResultCache) -- cache shared by every caller in this process
+    """
+
+    key = (os.path.abspath(directory), max_bytes)
+    if key not in _shared_caches:
+        _shared_caches[key] = ResultCache(directory, max_bytes)
+
+    return _shared_caches[key]
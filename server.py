@@ -0,0 +1,507 @@
+"""
+Local comparison service for compare_ocr.py
+
+Keeps analyzers, word indexes and decoded pages warm between requests, so
+a review UI can make many small queries against the same documents.
+
+Usage:
+    python server.py --port 8080
+
+Every request names its document with the query parameters ocr_1, ocr_2,
+name_1 and name_2 (paths and names of both engines), plus images, the image
+directory, and optionally scale, the scale of the images relative to the
+boundary boxes, for overlays. Endpoints:
+
+    GET /search?...&page=<n>&word=<w>[&engine=<name>][&fuzz_threshold=<t>]
+    GET /discrepancies?...&page=<n>[&iou_threshold=<t>][&verbose=<v>]
+    GET /overlay?...&images=<dir>[&scale=<s>]&page=<n>&word=<w>[&engine=<name>]
+        [&fuzz_threshold=<t>]
+    GET /status
+"""
+
+from compare_ocr import OCR_Analyzer, make_discrepancy
+from helpers import apply_transform
+from image_store import ImageSequence, draw_boxes
+from instrumentation import Stats
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import asyncio
+import io
+import json
+import sys
+import threading
+import numpy as np
+
+DOCUMENT_PARAMETERS = ['ocr_1', 'ocr_2', 'name_1', 'name_2']
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    """
+    Error reported to the client with an HTTP status code.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Document:
+    """
+    A warm OCR_Analyzer with the comparisons already run on it.
+
+    The analyzer is loaded on first use, and page images are loaded once per
+    image directory, so searches and overlays of the same files share one
+    analyzer. Word searches and comparisons are serialised by separate locks,
+    as analyzers build their word indexes lazily, so lookups do not wait for
+    a comparison. Comparisons are run per page and the latest are kept in a
+    small least recently used cache, and only the latest errors are kept in
+    the document's stats.
+
+    Arguments:
+    key (Tuple) -- (ocr_1, ocr_2, name_1, name_2)
+    max_comparisons (Int) -- maximum number of page comparisons kept, default is 64
+    """
+
+    def __init__(self, key, max_comparisons=64):
+        self.key = key
+        self.lock = threading.Lock()
+        self.search_lock = threading.Lock()
+        self.compare_lock = threading.Lock()
+        self.ocr = None
+        self.images = {}
+        self.stats = Stats(max_errors=100)
+        self.max_comparisons = max_comparisons
+        self.comparisons = OrderedDict()
+
+
+    def analyzer(self):
+        """
+        Returns:
+        (OCR_Analyzer) -- the document's analyzer, loaded on first call
+        """
+
+        with self.lock:
+            if self.ocr is None:
+                ocr = OCR_Analyzer.__new__(OCR_Analyzer)
+                self.call(ocr.__init__, *self.key, stats=self.stats)
+                self.ocr = ocr
+        return self.ocr
+
+
+    def page_images(self, directory):
+        """
+        Arguments:
+        directory (String) -- path to image directory
+
+        Returns:
+        (ImageSequence) -- page images of the directory, loaded on first call
+        """
+
+        with self.lock:
+            if directory not in self.images:
+                images = ImageSequence.from_directory(directory)
+                if len(images) == 0:
+                    raise RequestError(400, 'No images found.')
+                self.images[directory] = images
+        return self.images[directory]
+
+
+    def call(self, method, *args, **kwargs):
+        """
+        Call an analyzer method, raising its error instead of printing it.
+
+        Errors are still recorded in the document's stats, but are taken
+        from the call itself, so concurrent requests never report each
+        other's errors.
+
+        Arguments:
+        method (Function) -- bound analyzer method
+        args, kwargs -- arguments of the method
+
+        Returns:
+        (Object) -- the value returned by the method
+        """
+
+        function = getattr(method, '__wrapped__', method.__func__)
+        try:
+            return function(method.__self__, *args, **kwargs)
+        except Exception as e:
+            self.stats.error(function.__name__, e)
+            raise RequestError(400, str(e))
+
+
+    def comparison(self, iou_threshold, verbose, page):
+        """
+        Compare one page once per setting.
+
+        Arguments:
+        iou_threshold (Float) -- threshold for overlapping boxes
+        verbose (Int) -- level of verbosity in output
+        page (Int) -- page to compare
+
+        Returns:
+        (Tuple) -- (rows, cols, scores, ratios) of the page's discrepancies
+        """
+
+        key = (iou_threshold, verbose, page)
+        ocr = self.analyzer()
+        with self.compare_lock:
+            if key in self.comparisons:
+                self.comparisons.move_to_end(key)
+                return self.comparisons[key]
+            self.comparisons[key] = self.call(ocr.discrepancy_pairs, iou_threshold, verbose,
+                                              pages=[page])
+            while len(self.comparisons) > self.max_comparisons:
+                self.comparisons.popitem(last=False)
+            return self.comparisons[key]
+
+
+class DocumentPool:
+    """
+    Least recently used cache of warm documents.
+
+    Arguments:
+    max_documents (Int) -- maximum number of documents kept, default is 8
+    """
+
+    def __init__(self, max_documents=8):
+        self.max_documents = max_documents
+        self.hits = 0
+        self.misses = 0
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._documents)
+
+
+    def get(self, key):
+        """
+        Find or add the document for a key, evicting the least recently used.
+
+        Arguments:
+        key (Tuple) -- document key
+
+        Returns:
+        (Document) -- the document, which may not be loaded yet
+        """
+
+        with self._lock:
+            if key in self._documents:
+                self.hits += 1
+                self._documents.move_to_end(key)
+                return self._documents[key]
+            self.misses += 1
+            document = self._documents[key] = Document(key)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        return document
+
+
+def parameter(params, name, convert=str, default=None):
+    """
+    Read one query parameter.
+
+    Arguments:
+    params (Dict) -- parsed query string
+    name (String) -- parameter name
+    convert (Function) -- type to convert the value to, default is str
+    default (Object) -- value when missing, parameters without a default are required
+
+    Returns:
+    (Object) -- converted parameter value
+    """
+
+    if name not in params:
+        if default is None:
+            raise RequestError(400, 'Missing parameter: %s' % name)
+        return default
+    try:
+        return convert(params[name][-1])
+    except ValueError:
+        raise RequestError(400, 'Bad value for parameter: %s' % name)
+
+
+class OCR_Server:
+    """
+    Asyncio HTTP front end answering queries against warm documents.
+
+    Requests are parsed on the event loop, while loading, comparing,
+    searching and rendering run on a thread pool, so slow queries do not
+    hold up others. Responses are JSON, or PNG for overlays.
+
+    Arguments:
+    max_documents (Int) -- maximum number of warm documents, default is 8
+    workers (Int) -- number of worker threads, default chosen by the executor
+    """
+
+    def __init__(self, max_documents=8, workers=None):
+        self.documents = DocumentPool(max_documents)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.routes = {'/search': self.search,
+                       '/discrepancies': self.discrepancies,
+                       '/overlay': self.overlay,
+                       '/status': self.status}
+
+
+    def document(self, params):
+        """
+        Look up the document named by a request.
+        """
+
+        return self.documents.get(tuple(parameter(params, name)
+                                        for name in DOCUMENT_PARAMETERS))
+
+
+    def search(self, params):
+        """
+        Find the boundary boxes of a word on a page.
+
+        Returns:
+        (Dict) -- boxes found for each engine searched
+        """
+
+        document = self.document(params)
+        page = parameter(params, 'page', int)
+        word = parameter(params, 'word')
+        fuzz_threshold = parameter(params, 'fuzz_threshold', int, 100)
+        ocr = document.analyzer()
+        engines = [parameter(params, 'engine', str, 'both')]
+        if engines == ['both']:
+            engines = [ocr.ocr_name_1, ocr.ocr_name_2]
+        with document.search_lock:
+            return {engine: document.call(ocr.search_word, page, word, engine, fuzz_threshold)
+                    for engine in engines}
+
+
+    def discrepancies(self, params):
+        """
+        List the discrepancies on one page, as in compare_ocr_outputs.
+
+        Returns:
+        (List) -- discrepancy records of the page
+        """
+
+        document = self.document(params)
+        page = parameter(params, 'page', int)
+        iou_threshold = parameter(params, 'iou_threshold', float, 0.4)
+        verbose = parameter(params, 'verbose', int, 0)
+        if verbose not in [0, 1]:
+            raise RequestError(400, 'Verbose level must be 0 or 1.')
+        rows, cols, scores, ratios = document.comparison(iou_threshold, verbose, page)
+        ocr = document.analyzer()
+        names = [ocr.ocr_name_1, ocr.ocr_name_2]
+        return [make_discrepancy(names,
+                                 ocr.words_1.word(rows[n]),
+                                 ocr.words_2.word(cols[n]),
+                                 verbose,
+                                 scores[n],
+                                 ratios[n] if verbose == 1 else None)
+                for n in range(len(rows))]
+
+
+    def overlay(self, params):
+        """
+        Render the boundary boxes of a word over its page image.
+
+        Returns:
+        (Bytes) -- PNG image
+        """
+
+        from PIL import Image
+
+        document = self.document(params)
+        scale = parameter(params, 'scale', float, 1.0)
+        page = parameter(params, 'page', int)
+        word = parameter(params, 'word')
+        engine = parameter(params, 'engine', str, 'both')
+        fuzz_threshold = parameter(params, 'fuzz_threshold', int, 100)
+        if scale == 0:
+            raise RequestError(400, 'Scale value can not be zero.')
+        ocr = document.analyzer()
+        images = document.page_images(parameter(params, 'images'))
+        if not 0 < page <= len(images):
+            raise RequestError(404, 'Page does not exist.')
+        engines = [engine]
+        if engine == 'both':
+            engines = [ocr.ocr_name_1, ocr.ocr_name_2]
+        with document.search_lock:
+            # The analyzer is shared with searches, so boxes are scaled here
+            # rather than by changing its transform.
+            boxes = [apply_transform(document.call(ocr.search_word, page, word, name,
+                                                   fuzz_threshold),
+                                     (scale, scale, 0.0, 0.0))
+                     for name in engines]
+        red_boxes, green_boxes = (boxes + [[]])[:2]
+        im_data = images[page-1]
+        if im_data.ndim == 2:
+            im_data = np.stack([im_data] * 3, axis=-1)
+        im_data = np.array(im_data[..., :3], dtype=np.uint8)
+        draw_boxes(im_data, red_boxes, 'r')
+        draw_boxes(im_data, green_boxes, 'g')
+        image_file = io.BytesIO()
+        Image.fromarray(im_data).save(image_file, format='png')
+
+        return image_file.getvalue()
+
+
+    def status(self, params):
+        """
+        Returns:
+        (Dict) -- warm documents and document cache hits and misses
+        """
+
+        return {'documents': len(self.documents),
+                'hits': self.documents.hits,
+                'misses': self.documents.misses}
+
+
+    async def handle(self, reader, writer):
+        """
+        Answer one HTTP request on a connection.
+        """
+
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()).strip():
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        except ValueError:
+            # Lines over the stream limit, which readline reports as ValueError.
+            request_line = None
+        if request_line is None:
+            status, content_type = 400, 'application/json'
+            body = json.dumps({'error': 'Request line or header too long.'}).encode()
+        else:
+            status, body, content_type = await self.respond(request_line)
+
+        header = ('HTTP/1.1 %d %s\r\n'
+                  'Content-Type: %s\r\n'
+                  'Content-Length: %d\r\n'
+                  'Connection: close\r\n\r\n' % (status, REASONS[status], content_type, len(body)))
+        writer.write(header.encode('latin-1') + body)
+        try:
+            await writer.drain()
+            if request_line is None:
+                await self.discard(reader, writer)
+        finally:
+            writer.close()
+
+
+    async def discard(self, reader, writer, timeout=1.0):
+        """
+        Drop what is left of a rejected request after answering it, so
+        closing the connection does not reset it before the client has read
+        the response.
+
+        Arguments:
+        timeout (Float) -- seconds to wait for the client, default is 1.0
+        """
+
+        async def read_all():
+            while await reader.read(2**16):
+                pass
+
+        writer.write_eof()
+        try:
+            await asyncio.wait_for(read_all(), timeout)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+
+
+    async def respond(self, request_line):
+        """
+        Route a request to its handler on the thread pool.
+
+        Arguments:
+        request_line (List) -- method, target and version of the request
+
+        Returns:
+        (Tuple) -- (status, body, content_type)
+        """
+
+        try:
+            if len(request_line) != 3:
+                raise RequestError(400, 'Malformed request.')
+            if request_line[0] != 'GET':
+                raise RequestError(405, 'Only GET requests are supported.')
+            target = urlsplit(request_line[1])
+            if target.path not in self.routes:
+                raise RequestError(404, 'Unknown endpoint: %s' % target.path)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, self.routes[target.path],
+                                                parse_qs(target.query))
+        except RequestError as e:
+            return e.status, json.dumps({'error': str(e)}).encode(), 'application/json'
+        except Exception as e:
+            return 500, json.dumps({'error': str(e)}).encode(), 'application/json'
+
+        if isinstance(result, bytes):
+            return 200, result, 'image/png'
+        return 200, json.dumps(result, sort_keys=True).encode(), 'application/json'
+
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """
+        Start listening for requests.
+
+        Arguments:
+        host (String) -- address to bind, default is localhost only
+        port (Int) -- port to bind, 0 picks a free port, default is 8080
+
+        Returns:
+        (asyncio.Server) -- the listening server
+        """
+
+        return await asyncio.start_server(self.handle, host, port)
+
+
+    async def serve_forever(self, host='127.0.0.1', port=8080):
+        """
+        Serve requests until cancelled.
+
+        Arguments:
+        host (String) -- address to bind, default is localhost only
+        port (Int) -- port to bind, default is 8080
+        """
+
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    """
+    Command line entry point for the comparison service.
+
+    Arguments:
+    argv (List) -- command line arguments, default is sys.argv[1:]
+    """
+
+    parser = argparse.ArgumentParser(description='Serve OCR comparisons on localhost.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to bind, default is 127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help='port to bind, default is 8080')
+    parser.add_argument('--max-documents', type=int, default=8,
+                        help='maximum number of warm documents, default is 8')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker threads, default chosen by the executor')
+    args = parser.parse_args(argv)
+
+    server = OCR_Server(args.max_documents, args.workers)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Bounded-memory discrepancy summaries for compare_ocr.py
+"""
+
+from difflib import SequenceMatcher
+import numpy as np
+
+
+class SpaceSaving:
+    """
+    Approximate counter keeping only the k most frequent keys.
+
+    Uses the Space-Saving algorithm: once k keys are tracked, a new key
+    replaces the least frequent one and inherits its count, which becomes
+    the new key's maximum overestimate. Any key seen more than n / k times
+    out of n is guaranteed to be tracked.
+
+    Arguments:
+    k (Int) -- number of keys tracked, default is 100
+    """
+
+    def __init__(self, k=100):
+        if k < 1:
+            raise ValueError('Number of tracked keys must be positive.')
+        self.k = k
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+
+
+    def add(self, key, n=1):
+        """
+        Count occurrences of a key.
+
+        Arguments:
+        key (Object) -- hashable key
+        n (Int) -- number of occurrences, default is 1
+        """
+
+        self.total += n
+        if key in self.counts:
+            self.counts[key] += n
+            return
+        error = 0
+        if len(self.counts) >= self.k:
+            evicted = min(self.counts, key=self.counts.get)
+            error = self.counts.pop(evicted)
+            del self.errors[evicted]
+        self.counts[key] = error + n
+        self.errors[key] = error
+
+
+    def merge(self, other):
+        """
+        Fold another counter into this one.
+
+        Arguments:
+        other (SpaceSaving) -- counter to merge
+        """
+
+        # A key missing from a full counter may have occurred up to its minimum count.
+        floor_1 = min(self.counts.values()) if len(self.counts) >= self.k else 0
+        floor_2 = min(other.counts.values()) if len(other.counts) >= other.k else 0
+        counts, errors = {}, {}
+        for key in set(self.counts) | set(other.counts):
+            counts[key] = self.counts.get(key, floor_1) + other.counts.get(key, floor_2)
+            errors[key] = self.errors.get(key, floor_1) + other.errors.get(key, floor_2)
+        kept = sorted(counts, key=lambda key: (-counts[key], repr(key)))[:self.k]
+        self.counts = {key: counts[key] for key in kept}
+        self.errors = {key: errors[key] for key in kept}
+        self.total += other.total
+
+
+    def most_common(self, n=None):
+        """
+        Arguments:
+        n (Int) -- number of keys to return, default is all tracked keys
+
+        Returns:
+        (List) -- (key, count, error) tuples by descending count
+        """
+
+        ranked = sorted(self.counts, key=lambda key: (-self.counts[key], repr(key)))[:n]
+
+        return [(key, self.counts[key], self.errors[key]) for key in ranked]
+
+
+def substitutions(text_1, text_2):
+    """
+    Find the character substitutions turning one string into another.
+
+    Arguments:
+    text_1 (String) -- string from engine 1
+    text_2 (String) -- string from engine 2
+
+    Returns:
+    (List) -- (chars_1, chars_2) pairs, where insertions and deletions have
+              an empty string on one side
+    """
+
+    found = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, text_1, text_2).get_opcodes():
+        if tag == 'equal':
+            continue
+        if tag == 'replace' and i2 - i1 == j2 - j1:
+            found.extend(zip(text_1[i1:i2], text_2[j1:j2]))
+        else:
+            found.append((text_1[i1:i2], text_2[j1:j2]))
+
+    return found
+
+
+class DiscrepancySummary:
+    """
+    Running summary of discrepancies between two OCR engines.
+
+    Discrepancies are folded in as they are found, and only fixed size
+    state is kept: totals, top-k counters of text confusions and character
+    substitutions, and histograms of IoU, fuzz ratio and per-page
+    disagreement rate. Summaries of separate documents can be merged, so a
+    corpus can be summarised in one pass. Documents that could not be
+    summarised are listed in failed, with their errors.
+
+    Arguments:
+    top_k (Int) -- number of confusions and substitutions tracked, default is 100
+    bins (Int) -- number of histogram bins, default is 10
+    """
+
+    def __init__(self, top_k=100, bins=10):
+        self.top_k = top_k
+        self.bins = bins
+        self.documents = 0
+        self.pages = 0
+        self.words_1 = 0
+        self.words_2 = 0
+        self.discrepancies = 0
+        self.confusions = SpaceSaving(top_k)
+        self.substitutions = SpaceSaving(top_k)
+        self.iou_histogram = np.zeros(bins, dtype=np.int64)
+        self.ratio_histogram = np.zeros(bins, dtype=np.int64)
+        self.page_rate_histogram = np.zeros(bins, dtype=np.int64)
+        self.failed = []
+
+
+    def _bin(self, values, upper):
+        """
+        Histogram values over [0, upper] with the summary's bins.
+        """
+
+        return np.histogram(np.clip(values, 0, upper), bins=self.bins, range=(0, upper))[0]
+
+
+    def add_page(self, words_1, words_2, text_1, text_2, scores, ratios):
+        """
+        Fold in the discrepancies of one page.
+
+        Arguments:
+        words_1 (Int) -- number of engine 1 words on the page
+        words_2 (Int) -- number of engine 2 words on the page
+        text_1 (List) -- engine 1 text of each discrepancy
+        text_2 (List) -- engine 2 text of each discrepancy
+        scores (np.array) -- IoU value of each discrepancy
+        ratios (np.array) -- fuzz ratio of each discrepancy
+        """
+
+        self.pages += 1
+        self.words_1 += words_1
+        self.words_2 += words_2
+        self.discrepancies += len(scores)
+        for a, b in zip(text_1, text_2):
+            self.confusions.add((a, b))
+            for pair in substitutions(a, b):
+                self.substitutions.add(pair)
+        self.iou_histogram += self._bin(scores, 1.0)
+        self.ratio_histogram += self._bin(ratios, 100)
+        if words_1:
+            self.page_rate_histogram += self._bin([len(scores) / words_1], 1.0)
+
+
+    def merge(self, other):
+        """
+        Fold another summary into this one.
+
+        Arguments:
+        other (DiscrepancySummary) -- summary with the same number of bins
+
+        Returns:
+        self (DiscrepancySummary) -- the merged summary
+        """
+
+        if other.bins != self.bins:
+            raise ValueError('Summaries must have the same number of bins.')
+        self.documents += other.documents
+        self.pages += other.pages
+        self.words_1 += other.words_1
+        self.words_2 += other.words_2
+        self.discrepancies += other.discrepancies
+        self.confusions.merge(other.confusions)
+        self.substitutions.merge(other.substitutions)
+        self.iou_histogram += other.iou_histogram
+        self.ratio_histogram += other.ratio_histogram
+        self.page_rate_histogram += other.page_rate_histogram
+        self.failed.extend(other.failed)
+
+        return self
+
+
+    def as_dict(self):
+        """
+        Returns:
+        (Dict) -- JSON serialisable summary
+        """
+
+        edges = lambda upper: np.linspace(0, upper, self.bins + 1).tolist()
+        top = lambda counter: [{'from': a, 'to': b, 'count': count, 'error': error}
+                               for (a, b), count, error in counter.most_common()]
+
+        return {'documents': self.documents,
+                'pages': self.pages,
+                'words_1': self.words_1,
+                'words_2': self.words_2,
+                'discrepancies': self.discrepancies,
+                'disagreement_rate': self.discrepancies / self.words_1 if self.words_1 else 0.0,
+                'confusions': top(self.confusions),
+                'substitutions': top(self.substitutions),
+                'iou_histogram': {'edges': edges(1.0),
+                                  'counts': self.iou_histogram.tolist()},
+                'ratio_histogram': {'edges': edges(100),
+                                    'counts': self.ratio_histogram.tolist()},
+                'page_rate_histogram': {'edges': edges(1.0),
+                                        'counts': self.page_rate_histogram.tolist()},
+                'failed': sorted(self.failed, key=lambda stats: stats['document'])}
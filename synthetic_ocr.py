@@ -0,0 +1,166 @@
+"""
+Synthetic OCR engine output for testing and benchmarking compare_ocr.py
+"""
+
+import json
+import os
+import numpy as np
+from PIL import Image
+
+ALPHABET = np.array(list('abcdefghijklmnopqrstuvwxyz0123456789'))
+
+
+def make_vocabulary(size, rng):
+    """
+    Generate distinct random words.
+
+    Arguments:
+    size (Int) -- number of words
+    rng (np.random.Generator) -- random generator
+
+    Returns:
+    (List) -- list of words
+    """
+
+    words = set()
+    while len(words) < size:
+        length = rng.integers(1, 10)
+        words.add(''.join(rng.choice(ALPHABET, length)))
+
+    return sorted(words)
+
+
+def generate_words(n_words, n_pages=10, density=0.6, page_size=(2000, 3000),
+                   vocabulary_size=5000, seed=0):
+    """
+    Lay out words of one OCR engine on a grid of lines.
+
+    Words are spread evenly over pages and laid out left to right, top to
+    bottom, with word frequencies following a Zipf distribution as in
+    natural text.
+
+    Arguments:
+    n_words (Int) -- number of words
+    n_pages (Int) -- number of pages, default is 10
+    density (Float) -- fraction of each line covered by boxes, default is 0.6
+    page_size (Tuple) -- (width, height) of each page in pixels
+    vocabulary_size (Int) -- number of distinct words, default is 5000
+    seed (Int) -- random seed, default is 0
+
+    Returns:
+    (List) -- word records with bounds, page and text fields
+    """
+
+    if not 0 < density <= 1:
+        raise ValueError('Density must be in (0, 1].')
+    if n_pages < 1:
+        raise ValueError('Number of pages must be positive.')
+    rng = np.random.default_rng(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    text_ids = np.minimum(rng.zipf(1.3, n_words), vocabulary_size) - 1
+
+    width, height = page_size
+    pages = np.arange(n_words) * n_pages // max(n_words, 1)
+    position = np.arange(n_words) - np.searchsorted(pages, pages)
+    per_page = max(-(-n_words // n_pages), 1)
+    n_lines = max(int(np.ceil(np.sqrt(per_page * height / width))), 1)
+    per_line = -(-per_page // n_lines)
+    cell_w, cell_h = width / per_line, height / n_lines
+    x1 = (position % per_line) * cell_w
+    y1 = (position // per_line) * cell_h
+    bounds = np.stack([x1,
+                       y1,
+                       x1 + np.maximum(cell_w * density, 1),
+                       y1 + np.maximum(cell_h * 0.8, 1)], axis=1).astype(np.int64)
+
+    return [{'bounds': box, 'page': page + 1, 'text': vocabulary[text_id]}
+            for box, page, text_id in zip(bounds.tolist(), pages.tolist(), text_ids.tolist())]
+
+
+def perturb_words(words, disagreement=0.05, seed=1):
+    """
+    Derive a second engine's output that disagrees with the first.
+
+    A disagreeing word has one of its characters substituted, is split into
+    two boxes, is dropped, or has its box shifted. Every other word keeps its
+    text, with its box jittered by a pixel or two.
+
+    Arguments:
+    words (List) -- word records of the first engine
+    disagreement (Float) -- fraction of words that disagree, default is 0.05
+    seed (Int) -- random seed, default is 1
+
+    Returns:
+    (List) -- word records of the second engine
+    """
+
+    if not 0 <= disagreement <= 1:
+        raise ValueError('Disagreement rate must be in [0, 1].')
+    rng = np.random.default_rng(seed)
+    disagrees = rng.random(len(words)) < disagreement
+    kinds = rng.integers(0, 4, len(words))
+    jitter = rng.integers(-2, 3, (len(words), 4))
+    perturbed = []
+
+    for word, disagree, kind, shift in zip(words, disagrees.tolist(), kinds.tolist(),
+                                           jitter.tolist()):
+        x1, y1, x2, y2 = word['bounds']
+        bounds = [x1 + shift[0], y1 + shift[1], max(x2 + shift[2], x1 + shift[0] + 1),
+                  max(y2 + shift[3], y1 + shift[1] + 1)]
+        text = word['text']
+        if disagree and kind == 0:
+            i = int(rng.integers(0, len(text)))
+            text = text[:i] + str(rng.choice(ALPHABET)) + text[i+1:]
+        elif disagree and kind == 1 and len(text) > 1 and x2 - x1 > 1:
+            split = len(text) // 2
+            middle = x1 + (x2 - x1) * split // len(text)
+            perturbed.append({'bounds': [x1, y1, middle, y2], 'page': word['page'],
+                              'text': text[:split]})
+            bounds, text = [middle, y1, x2, y2], text[split:]
+        elif disagree and kind == 2:
+            continue
+        elif disagree and kind == 3:
+            offset = (x2 - x1) // 2
+            bounds = [x1 + offset, y1, x2 + offset, y2]
+        perturbed.append({'bounds': bounds, 'page': word['page'], 'text': text})
+
+    return perturbed
+
+
+def write_engine_pair(directory, n_words, n_pages=10, density=0.6, disagreement=0.05,
+                      page_size=(2000, 3000), images=False, seed=0):
+    """
+    Write a synthetic pair of OCR engine outputs to a directory.
+
+    The outputs are written as 'engine_1.json' and 'engine_2.json'. Blank
+    page images named 'page_<n>.jpg' can be written alongside them.
+
+    Arguments:
+    directory (String) -- output directory, created if missing
+    n_words (Int) -- number of words of the first engine
+    n_pages (Int) -- number of pages, default is 10
+    density (Float) -- fraction of each line covered by boxes, default is 0.6
+    disagreement (Float) -- fraction of words that disagree, default is 0.05
+    page_size (Tuple) -- (width, height) of each page in pixels
+    images (Bool) -- if True, also write page images, default is False
+    seed (Int) -- random seed, default is 0
+
+    Returns:
+    (Tuple) -- paths of both engine outputs
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    words_1 = generate_words(n_words, n_pages, density, page_size, seed=seed)
+    words_2 = perturb_words(words_1, disagreement, seed=seed + 1)
+    paths = (os.path.join(directory, 'engine_1.json'), os.path.join(directory, 'engine_2.json'))
+    for path, words in zip(paths, [words_1, words_2]):
+        with open(path, 'w') as ocr_file:
+            json.dump(words, ocr_file)
+
+    if images:
+        page = Image.new('RGB', page_size, (255, 255, 255))
+        digits = len(str(n_pages))
+        for n in range(1, n_pages + 1):
+            page.save(os.path.join(directory, 'page_%0*d.jpg' % (digits, n)))
+
+    return paths
@@ -0,0 +1,24 @@
+import benchmark
+import json
+import pytest
+
+
+def test_run_benchmarks():
+    report = benchmark.run_benchmarks([200, 400], n_pages=2)
+    # Test case 1: check one result per benchmark and size
+    assert len(report['results']) == 2 * len(benchmark.BENCHMARKS)
+    # Test case 2: check results are machine readable
+    result = json.loads(json.dumps(report))['results'][0]
+    assert set(result) == {'benchmark', 'n_words', 'n_pages', 'density', 'disagreement', 'seconds'}
+    assert result['seconds'] >= 0
+    # Test case 3: assert unknown benchmark raises error
+    with pytest.raises(ValueError):
+        benchmark.run_benchmarks([200], benchmarks=['bad_value'])
+
+
+def test_main(tmpdir):
+    path = str(tmpdir.join('results.json'))
+    # Test case 1: check results written to file
+    assert benchmark.main([path, '--sizes', '100', '--benchmarks', 'init', 'find_boundaries']) == 0
+    with open(path) as results_file:
+        assert [r['benchmark'] for r in json.load(results_file)['results']] == ['init', 'find_boundaries']
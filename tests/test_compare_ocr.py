@@ -1,14 +1,46 @@
-from compare_ocr import OCR_Analyzer
+from compare_ocr import OCR_Analyzer, Multi_OCR_Analyzer, compare_ocr_files, compare_corpus, summarize_corpus
+import compare_ocr
+from result_cache import ResultCache
+from instrumentation import Stats
+import shutil
 import random
-import numpy as np
 import pandas as pd
 import pytest
 import json
+import io
+import functools
+import os
+import matplotlib.pyplot as plt
+import helpers
+from fuzzywuzzy import fuzz
 
 
 ASSETS_DIR = 'tests/assets/'
 
 
+def pairwise_reference(ocr, iou_threshold, verbose):
+    """
+    Reference nested loop comparison of both OCR engines.
+    """
+    output = []
+    for t_1 in ocr.ocr_1.itertuples():
+        for t_2 in ocr.ocr_2.itertuples():
+            iou_score = helpers.iou(t_1.bounds, t_2.bounds)
+            if t_1.page == t_2.page and iou_score >= iou_threshold and t_1.text != t_2.text:
+                discrepency = {ocr.ocr_name_1: {'page': t_1.page,
+                                                'bounds': t_1.bounds,
+                                                'text': t_1.text},
+                               ocr.ocr_name_2: {'page': t_2.page,
+                                                'bounds': t_2.bounds,
+                                                'text': t_2.text}}
+                if verbose == 1:
+                    discrepency = {'ocr_output': discrepency,
+                                   'iou_of_bounds': iou_score,
+                                   'fuzz_ratio': fuzz.ratio(t_1.text, t_2.text)}
+                output.append(discrepency)
+    return json.dumps(output, indent=4, sort_keys=True)
+
+
 @pytest.fixture(scope='function')
 def ocr():
     """
@@ -17,7 +49,8 @@ def ocr():
     ocr = OCR_Analyzer(ASSETS_DIR+'test_1.json',
                        ASSETS_DIR+'test_2.json',
                        'test_ocr_1',
-                       'test_ocr_2')
+                       'test_ocr_2',
+                       sidecar=False)
     return ocr
 
 
@@ -130,3 +163,443 @@ def test_compare_ocr_outputs(ocr):
     # Test case 5: assert bad verbose value raises error
     with pytest.raises(Exception) as e:
         assert ocr.compare_ocr_outputs(verbose=2)
+
+
+def test_compare_ocr_outputs_matches_pairwise(ocr):
+    for iou_threshold in [0.0, 0.1, 0.4, 0.5, 0.9]:
+        for verbose in [0, 1]:
+            # Test case 1: output identical to nested loop comparison
+            assert ocr.compare_ocr_outputs(iou_threshold=iou_threshold, verbose=verbose) == \
+                pairwise_reference(ocr, iou_threshold, verbose)
+
+
+def test_pair_counts(ocr):
+    ocr.compare_ocr_outputs(iou_threshold=0.4)
+    n_pairs = sum((ocr.ocr_1['page'] == page).sum() * (ocr.ocr_2['page'] == page).sum()
+                  for page in ocr.ocr_1['page'].unique())
+    # Test case 1: check every same-page pair is either tested or pruned
+    assert sum(ocr.pair_counts.values()) == n_pairs
+    # Test case 2: check spatial index prunes non-intersecting pairs
+    assert ocr.pair_counts['pairs_pruned'] > 0
+
+
+def test_compare_ocr_outputs_workers(ocr):
+    for verbose in [0, 1]:
+        serial = ocr.compare_ocr_outputs(iou_threshold=0.1, verbose=verbose)
+        # Test case 1: check page-parallel output matches serial output exactly
+        assert ocr.compare_ocr_outputs(iou_threshold=0.1, verbose=verbose, workers=2) == serial
+
+
+def test_compare_ocr_files(ocr):
+    for verbose in [0, 1]:
+        expected = ocr.compare_ocr_outputs(iou_threshold=0.1, verbose=verbose)
+        output = compare_ocr_files(ASSETS_DIR+'test_1.json',
+                                   ASSETS_DIR+'test_2.json',
+                                   'test_ocr_1',
+                                   'test_ocr_2',
+                                   iou_threshold=0.1,
+                                   verbose=verbose)
+        # Test case 1: check streamed comparison matches in-memory comparison
+        assert output == expected
+        # Test case 2: same as above, spilling records to disk
+        assert compare_ocr_files(ASSETS_DIR+'test_1.json',
+                                 ASSETS_DIR+'test_2.json',
+                                 'test_ocr_1',
+                                 'test_ocr_2',
+                                 iou_threshold=0.1,
+                                 verbose=verbose,
+                                 max_records=1) == expected
+
+
+def test_export_boundary_boxes(ocr, tmp_path):
+    ocr.load_images(ASSETS_DIR)
+    paths = ocr.export_boundary_boxes([(1, 'sep'), (2, 'sep')], str(tmp_path))
+    # Test case 1: check one image written per query
+    assert [os.path.basename(p) for p in paths] == ['0_page_1.png', '1_page_2.png']
+    # Test case 2: check written image matches page size
+    assert plt.imread(paths[0]).shape[:2] == ocr.images[0].shape[:2]
+    paths = ocr.export_boundary_boxes('discrepancies', str(tmp_path), image_format='jpg',
+                                      workers=2)
+    # Test case 3: check one image written per page with discrepancies
+    pages = {d['test_ocr_1']['page'] for d in json.loads(ocr.compare_ocr_outputs())}
+    assert sorted(paths) == sorted(str(tmp_path / ('page_%d.jpg' % p)) for p in pages)
+    # Test case 4: assert bad image format raises error
+    with pytest.raises(Exception) as e:
+        assert ocr.export_boundary_boxes('discrepancies', str(tmp_path), image_format='gif')
+
+
+def test_search_word(ocr):
+    # Test case 1: check search matches a full table scan
+    assert ocr.search_word(1, 'sep', 'test_ocr_1', 60) == \
+        helpers.find_boundaries(helpers.extract_page(ocr.ocr_1, 1), 'sep', 60)
+    ocr.scale_bounds(0.5)
+    # Test case 2: check scaled boxes returned
+    assert ocr.search_word(1, 'sep', 'test_ocr_1', 60) == \
+        helpers.find_boundaries(helpers.extract_page(ocr.ocr_1_plot, 1), 'sep', 60)
+    # Test case 3: assert bad engine name raises error
+    with pytest.raises(Exception) as e:
+        assert ocr.search_word(1, 'sep', 'bad_value')
+
+
+def test_iter_discrepancies(ocr):
+    expected = json.loads(ocr.compare_ocr_outputs(iou_threshold=0.1, verbose=1))
+    output = list(ocr.iter_discrepancies(iou_threshold=0.1, verbose=1))
+    # Test case 1: check same records as compare_ocr_outputs
+    dump = functools.partial(json.dumps, sort_keys=True)
+    assert sorted(map(dump, output)) == sorted(map(dump, expected))
+    # Test case 2: check records produced in page order
+    pages = [d['ocr_output']['test_ocr_1']['page'] for d in output]
+    assert pages == sorted(pages)
+
+
+def test_write_discrepancies(ocr):
+    stream = io.StringIO()
+    count = ocr.write_discrepancies(stream, iou_threshold=0.1)
+    lines = stream.getvalue().splitlines()
+    # Test case 1: check one JSON record per line
+    assert count == len(lines) == len(json.loads(ocr.compare_ocr_outputs(iou_threshold=0.1)))
+    assert [json.loads(line) for line in lines] == list(ocr.iter_discrepancies(iou_threshold=0.1))
+    for indent in [None, 2, 4]:
+        stream = io.StringIO()
+        ocr.write_discrepancies(stream, iou_threshold=0.1, json_lines=False, indent=indent)
+        # Test case 2: check JSON array formatted like json.dumps
+        assert stream.getvalue() == json.dumps(list(ocr.iter_discrepancies(iou_threshold=0.1)),
+                                               indent=indent, sort_keys=True)
+    stream = io.StringIO()
+    ocr.write_discrepancies(stream, iou_threshold=1.0, json_lines=False)
+    # Test case 3: check empty JSON array
+    assert stream.getvalue() == '[]'
+    # Test case 4: check invalid arguments rejected before anything is written
+    stream = io.StringIO()
+    assert ocr.write_discrepancies(stream, verbose=2, json_lines=False) is None
+    assert ocr.write_discrepancies(stream, region=(0, 0, 1), json_lines=False) is None
+    assert stream.getvalue() == ''
+
+
+def test_compare_corpus(tmp_path):
+    dir_1, dir_2, out_dir = tmp_path / 'a', tmp_path / 'b', tmp_path / 'out'
+    dir_1.mkdir()
+    dir_2.mkdir()
+    for name in ['doc_1.json', 'doc_2.json']:
+        shutil.copy(ASSETS_DIR+'test_1.json', str(dir_1 / name))
+        shutil.copy(ASSETS_DIR+'test_2.json', str(dir_2 / name))
+    shutil.copy(ASSETS_DIR+'test_1.json', str(dir_1 / 'doc_3.json'))
+    summary = compare_corpus(str(dir_1), str(dir_2), 'test_ocr_1', 'test_ocr_2', str(out_dir),
+                             workers=2)
+    expected = json.loads(OCR_Analyzer(ASSETS_DIR+'test_1.json',
+                                       ASSETS_DIR+'test_2.json',
+                                       'test_ocr_1',
+                                       'test_ocr_2',
+                                       sidecar=False).compare_ocr_outputs())
+    # Test case 1: check paired documents compared, unpaired documents listed
+    assert summary['documents'] == 2 and summary['unpaired'] == ['doc_3.json']
+    assert summary['discrepancies'] == 2 * len(expected)
+    # Test case 2: check per document JSON Lines output
+    with open(str(out_dir / 'doc_1.jsonl')) as output_file:
+        assert len(output_file.readlines()) == len(expected)
+    # Test case 3: check summary written to file
+    with open(str(out_dir / 'summary.json')) as summary_file:
+        assert json.load(summary_file) == summary
+    # Test case 4: check resumed run skips completed documents
+    os.remove(str(out_dir / 'doc_2.jsonl'))
+    (out_dir / 'doc_1.jsonl').write_text('')
+    assert compare_ocr.main([str(dir_1), str(dir_2), 'test_ocr_1', 'test_ocr_2', str(out_dir),
+                             '--workers', '1']) == 0
+    assert (out_dir / 'doc_1.jsonl').read_text() == ''
+    assert not (out_dir / 'doc_2.jsonl').exists()
+    # Test case 5: check documents recompared without resume
+    compare_corpus(str(dir_1), str(dir_2), 'test_ocr_1', 'test_ocr_2', str(out_dir), resume=False)
+    assert (out_dir / 'doc_2.jsonl').exists()
+
+
+def test_compare_ocr_outputs_cache(ocr, tmp_path):
+    cache = ResultCache(str(tmp_path))
+    expected = ocr.compare_ocr_outputs(iou_threshold=0.1, verbose=1)
+    # Test case 1: check first run computes and stores every page
+    assert ocr.compare_ocr_outputs(iou_threshold=0.1, verbose=1, cache=cache) == expected
+    assert cache.hits == 0 and cache.misses == 2
+    # Test case 2: check second run served from cache with identical output
+    assert ocr.compare_ocr_outputs(iou_threshold=0.1, verbose=1, cache=cache) == expected
+    assert cache.hits == 2
+    # Test case 3: same as above, through the streaming and parallel paths
+    assert list(ocr.iter_discrepancies(iou_threshold=0.1, verbose=1, cache=cache)) == \
+        list(ocr.iter_discrepancies(iou_threshold=0.1, verbose=1))
+    assert ocr.compare_ocr_outputs(iou_threshold=0.1, verbose=1, cache=cache, workers=2) == expected
+    assert cache.hits == 6
+    # Test case 4: check changed settings are not served from cache
+    ocr.compare_ocr_outputs(iou_threshold=0.2, verbose=1, cache=cache)
+    assert cache.hits == 6
+
+
+def test_scale_transform(ocr):
+    original = ocr.ocr_1_plot['bounds'].tolist()
+    ocr.scale_bounds(0.5)
+    ocr.scale_bounds(2.0)
+    # Test case 1: check stacked scaling has no rounding drift
+    assert ocr.ocr_1_plot['bounds'].tolist() == original
+    ocr.scale_bounds(0.3)
+    # Test case 2: check scaling recorded in scale_trail
+    assert ocr.scale_trail == [0.5, 2.0, 0.3]
+    # Test case 3: check search returns boxes with the transform applied
+    boxes = ocr.search_word(1, 'sep', 'test_ocr_1')
+    assert boxes == [[round(i * 0.3) for i in b]
+                     for b in helpers.find_boundaries(helpers.extract_page(ocr.ocr_1, 1), 'sep', 100)]
+    ocr.reverse_scaling()
+    # Test case 4: check reverse scaling is exact
+    assert ocr.ocr_1_plot['bounds'].tolist() == original and ocr.scale_trail == []
+
+
+def test_match_ocr_outputs(ocr):
+    for method in ['greedy', 'optimal']:
+        output = json.loads(ocr.match_ocr_outputs(iou_threshold=0.1, method=method, verbose=1))
+        pairs = [(json.dumps(d['ocr_output']['test_ocr_1']), json.dumps(d['ocr_output']['test_ocr_2']))
+                 for d in output['discrepancies']]
+        # Test case 1: check each word appears in at most one discrepancy
+        assert len({p[0] for p in pairs}) == len({p[1] for p in pairs}) == len(pairs)
+        # Test case 2: check every word is either matched or unmatched
+        assert output['matched'] + len(output['unmatched']['test_ocr_1']) == len(ocr.ocr_1)
+        assert output['matched'] + len(output['unmatched']['test_ocr_2']) == len(ocr.ocr_2)
+        # Test case 3: check discrepancies are a subset of the full comparison
+        full = json.loads(ocr.compare_ocr_outputs(iou_threshold=0.1, verbose=1))
+        assert all(d in full for d in output['discrepancies'])
+    # Test case 4: assert bad method raises error
+    with pytest.raises(Exception) as e:
+        assert ocr.match_ocr_outputs(method='bad_value')
+
+
+def test_stats(tmpdir):
+    events = []
+    stats = Stats(callback=lambda *event: events.append(event))
+    ocr = OCR_Analyzer(ASSETS_DIR+'test_1.json', ASSETS_DIR+'test_2.json',
+                       'test_ocr_1', 'test_ocr_2', sidecar=False, stats=stats)
+    n_found = len(json.loads(ocr.compare_ocr_outputs(iou_threshold=0.4, verbose=1)))
+    # Test case 1: check stages timed
+    assert set(stats.timings) == {'load', 'iou', 'fuzz', 'serialize'}
+    # Test case 2: check counters recorded
+    assert stats.counters['records_loaded'] == len(ocr.ocr_1) + len(ocr.ocr_2)
+    assert stats.counters['pairs_evaluated'] == ocr.pair_counts['pairs_tested']
+    assert stats.counters['pairs_passing_iou'] >= stats.counters['discrepancies'] == n_found
+    # Test case 3: check bytes written and cache hits counted
+    cache = ResultCache(str(tmpdir.join('cache')))
+    output_file = io.StringIO()
+    ocr.write_discrepancies(output_file, cache=cache)
+    ocr.write_discrepancies(io.StringIO(), cache=cache)
+    assert stats.counters['bytes_written'] == 2 * len(output_file.getvalue())
+    assert stats.counters['cache_hits'] == stats.counters['cache_misses'] == 2
+    # Test case 4: check caught exceptions recorded
+    ocr.compare_ocr_outputs(verbose=2)
+    assert stats.errors[-1]['function'] == 'compare_ocr_outputs'
+    # Test case 5: check callback receives every update
+    assert ('error', 'compare_ocr_outputs') == events[-1][:2]
+    assert sum(e[2] for e in events if e[:2] == ('count', 'discrepancies')) == stats.counters['discrepancies']
+    # Test case 6: check stats disabled by default
+    assert not OCR_Analyzer(ASSETS_DIR+'test_1.json', ASSETS_DIR+'test_2.json',
+                            'test_ocr_1', 'test_ocr_2', sidecar=False).stats.enabled
+
+
+def test_multi_ocr_analyzer(tmpdir):
+    from synthetic_ocr import generate_words, perturb_words
+    words = generate_words(600, n_pages=2)
+    paths = []
+    for n in range(4):
+        paths.append(str(tmpdir.join('engine_%d.json' % n)))
+        with open(paths[-1], 'w') as ocr_file:
+            json.dump(words if n == 0 else perturb_words(words, 0.2, seed=n), ocr_file)
+    names = ['e0', 'e1', 'e2', 'e3']
+    multi = Multi_OCR_Analyzer(paths, names, sidecar=False)
+    for verbose in [0, 1]:
+        output = json.loads(multi.compare_ocr_outputs(iou_threshold=0.4, verbose=verbose))
+        # Test case 1: check one result per pair of engines
+        assert sorted(output) == ['e0_vs_e1', 'e0_vs_e2', 'e0_vs_e3', 'e1_vs_e2', 'e1_vs_e3', 'e2_vs_e3']
+        # Test case 2: check pairwise results match the two engine analyzer
+        for a, b in [(0, 1), (1, 3), (2, 3)]:
+            pair = OCR_Analyzer(paths[a], paths[b], names[a], names[b], sidecar=False)
+            assert output['e%d_vs_e%d' % (a, b)] == json.loads(
+                pair.compare_ocr_outputs(iou_threshold=0.4, verbose=verbose))
+    # Test case 3: assert bad arguments raise errors
+    assert not hasattr(Multi_OCR_Analyzer(paths[:1], names[:1], sidecar=False), 'words')
+    assert not hasattr(Multi_OCR_Analyzer(paths[:2], ['a', 'A'], sidecar=False), 'words')
+
+
+def test_consensus_disagreements():
+    multi = Multi_OCR_Analyzer([ASSETS_DIR+'test_1.json', ASSETS_DIR+'test_2.json',
+                                ASSETS_DIR+'test_1.json'], ['a', 'b', 'c'], sidecar=False)
+    output = json.loads(multi.consensus_disagreements(iou_threshold=0.4))
+    assert output
+    for disagreement in output:
+        words = disagreement['words']
+        # Test case 1: check the engines with identical output form the majority
+        assert words['a'] == words['c']
+        assert disagreement['consensus'] == (' '.join(w['text'] for w in words['a']) or None)
+        assert disagreement['agreement'] == 2
+        # Test case 2: check the dissenting engine disagrees
+        assert [w['text'] for w in words['b']] != [w['text'] for w in words['a']]
+    # Test case 3: check identical engines never disagree
+    same = Multi_OCR_Analyzer([ASSETS_DIR+'test_1.json'] * 2, ['a', 'b'], sidecar=False)
+    assert json.loads(same.consensus_disagreements()) == []
+
+
+def test_summarize_discrepancies(ocr):
+    expected = json.loads(ocr.compare_ocr_outputs(iou_threshold=0.4, verbose=1))
+    summary = ocr.summarize_discrepancies(iou_threshold=0.4).as_dict()
+    # Test case 1: check totals match the full comparison
+    assert summary['discrepancies'] == len(expected)
+    assert summary['words_1'] == len(ocr.ocr_1) and summary['pages'] == 2
+    # Test case 2: check confusions counted
+    confusions = {}
+    for d in expected:
+        key = (d['ocr_output']['test_ocr_1']['text'], d['ocr_output']['test_ocr_2']['text'])
+        confusions[key] = confusions.get(key, 0) + 1
+    assert {(c['from'], c['to']): c['count'] for c in summary['confusions']} == confusions
+    # Test case 3: check histograms hold every discrepancy
+    assert sum(summary['iou_histogram']['counts']) == len(expected)
+    assert sum(summary['ratio_histogram']['counts']) == len(expected)
+
+
+def test_summarize_corpus(tmp_path):
+    dir_1, dir_2 = tmp_path / 'a', tmp_path / 'b'
+    dir_1.mkdir()
+    dir_2.mkdir()
+    for name in ['doc_1.json', 'doc_2.json', 'doc_3.json']:
+        shutil.copy(ASSETS_DIR+'test_1.json', str(dir_1 / name))
+        shutil.copy(ASSETS_DIR+'test_2.json', str(dir_2 / name))
+    single = OCR_Analyzer(ASSETS_DIR+'test_1.json', ASSETS_DIR+'test_2.json',
+                          'test_ocr_1', 'test_ocr_2', sidecar=False).summarize_discrepancies().as_dict()
+    for workers in [1, 2]:
+        summary = summarize_corpus(str(dir_1), str(dir_2), 'test_ocr_1', 'test_ocr_2',
+                                   workers=workers).as_dict()
+        # Test case 1: check document summaries merged
+        assert summary['documents'] == 3
+        assert summary['discrepancies'] == 3 * single['discrepancies']
+        assert summary['iou_histogram']['counts'] == [3 * c for c in single['iou_histogram']['counts']]
+        assert summary['disagreement_rate'] == single['disagreement_rate']
+    # Test case 2: check summary written from the command line
+    out_dir = tmp_path / 'out'
+    assert compare_ocr.main([str(dir_1), str(dir_2), 'test_ocr_1', 'test_ocr_2', str(out_dir),
+                             '--workers', '1', '--summarize']) == 0
+    with open(str(out_dir / 'discrepancy_summary.json')) as summary_file:
+        assert json.load(summary_file)['discrepancies'] == 3 * single['discrepancies']
+    # Test case 3: check failed documents reported rather than dropped
+    (dir_1 / 'doc_4.json').write_text('not json')
+    shutil.copy(ASSETS_DIR+'test_2.json', str(dir_2 / 'doc_4.json'))
+    for workers in [1, 2]:
+        summary = summarize_corpus(str(dir_1), str(dir_2), 'test_ocr_1', 'test_ocr_2',
+                                   workers=workers).as_dict()
+        assert summary['documents'] == 3
+        assert [stats['document'] for stats in summary['failed']] == ['doc_4.json']
+    assert compare_ocr.main([str(dir_1), str(dir_2), 'test_ocr_1', 'test_ocr_2', str(out_dir),
+                             '--workers', '1', '--summarize']) == 1
+
+
+def test_pages_and_region(tmpdir):
+    from synthetic_ocr import write_engine_pair
+    path_1, path_2 = write_engine_pair(str(tmpdir), 2000, n_pages=5, disagreement=0.2)
+    ocr = OCR_Analyzer(path_1, path_2, 'engine_1', 'engine_2', sidecar=False)
+    full = json.loads(ocr.compare_ocr_outputs(verbose=1))
+    region = (500, 400, 1300, 1200)
+    def inside(d):
+        return all(helpers.in_region([d['ocr_output'][name]['bounds']], region)[0]
+                   for name in ['engine_1', 'engine_2'])
+    # Test case 1: check page range keeps the discrepancies of those pages
+    pages = json.loads(ocr.compare_ocr_outputs(verbose=1, pages=range(2, 4)))
+    assert pages == [d for d in full if d['ocr_output']['engine_1']['page'] in [2, 3]]
+    # Test case 2: check region keeps the discrepancies of words inside it
+    found = json.loads(ocr.compare_ocr_outputs(verbose=1, pages=[2, 3], region=region))
+    assert found and found == [d for d in pages if inside(d)]
+    # Test case 3: check streamed output uses the same selection
+    assert list(ocr.iter_discrepancies(verbose=1, pages=[3, 2], region=region)) == \
+        sorted(found, key=lambda d: d['ocr_output']['engine_1']['page'])
+    # Test case 4: check word search within pages and region
+    word = ocr.words_1.word(ocr.words_1.region_indices(2, region)[0])[2]
+    matches = ocr.find_word(word, 'engine_1', pages=range(1, 6), region=region)
+    assert matches[2]
+    for page, boxes in matches.items():
+        assert helpers.in_region(boxes, region).all()
+        assert sorted(boxes) == sorted(b for b in ocr.search_word(page, word, 'engine_1')
+                                       if helpers.in_region([b], region)[0])
+    assert ocr.search_word(2, word, 'engine_1', region=region) == matches[2]
+    # Test case 5: check pages missing from the document are skipped
+    assert json.loads(ocr.compare_ocr_outputs(pages=[99])) == []
+
+
+def test_sweep_thresholds(tmpdir):
+    from synthetic_ocr import write_engine_pair
+    path_1, path_2 = write_engine_pair(str(tmpdir), 1500, n_pages=3, disagreement=0.2)
+    ocr = OCR_Analyzer(path_1, path_2, 'engine_1', 'engine_2', sidecar=False)
+    thresholds = [0.9, 0.1, 0.4, 0.7]
+    for verbose in [0, 1]:
+        sweep = json.loads(ocr.sweep_thresholds(thresholds, verbose=verbose))
+        # Test case 1: check thresholds reported in the order given
+        assert [result['iou_threshold'] for result in sweep] == thresholds
+        for result in sweep:
+            expected = json.loads(ocr.compare_ocr_outputs(result['iou_threshold'], verbose))
+            # Test case 2: check each output equals a separate comparison
+            assert result['output'] == expected
+            assert result['discrepancies'] == len(expected)
+            assert result['pairs'] == result['matches'] + result['discrepancies']
+    # Test case 3: check counts without outputs
+    counts = json.loads(ocr.sweep_thresholds(thresholds, outputs=False))
+    assert counts == [{key: value for key, value in result.items() if key != 'output'}
+                      for result in sweep]
+    assert counts[1]['matches'] >= counts[2]['matches'] >= counts[3]['matches']
+    # Test case 4: check a zero threshold uses the dense comparison
+    small = json.loads(ocr.sweep_thresholds([0.0, 0.5], pages=[1], region=(0, 0, 400, 300)))
+    assert small[0]['pairs'] > small[1]['pairs']
+    assert small[0]['output'] == json.loads(ocr.compare_ocr_outputs(0.0, pages=[1],
+                                                                    region=(0, 0, 400, 300)))
+    # Test case 5: assert missing thresholds raise error
+    with pytest.raises(Exception) as e:
+        assert ocr.sweep_thresholds([])
+
+
+def test_worst_discrepancies(tmpdir):
+    from synthetic_ocr import write_engine_pair
+    from instrumentation import Stats
+    path_1, path_2 = write_engine_pair(str(tmpdir), 3000, n_pages=4, disagreement=0.3)
+    stats = Stats()
+    ocr = OCR_Analyzer(path_1, path_2, 'engine_1', 'engine_2', sidecar=False, stats=stats)
+    full = json.loads(ocr.compare_ocr_outputs(verbose=1))
+    expected = [d for _, d in sorted(enumerate(full), key=lambda item: (
+        item[1]['fuzz_ratio'], -item[1]['iou_of_bounds'], item[0]))]
+    for k in [1, 10, 50, len(full) + 5]:
+        # Test case 1: check the k worst discrepancies match a full sort
+        assert json.loads(ocr.worst_discrepancies(k)) == expected[:k]
+    # Test case 2: check pairs that cannot enter the top k are not scored
+    stats.reset()
+    ocr.worst_discrepancies(10)
+    assert 0 < stats.counters['ratios_pruned'] < len(full)
+    # Test case 3: check page and region selection
+    region = (0, 0, 1000, 1500)
+    selected = json.loads(ocr.compare_ocr_outputs(verbose=1, pages=[2], region=region))
+    worst = json.loads(ocr.worst_discrepancies(5, pages=[2], region=region))
+    assert worst == sorted(selected, key=lambda d: (d['fuzz_ratio'],
+                                                    -d['iou_of_bounds']))[:5]
+    # Test case 4: assert non-positive k raises error
+    with pytest.raises(Exception) as e:
+        assert ocr.worst_discrepancies(0)
+
+
+def test_mixed_coordinates(tmpdir):
+    records_1 = [{'page': 1, 'bounds': [0, 0, 10, 10], 'text': 'one'},
+                 {'page': 1, 'bounds': [20, 0.5, 30.25, 10], 'text': 'two'},
+                 {'page': 2, 'bounds': [0, 0, 10, 10], 'text': 'three'}]
+    records_2 = [{'page': 1, 'bounds': [0, 0, 10, 11], 'text': 'on'},
+                 {'page': 1, 'bounds': [20, 0, 30, 10], 'text': 'tw0'},
+                 {'page': 2, 'bounds': [0.0, 0, 10, 10], 'text': 'thre'}]
+    paths = []
+    for n, records in enumerate([records_1, records_2]):
+        paths.append(str(tmpdir.join('mixed_%d.json' % n)))
+        with open(paths[-1], 'w') as ocr_file:
+            json.dump(records, ocr_file)
+    ocr = OCR_Analyzer(paths[0], paths[1], 'a', 'b', sidecar=False)
+    output = ocr.compare_ocr_outputs(verbose=1)
+    # Test case 1: check boxes keep the number types of the source
+    assert json.dumps([d['ocr_output'][name]['bounds'] for d in json.loads(output)
+                       for name in 'ab']) == \
+        json.dumps([r['bounds'] for pair in zip(records_1, records_2) for r in pair])
+    # Test case 2: check in-memory and streamed comparisons agree
+    assert output == compare_ocr_files(paths[0], paths[1], 'a', 'b', verbose=1)
+    # Test case 3: check number types kept through a sidecar
+    OCR_Analyzer(paths[0], paths[1], 'a', 'b')
+    ocr = OCR_Analyzer(paths[0], paths[1], 'a', 'b')
+    assert ocr.compare_ocr_outputs(verbose=1) == output
@@ -1,9 +1,10 @@
 import helpers
 import random
 import numpy as np
-from numpy.testing import assert_array_equal
 import pandas as pd
 import pytest
+import io
+import json
 
 
 @pytest.fixture(scope='module')
@@ -48,6 +49,160 @@ def test_iou():
     assert helpers.iou((1,1,3,3), (2,3,3,4)) == 0.0
 
 
+def test_transforms():
+    scale_half = (0.5, 0.5, 0.0, 0.0)
+    shift = (1.0, 1.0, 10.0, 20.0)
+    # Test case 1: check identity leaves boxes unchanged
+    assert helpers.apply_transform([[1,2,3,4]], helpers.IDENTITY_TRANSFORM).tolist() == [[1,2,3,4]]
+    # Test case 2: check scaling rounds to whole pixels
+    assert helpers.apply_transform([[1,2,3,5]], scale_half).tolist() == [[0,1,2,2]]
+    # Test case 3: check composed transform equals applying both in turn
+    composed = helpers.compose_transforms(scale_half, shift)
+    assert helpers.apply_transform([[4,8,12,16]], composed).tolist() == [[12,24,16,28]]
+    # Test case 4: check inverse scales compose exactly to identity
+    assert helpers.compose_transforms(scale_half, (2.0, 2.0, 0.0, 0.0)) == \
+        helpers.IDENTITY_TRANSFORM
+
+
+def test_in_region():
+    boxes = np.array([[0, 0, 10, 10], [20, 20, 30, 30], [5, 5, 25, 25]])
+    # Test case 1: check region corners normalised
+    assert helpers.as_region((10, 10, 0, 0)) == (0, 0, 10, 10)
+    # Test case 2: check boxes overlapping the region found
+    assert helpers.in_region(boxes, (8, 8, 12, 12)).tolist() == [True, False, True]
+    # Test case 3: check touching boxes do not overlap
+    assert helpers.in_region(boxes, (10, 10, 20, 20)).tolist() == [False, False, True]
+    # Test case 4: assert malformed region raises error
+    with pytest.raises(ValueError):
+        helpers.as_region((0, 0, 1))
+
+
+def test_iou_matrix(test_boxes):
+    red_boxes, green_boxes = test_boxes
+    matrix = helpers.iou_matrix(red_boxes, green_boxes)
+    # Test case 1: check output shape is (N, M)
+    assert matrix.shape == (len(red_boxes), len(green_boxes))
+    # Test case 2: check values match scalar iou for well formed boxes
+    assert helpers.iou_matrix([(2,1,4,3)], [(1,2,3,4), (5,6,7,8)]).tolist() == \
+        [[helpers.iou((2,1,4,3), (1,2,3,4)), helpers.iou((2,1,4,3), (5,6,7,8))]]
+    # Test case 3: check empty input gives empty matrix
+    assert helpers.iou_matrix([], green_boxes).shape == (0, len(green_boxes))
+
+
+def test_candidate_pairs():
+    rng = np.random.default_rng(0)
+    for trial in range(20):
+        xy_1, xy_2 = rng.integers(0, 300, (40, 2)), rng.integers(0, 300, (30, 2))
+        boxes_1 = np.hstack([xy_1, xy_1 + rng.integers(0, 60, (40, 2))])
+        boxes_2 = np.hstack([xy_2, xy_2 + rng.integers(0, 60, (30, 2))])
+        rows, cols = helpers.candidate_pairs(boxes_1, boxes_2)
+        overlap = [(i, j) for i in range(40) for j in range(30)
+                   if helpers.iou(boxes_1[i], boxes_2[j]) > 0]
+        # Test case 1: check grid finds exactly the intersecting pairs, in order
+        assert list(zip(rows.tolist(), cols.tolist())) == overlap
+    # Test case 2: check boxes touching at an edge are not paired
+    assert len(helpers.candidate_pairs([(1,1,3,3)], [(2,3,3,4)])[0]) == 0
+    # Test case 3: check empty input gives no pairs
+    assert len(helpers.candidate_pairs([], [(1,1,3,3)])[0]) == 0
+    # Test case 4: check boxes spanning many cells paired without filling the grid
+    xy = rng.integers(0, 3000, (2000, 2))
+    small = np.hstack([xy, xy + 1])
+    for boxes_1, boxes_2 in [(small[:1000], np.vstack([small[1000:], [(0, 0, 3000, 3000)]])),
+                             (np.vstack([[(0, 0, 3000, 40)], small[:1000]]), small[1000:])]:
+        rows, cols = helpers.candidate_pairs(boxes_1, boxes_2, max_cells=4)
+        expected = np.nonzero(helpers.iou_matrix(boxes_1, boxes_2) > 0)
+        assert rows.tolist() == expected[0].tolist() and cols.tolist() == expected[1].tolist()
+
+
+def test_compare_boxes():
+    bounds_1 = np.array([[0,0,10,10], [20,0,30,10], [40,0,50,10]])
+    bounds_2 = np.array([[0,0,10,9], [20,0,30,10], [100,0,110,10]])
+    text_1 = np.array(['a', 'b', 'c'], dtype=object)
+    text_2 = np.array(['x', 'b', 'c'], dtype=object)
+    for block in [1, 2, 2**20]:
+        rows, cols, scores = helpers.compare_boxes(bounds_1, text_1, bounds_2, text_2,
+                                                   0.4, max_block_size=block)
+        # Test case 1: only overlapping pairs with differing text, any block size
+        assert rows.tolist() == [0] and cols.tolist() == [0]
+        # Test case 2: check score matches scalar iou
+        assert scores.tolist() == [helpers.iou(bounds_1[0], bounds_2[0])]
+    counts = {'pairs_tested': 0, 'pairs_pruned': 0}
+    helpers.compare_boxes(bounds_1, text_1, bounds_2, text_2, 0.4, counts=counts)
+    # Test case 3: check only intersecting pairs are tested
+    assert counts == {'pairs_tested': 2, 'pairs_pruned': 7}
+
+
+def test_match_pairs():
+    # One wide box (0) overlapping two split boxes (0, 1), the second also overlapping box 1.
+    rows, cols = np.array([0, 0, 1]), np.array([0, 1, 1])
+    scores = np.array([0.5, 0.45, 0.4])
+    # Test case 1: check greedy matching takes the best pair first
+    assert helpers.match_pairs(rows, cols, scores).tolist() == [0, 2]
+    # Test case 2: check optimal matching maximises total score where greedy does not
+    rows, cols = np.array([0, 0, 1]), np.array([0, 1, 0])
+    scores = np.array([0.6, 0.5, 0.5])
+    assert helpers.match_pairs(rows, cols, scores, 'greedy').tolist() == [0]
+    assert helpers.match_pairs(rows, cols, scores, 'optimal').tolist() == [1, 2]
+    rng = np.random.default_rng(0)
+    for trial in range(20):
+        rows, cols = rng.integers(0, 6, 15), rng.integers(0, 6, 15)
+        keys = np.unique(rows * 6 + cols)
+        rows, cols, scores = keys // 6, keys % 6, rng.random(len(keys))
+        for method in ['greedy', 'optimal']:
+            selected = helpers.match_pairs(rows, cols, scores, method)
+            # Test case 3: check each box matched at most once
+            assert len(set(rows[selected])) == len(set(cols[selected])) == len(selected)
+        # Test case 4: check optimal total is at least the greedy total
+        assert scores[helpers.match_pairs(rows, cols, scores, 'optimal')].sum() >= \
+            scores[helpers.match_pairs(rows, cols, scores, 'greedy')].sum() - 1e-12
+    # Test case 5: assert bad method raises error
+    with pytest.raises(ValueError):
+        helpers.match_pairs(rows, cols, scores, 'bad_value')
+
+
+def test_group_pages(test_df):
+    groups = helpers.group_pages(test_df['page'].values)
+    # Test case 1: check one group per page
+    assert sorted(groups) == [1, 2]
+    # Test case 2: check row indices grouped in ascending order
+    assert groups[2].tolist() == [2, 3]
+
+
+def test_iter_json_records():
+    records = [{'page': 1, 'bounds': [1, 2, 3, 4], 'text': 'a, ] "b"'},
+               {'page': 12345, 'bounds': [5, 6, 7, 8], 'text': ''}, 7, []]
+    for chunk_size in [1, 3, 4096]:
+        stream = io.StringIO(json.dumps(records, indent=2))
+        # Test case 1: check records parsed one at a time for any chunk size
+        assert list(helpers.iter_json_records(stream, chunk_size)) == records
+    # Test case 2: check empty array
+    assert list(helpers.iter_json_records(io.StringIO(' [ ] '))) == []
+    # Test case 3: assert non-array input raises error
+    with pytest.raises(ValueError):
+        list(helpers.iter_json_records(io.StringIO('{}')))
+    # Test case 4: assert missing, doubled and trailing separators raise error
+    for text in ['[{"a": 1} {"b": 2}]', '[1 2]', '[1,,2]', '[,1]', '[1,]']:
+        for chunk_size in [1, 4096]:
+            with pytest.raises(ValueError):
+                list(helpers.iter_json_records(io.StringIO(text), chunk_size))
+
+
+def test_iter_page_shards():
+    path = 'tests/assets/test_1.json'
+    with open(path) as ocr_file:
+        records = json.load(ocr_file)
+    for max_records in [1, 2**18]:
+        shards = list(helpers.iter_page_shards(path, max_records))
+        # Test case 1: check one shard per page, in ascending order
+        assert [shard[0] for shard in shards] == sorted({r['page'] for r in records})
+        for page, index, bounds, text, bits in shards:
+            # Test case 2: check shard records match the source records
+            assert [records[i]['page'] for i in index] == [page] * len(index)
+            assert bounds.tolist() == [records[i]['bounds'] for i in index]
+            assert text.tolist() == [records[i]['text'] for i in index]
+            assert bits.tolist() == [helpers.float_bits(records[i]['bounds']) for i in index]
+
+
 def test_find_boundaries(test_df):
     # Test case 1: one match, strict fuzz threshold
     assert len(helpers.find_boundaries(test_df, 'one', 100)) == 1
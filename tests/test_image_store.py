@@ -0,0 +1,89 @@
+from image_store import ImageSequence, decode_image, draw_boxes
+import numpy as np
+import matplotlib.pyplot as plt
+import pytest
+
+
+ASSETS_DIR = 'tests/assets/'
+
+
+def test_from_directory():
+    images = ImageSequence.from_directory(ASSETS_DIR)
+    # Test case 1: check files recorded in sorted order without decoding
+    assert images.paths == sorted(images.paths) and len(images) == 2
+    assert images.cached_bytes == 0
+    # Test case 2: check empty directory gives empty sequence
+    assert len(ImageSequence.from_directory('bad_directory')) == 0
+
+
+def test_getitem():
+    images = ImageSequence.from_directory(ASSETS_DIR)
+    page = images[0]
+    # Test case 1: check page decoded to image array on first access
+    assert page.ndim >= 2 and images.cached_bytes == page.nbytes
+    # Test case 2: check repeated access served from cache
+    assert images[0] is page
+    # Test case 3: check negative index
+    assert images[-2] is page
+    # Test case 4: assert page number not present raises error
+    with pytest.raises(IndexError):
+        images[2]
+
+
+def test_cache_budget():
+    images = ImageSequence.from_directory(ASSETS_DIR, cache_bytes=1)
+    first = images[0]
+    images[1]
+    # Test case 1: check least recently used page evicted over budget
+    assert len(images._cache) == 1 and images.cached_bytes == images[1].nbytes
+    # Test case 2: check evicted page decoded again on access
+    assert images[0] is not first and (images[0] == first).all()
+
+
+def test_decode_image():
+    path = ImageSequence.from_directory(ASSETS_DIR).paths[0]
+    full = decode_image(path)
+    # Test case 1: check full scale decode matches matplotlib
+    assert (full == plt.imread(path)).all()
+    quarter = decode_image(path, 0.25)
+    # Test case 2: check reduced scale decode has scaled dimensions
+    assert quarter.shape[:2] == tuple(round(i * 0.25) for i in full.shape[:2])
+
+
+def test_prefetch():
+    images = ImageSequence.from_directory(ASSETS_DIR, scale=0.5)
+    images.prefetch(workers=2)
+    # Test case 1: check all pages decoded into cache
+    assert sorted(images._cache) == [0, 1]
+    # Test case 2: check cached pages decoded at sequence scale
+    assert images[0].shape[:2] == decode_image(images.paths[0], 0.5).shape[:2]
+    # Test case 3: assert non positive scale raises error
+    with pytest.raises(ValueError):
+        ImageSequence.from_directory(ASSETS_DIR, scale=0)
+
+
+def test_draw_boxes():
+    im_data = np.zeros((20, 30, 3), dtype=np.uint8)
+    draw_boxes(im_data, [(2, 3, 10, 12)], 'r', linewidth=1)
+    # Test case 1: check outline drawn in box colour
+    assert tuple(im_data[3, 5]) == (255, 0, 0) and tuple(im_data[8, 2]) == (255, 0, 0)
+    # Test case 2: check box interior untouched
+    assert tuple(im_data[8, 5]) == (0, 0, 0)
+    # Test case 3: check boxes outside the image are clipped
+    draw_boxes(im_data, [(-5, -5, 100, 100)], 'g')
+    assert tuple(im_data[0, 0]) == (0, 128, 0)
+
+
+def test_prefetch_budget():
+    path = sorted(ImageSequence.from_directory(ASSETS_DIR).paths)[0]
+    page_bytes = decode_image(path, 0.5).nbytes
+    images = ImageSequence([path] * 10, cache_bytes=3 * page_bytes, scale=0.5)
+    decoded = []
+    decode = images.decode
+    images.decode = lambda path: decoded.append(path) or decode(path)
+    # Test case 1: check only pages fitting the cache budget decoded
+    assert images.prefetch(workers=2) == [0, 1, 2]
+    assert len(decoded) == 3 and sorted(images._cache) == [0, 1, 2]
+    # Test case 2: check requested pages decoded in the order given
+    assert images.prefetch([7, 1, 8], workers=2) == [7, 8]
+    assert len(decoded) == 5 and 7 in images._cache and 8 in images._cache
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+
+HEAVY_MODULES = ['matplotlib', 'pandas', 'fuzzywuzzy', 'PIL']
+
+
+def run_python(code, *options):
+    """
+    Run code in a fresh interpreter from the repository root.
+    """
+    return subprocess.run([sys.executable, *options, '-c', code],
+                          capture_output=True, text=True, check=True)
+
+
+def test_heavy_modules_not_imported():
+    code = '\n'.join([
+        'import sys, compare_ocr',
+        'loaded = [m for m in %r if m in sys.modules]' % HEAVY_MODULES,
+        "ocr = compare_ocr.OCR_Analyzer('tests/assets/test_1.json', 'tests/assets/test_2.json', 'a', 'b', sidecar=False)",
+        'ocr.compare_ocr_outputs()',
+        'print(loaded, [m for m in %r if m in sys.modules])' % HEAVY_MODULES,
+    ])
+    # Test case 1: check plotting, table and image modules not imported on start up
+    # Test case 2: check they are still not imported by a compare-only workload
+    assert run_python(code).stdout.split() == ['[]', '[]']
+
+
+def test_import_time():
+    stderr = run_python('import compare_ocr', '-X', 'importtime').stderr
+    cumulative = {}
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, total, name = line.split('|')
+            if total.strip().isdigit():
+                cumulative[name.strip()] = int(total)
+    # Test case 1: check start up time beyond numpy stays under half a second
+    assert cumulative['compare_ocr'] - cumulative.get('numpy', 0) < 500000
+
+
+def test_helpers_exported():
+    import compare_ocr
+    import helpers
+    # Test case 1: check helpers exposed by compare_ocr are still importable from it
+    for name in ['iou', 'find_boundaries', 'extract_page', 'plot_page', 'plot_boundary_boxes',
+                 'build_legend']:
+        assert getattr(compare_ocr, name) is getattr(helpers, name)
@@ -0,0 +1,49 @@
+from instrumentation import Stats, NULL_STATS
+import json
+import pytest
+
+
+def test_stats():
+    events = []
+    stats = Stats(callback=lambda *event: events.append(event))
+    with stats.stage('load'):
+        pass
+    stats.add_time('load', 1.0)
+    stats.count('pairs')
+    stats.count('pairs', 2)
+    # Test case 1: check stage times accumulate
+    assert stats.timings['load'] >= 1.0
+    # Test case 2: check counters accumulate
+    assert stats.counters == {'pairs': 3}
+    # Test case 3: check stage timed when the block raises
+    with pytest.raises(KeyError):
+        with stats.stage('fail'):
+            raise KeyError('x')
+    assert 'fail' in stats.timings
+    # Test case 4: check errors recorded and output is JSON serialisable
+    stats.error('method', ValueError('bad'))
+    assert json.loads(json.dumps(stats.as_dict()))['errors'] == [
+        {'function': 'method', 'type': 'ValueError', 'message': 'bad'}]
+    # Test case 5: check callback called for every update
+    assert [e[:2] for e in events] == [('stage', 'load'), ('stage', 'load'), ('count', 'pairs'),
+                                       ('count', 'pairs'), ('stage', 'fail'), ('error', 'method')]
+    stats.reset()
+    assert stats.as_dict() == {'timings': {}, 'counters': {}, 'errors': []}
+
+
+def test_null_stats():
+    with NULL_STATS.stage('load'):
+        NULL_STATS.add_time('load', 1.0)
+        NULL_STATS.count('pairs')
+        NULL_STATS.error('method', ValueError('bad'))
+    # Test case 1: check disabled stats record nothing
+    assert not NULL_STATS.enabled
+    assert not hasattr(NULL_STATS, 'timings')
+
+
+def test_max_errors():
+    stats = Stats(max_errors=2)
+    for n in range(5):
+        stats.error('f', ValueError(str(n)))
+    # Test case 1: check only the latest errors kept
+    assert [error['message'] for error in stats.errors] == ['3', '4']
@@ -0,0 +1,111 @@
+from result_cache import ResultCache, shared_cache
+import numpy as np
+import os
+import pytest
+
+
+@pytest.fixture(scope='function')
+def shard():
+    """
+    Test page shard.
+    """
+    bounds_1 = np.array([[0,0,10,10], [20,0,30,10]])
+    bounds_2 = np.array([[0,0,10,9], [20,0,30,10]])
+    text_1 = np.array(['a', 'b'], dtype=object)
+    text_2 = np.array(['x', 'b'], dtype=object)
+    return bounds_1, text_1, bounds_2, text_2, 0.4, 0
+
+
+def test_key(shard):
+    key = ResultCache.key(shard)
+    # Test case 1: check key is stable for identical content
+    assert key == ResultCache.key(tuple(np.copy(item) if isinstance(item, np.ndarray) else item
+                                        for item in shard))
+    # Test case 2: check key changes with text, bounds and settings
+    assert key != ResultCache.key(shard[:3] + (np.array(['x', 'c'], dtype=object),) + shard[4:])
+    assert key != ResultCache.key((shard[0] + 1,) + shard[1:])
+    assert key != ResultCache.key(shard[:4] + (0.5, 0))
+    assert key != ResultCache.key(shard[:4] + (0.4, 1))
+    # Test case 3: check text boundaries are part of the key
+    split = (np.array(['ab', ''], dtype=object), np.array(['a', 'b'], dtype=object))
+    assert ResultCache.key(shard[:1] + split[:1] + shard[2:]) != \
+        ResultCache.key(shard[:1] + split[1:] + shard[2:])
+
+
+def test_get_put(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    result = (np.array([0]), np.array([1]), np.array([0.5]), np.array([], dtype=np.int64))
+    # Test case 1: check miss before put
+    assert cache.get('abc') is None and cache.misses == 1
+    cache.put('abc', result)
+    cached = cache.get('abc')
+    # Test case 2: check stored result read back
+    assert all((a == b).all() for a, b in zip(cached, result)) and cache.hits == 1
+    # Test case 3: check cache shared through its directory
+    assert ResultCache(str(tmp_path)).get('abc') is not None
+
+
+def test_evict(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10**6)
+    result = (np.arange(1000), np.arange(1000), np.zeros(1000), np.zeros(0, dtype=np.int64))
+    cache.put('old', result)
+    os.utime(str(tmp_path / 'old.npz'), (0, 0))
+    entry_size = cache.cached_bytes
+    cache.max_bytes = int(entry_size * 1.5)
+    cache.put('new', result)
+    # Test case 1: check least recently used entry evicted over budget
+    assert cache.get('old') is None and cache.get('new') is not None
+    assert cache.cached_bytes <= cache.max_bytes
+    cache.clear()
+    # Test case 2: check clear removes every entry
+    assert cache.get('new') is None and cache.cached_bytes == 0
+
+
+def test_low_water(tmp_path, monkeypatch):
+    result = (np.arange(100), np.arange(100), np.zeros(100), np.zeros(0, dtype=np.int64))
+    cache = ResultCache(str(tmp_path))
+    cache.put('size', result)
+    entry_size = cache.cached_bytes
+    cache.clear()
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scans.append(path) or scandir(path))
+    cache = ResultCache(str(tmp_path), max_bytes=entry_size * 20, low_water=0.5,
+                        rescan_bytes=entry_size * 20)
+    # Test case 1: check directory not measured before first use
+    assert scans == []
+    for n in range(100):
+        cache.put('key_%d' % n, result)
+    # Test case 2: check eviction to the low water mark amortises scans
+    assert cache.cached_bytes <= cache.max_bytes
+    assert len(scans) <= 12
+    assert len([name for name in os.listdir(str(tmp_path)) if name.endswith('.npz')]) <= 20
+    # Test case 3: assert invalid low water mark raises error
+    with pytest.raises(ValueError):
+        ResultCache(str(tmp_path), low_water=1.5)
+
+
+def test_shared_cache(tmp_path):
+    # Test case 1: check one instance per directory in a process
+    assert shared_cache(str(tmp_path)) is shared_cache(str(tmp_path / '.'))
+    assert shared_cache(str(tmp_path)) is not shared_cache(str(tmp_path / 'other'))
+
+
+def test_shared_directory(tmp_path, monkeypatch):
+    result = (np.arange(100), np.arange(100), np.zeros(100), np.zeros(0, dtype=np.int64))
+    size = ResultCache(str(tmp_path / 'size'))
+    size.put('size', result)
+    entry_size = size.cached_bytes
+    caches = [ResultCache(str(tmp_path), max_bytes=entry_size * 20) for _ in range(4)]
+    for n in range(200):
+        caches[n % 4].put('key_%d' % n, result)
+        total = sum(os.path.getsize(str(path)) for path in tmp_path.glob('*.npz'))
+        # Test case 1: check processes sharing a directory rescan to stay near the budget
+        assert total <= entry_size * 20 + 4 * caches[0].rescan_bytes + entry_size
+    # Test case 2: check a failed write leaves no temporary file
+    def savez(*args, **kwargs):
+        raise OSError('No space left on device')
+    monkeypatch.setattr(np, 'savez', savez)
+    with pytest.raises(OSError):
+        caches[0].put('failed', result)
+    assert not list(tmp_path.glob('*.tmp'))
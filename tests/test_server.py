@@ -0,0 +1,177 @@
+from server import OCR_Server, DocumentPool
+from compare_ocr import OCR_Analyzer
+from urllib.parse import urlencode
+import asyncio
+import io
+import json
+import shutil
+import numpy as np
+from PIL import Image
+import pytest
+
+ASSETS_DIR = 'tests/assets/'
+
+
+@pytest.fixture(scope='module')
+def document_params(tmp_path_factory):
+    """
+    Document parameters naming copies of the test assets, as the server
+    writes word store sidecars next to the files it loads.
+    """
+    directory = tmp_path_factory.mktemp('assets')
+    for name in ['test_1.json', 'test_2.json']:
+        shutil.copy(ASSETS_DIR+name, str(directory / name))
+    return {'ocr_1': str(directory / 'test_1.json'), 'ocr_2': str(directory / 'test_2.json'),
+            'name_1': 'test_ocr_1', 'name_2': 'test_ocr_2'}
+
+
+async def get(port, path, **params):
+    """
+    Make one GET request, returning the status, content type and body.
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    target = path + ('?' + urlencode(params) if params else '')
+    writer.write(('GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % target).encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    header, body = response.split(b'\r\n\r\n', 1)
+    lines = header.decode().split('\r\n')
+    headers = dict(line.split(': ', 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers['Content-Type'], body
+
+
+def run_requests(*requests, server=None):
+    """
+    Start a server on a free port and make requests concurrently.
+    """
+    server = server or OCR_Server(max_documents=2)
+    async def main():
+        listener = await server.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            return await asyncio.gather(*[get(port, path, **params) for path, params in requests])
+    return asyncio.run(main())
+
+
+def test_search_and_discrepancies(document_params):
+    ocr = OCR_Analyzer(ASSETS_DIR+'test_1.json', ASSETS_DIR+'test_2.json', 'test_ocr_1', 'test_ocr_2',
+                       sidecar=False)
+    expected = json.loads(ocr.compare_ocr_outputs(iou_threshold=0.4, verbose=1))
+    server = OCR_Server()
+    (status, content_type, body), *pages = run_requests(
+        ('/search', dict(document_params, page=1, word='sep', fuzz_threshold=60)),
+        ('/discrepancies', dict(document_params, page=1, verbose=1)),
+        ('/discrepancies', dict(document_params, page=2, verbose=1)),
+        ('/discrepancies', dict(document_params, page=3, verbose=1)),
+        server=server)
+    # Test case 1: check search matches the analyzer
+    assert status == 200 and content_type == 'application/json'
+    assert json.loads(body) == {'test_ocr_1': ocr.search_word(1, 'sep', 'test_ocr_1', 60),
+                                'test_ocr_2': ocr.search_word(1, 'sep', 'test_ocr_2', 60)}
+    # Test case 2: check page discrepancies add up to the full comparison
+    found = sum((json.loads(body) for _, _, body in pages), [])
+    assert sorted(found, key=json.dumps) == sorted(expected, key=json.dumps)
+    # Test case 3: check the document was loaded once and kept warm
+    assert len(server.documents) == 1
+    assert server.documents.misses == 1 and server.documents.hits == 3
+
+
+def test_overlay(document_params):
+    (status, content_type, body), = run_requests(
+        ('/overlay', dict(document_params, images=ASSETS_DIR, scale=0.5, page=1, word='sep')))
+    # Test case 1: check a PNG image of the page is returned
+    assert status == 200 and content_type == 'image/png'
+    im_data = np.asarray(Image.open(io.BytesIO(body)))
+    # Test case 2: check boxes drawn in both colours
+    assert (im_data[..., :3] == (255, 0, 0)).all(axis=-1).any()
+    assert (im_data[..., :3] == (0, 128, 0)).all(axis=-1).any()
+
+
+def test_errors(document_params):
+    responses = run_requests(('/unknown', {}),
+                             ('/search', {'page': 1}),
+                             ('/search', dict(document_params, page='x', word='sep')),
+                             ('/search', dict(document_params, page=1, word='sep', engine='bad_value')),
+                             ('/search', dict(document_params, ocr_1='missing.json', page=1, word='sep')),
+                             ('/overlay', dict(document_params, images=ASSETS_DIR, page=9, word='sep')))
+    # Test case 1: check unknown endpoints and pages are not found
+    assert [status for status, _, _ in responses] == [404, 400, 400, 400, 400, 404]
+    # Test case 2: check errors reported as JSON
+    assert all('error' in json.loads(body) for _, _, body in responses)
+
+
+def test_document_pool():
+    pool = DocumentPool(max_documents=2)
+    first = pool.get('a')
+    pool.get('b')
+    # Test case 1: check documents reused
+    assert pool.get('a') is first
+    # Test case 2: check least recently used document evicted
+    pool.get('c')
+    assert len(pool) == 2
+    assert pool.get('a') is first and pool.get('b') is not None
+    assert pool.misses == 4
+
+
+def test_document_bounds(document_params):
+    server = OCR_Server()
+    document = server.document({name: [value] for name, value in document_params.items()})
+    document.max_comparisons = 4
+    for iou_threshold in [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]:
+        document.comparison(iou_threshold, 0, 1)
+    # Test case 1: check only the latest comparisons kept, one page each
+    assert list(document.comparisons) == [(0.3, 0, 1), (0.4, 0, 1), (0.5, 0, 1), (0.6, 0, 1)]
+    rows = document.comparisons[(0.4, 0, 1)][0]
+    assert (document.analyzer().words_1.pages[rows] == 1).all()
+    for _ in range(150):
+        document.stats.error('search_word', ValueError('bad'))
+    # Test case 2: check errors kept by a document are capped
+    assert len(document.stats.errors) == 100
+
+
+def test_search_during_comparison(document_params):
+    server = OCR_Server()
+    document = server.document({name: [value] for name, value in document_params.items()})
+    document.analyzer()
+    # Test case 1: check lookups answered while a comparison holds its lock
+    with document.compare_lock:
+        (status, _, body), (status_2, _, _) = run_requests(
+            ('/search', dict(document_params, page=1, word='sep', fuzz_threshold=60)),
+            ('/search', dict(document_params, page=1, word='sep', engine='test_ocr_1')),
+            server=server)
+    assert status == 200 and status_2 == 200
+    assert json.loads(body)['test_ocr_1']
+
+
+def test_shared_document(document_params):
+    server = OCR_Server()
+    responses = run_requests(
+        ('/search', dict(document_params, page=1, word='sep')),
+        ('/overlay', dict(document_params, images=ASSETS_DIR, scale=0.5, page=1, word='sep')),
+        ('/overlay', dict(document_params, images=ASSETS_DIR, page=1, word='sep')),
+        server=server)
+    # Test case 1: check searches and overlays share one analyzer
+    assert [status for status, _, _ in responses] == [200, 200, 200]
+    assert len(server.documents) == 1
+    document = server.document({name: [value] for name, value in document_params.items()})
+    assert list(document.images) == [ASSETS_DIR]
+    # Test case 2: check overlay scaling leaves search results unscaled
+    assert document.analyzer().scale_trail == []
+    (_, _, body), = run_requests(('/search', dict(document_params, page=1, word='sep')), server=server)
+    assert json.loads(body) == json.loads(responses[0][2])
+
+
+def test_request_errors(document_params):
+    server = OCR_Server()
+    document = server.document({name: [value] for name, value in document_params.items()})
+    ocr = document.analyzer()
+    document.stats.error('search_word', ValueError('stale error'))
+    # Test case 1: check errors are taken from the failing call itself
+    with pytest.raises(Exception, match='OCR data not detected'):
+        document.call(ocr.search_word, 1, 'sep', 'bad_value')
+    assert document.stats.errors[-1]['message'] == 'OCR data not detected.'
+    # Test case 2: check oversized request lines answered with 400
+    (status, _, body), = run_requests(('/search', dict(document_params, page=1, word='x' * 2**17)),
+                                      server=server)
+    assert status == 400 and 'error' in json.loads(body)
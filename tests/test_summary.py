@@ -0,0 +1,72 @@
+from summary import SpaceSaving, DiscrepancySummary, substitutions
+from collections import Counter
+import random
+import numpy as np
+import pytest
+
+
+def test_space_saving():
+    random.seed(0)
+    stream = [random.choice('abcdefghij') for _ in range(500)] + ['z'] * 300
+    random.shuffle(stream)
+    counter = SpaceSaving(k=5)
+    for key in stream:
+        counter.add(key)
+    # Test case 1: check memory bounded by k
+    assert len(counter.counts) == 5 and counter.total == 800
+    # Test case 2: check heavy hitter found, counts overestimate by at most the error
+    key, count, error = counter.most_common(1)[0]
+    assert key == 'z' and count - error <= 300 <= count
+    # Test case 3: check exact counts while fewer than k keys seen
+    exact = SpaceSaving(k=20)
+    for key in stream:
+        exact.add(key)
+    assert {k: c for k, c, _ in exact.most_common()} == dict(Counter(stream))
+    # Test case 4: assert bad size raises error
+    with pytest.raises(ValueError):
+        SpaceSaving(k=0)
+
+
+def test_space_saving_merge():
+    random.seed(1)
+    stream = [random.choice('abcdefghijklmnop') for _ in range(1000)] + ['z'] * 400
+    random.shuffle(stream)
+    merged, whole = SpaceSaving(k=6), SpaceSaving(k=6)
+    for part in [stream[:700], stream[700:]]:
+        counter = SpaceSaving(k=6)
+        for key in part:
+            counter.add(key)
+            whole.add(key)
+        merged.merge(counter)
+    # Test case 1: check merged counter stays bounded and keeps the heavy hitter
+    assert len(merged.counts) == 6 and merged.total == len(stream)
+    key, count, error = merged.most_common(1)[0]
+    assert key == 'z' and count - error <= 400 <= count
+
+
+def test_substitutions():
+    # Test case 1: check single character substitutions
+    assert substitutions('he1lo', 'hello') == [('1', 'l')]
+    # Test case 2: check insertions, deletions and uneven replacements
+    assert substitutions('cl', 'd') == [('cl', 'd')]
+    assert substitutions('abc', 'abxc') == [('', 'x')]
+    assert substitutions('same', 'same') == []
+
+
+def test_discrepancy_summary():
+    summary_1, summary_2 = DiscrepancySummary(top_k=3), DiscrepancySummary(top_k=3)
+    summary_1.add_page(10, 9, ['cat'], ['cot'], np.array([0.5]), np.array([67]))
+    summary_2.add_page(5, 5, ['cat', 'rn'], ['cot', 'm'], np.array([0.95, 1.0]), np.array([67, 0]))
+    merged = summary_1.merge(summary_2).as_dict()
+    # Test case 1: check totals and rate merged
+    assert merged['pages'] == 2 and merged['discrepancies'] == 3
+    assert merged['disagreement_rate'] == 3 / 15
+    # Test case 2: check confusions and substitutions merged
+    assert merged['confusions'][0] == {'from': 'cat', 'to': 'cot', 'count': 2, 'error': 0}
+    assert {'from': 'rn', 'to': 'm', 'count': 1, 'error': 0} in merged['substitutions']
+    # Test case 3: check histogram bins, with values on the top edge in the last bin
+    assert merged['iou_histogram']['counts'] == [0, 0, 0, 0, 0, 1, 0, 0, 0, 2]
+    assert merged['page_rate_histogram']['counts'] == [0, 1, 0, 0, 1, 0, 0, 0, 0, 0]
+    # Test case 4: assert mismatched bins raise error
+    with pytest.raises(ValueError):
+        summary_1.merge(DiscrepancySummary(bins=5))
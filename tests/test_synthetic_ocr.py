@@ -0,0 +1,41 @@
+from synthetic_ocr import generate_words, perturb_words, write_engine_pair
+from compare_ocr import OCR_Analyzer
+import json
+import pytest
+
+
+def test_generate_words():
+    words = generate_words(1000, n_pages=4, density=0.5, page_size=(1000, 1500))
+    # Test case 1: check size and page count
+    assert len(words) == 1000
+    assert sorted({w['page'] for w in words}) == [1, 2, 3, 4]
+    # Test case 2: check boxes lie on the page and do not overlap
+    assert all(0 <= w['bounds'][0] < w['bounds'][2] <= 1000 for w in words)
+    assert all(0 <= w['bounds'][1] < w['bounds'][3] <= 1500 for w in words)
+    # Test case 3: check output is reproducible from the seed
+    assert words == generate_words(1000, n_pages=4, density=0.5, page_size=(1000, 1500))
+    # Test case 4: assert bad density raises error
+    with pytest.raises(ValueError):
+        generate_words(10, density=0)
+
+
+def test_perturb_words():
+    words = generate_words(2000, n_pages=2)
+    # Test case 1: check no disagreement keeps all text
+    assert [w['text'] for w in perturb_words(words, 0)] == [w['text'] for w in words]
+    # Test case 2: check disagreement rate controls the number of changed words
+    changed = sum(a != b for a, b in zip(words, perturb_words(words, 0.5)))
+    assert changed > 900
+
+
+def test_write_engine_pair(tmpdir):
+    path_1, path_2 = write_engine_pair(str(tmpdir), 500, n_pages=3, disagreement=0.2,
+                                       page_size=(600, 900), images=True)
+    # Test case 1: check outputs load as OCR engine outputs
+    ocr = OCR_Analyzer(path_1, path_2, 'engine_1', 'engine_2', sidecar=False)
+    assert len(ocr.ocr_1) == 500
+    # Test case 2: check disagreements are found
+    assert len(json.loads(ocr.compare_ocr_outputs())) > 0
+    # Test case 3: check one image per page
+    ocr.load_images(str(tmpdir))
+    assert len(ocr.images) == 3
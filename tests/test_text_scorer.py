@@ -0,0 +1,63 @@
+from text_scorer import FuzzScorer, ratio_lower_bound
+from fuzzywuzzy import fuzz
+import random
+import pytest
+
+
+def test_ratios():
+    random.seed(0)
+    words = ['the', 'The', 'of', '0', '10', '', 'tbe', 'hello', 'he11o']
+    texts_1 = [random.choice(words) for _ in range(200)]
+    texts_2 = [random.choice(words) for _ in range(200)]
+    scorer = FuzzScorer()
+    # Test case 1: check scores identical to fuzz.ratio
+    assert scorer.ratios(texts_1, texts_2).tolist() == [fuzz.ratio(a, b) for a, b in zip(texts_1, texts_2)]
+    # Test case 2: check each distinct pair scored once
+    assert scorer.misses == len(set(zip(texts_1, texts_2))) == len(scorer)
+    # Test case 3: check repeated batches served from the memo
+    scorer.ratios(texts_1, texts_2)
+    assert scorer.hits == len(scorer)
+    # Test case 4: check single string compared against each string
+    assert scorer.ratios(words, ['the']).tolist() == [fuzz.ratio(w, 'the') for w in words]
+    assert scorer.ratio('hello', 'he11o') == fuzz.ratio('hello', 'he11o')
+    assert scorer.ratios([], ['the']).tolist() == []
+    # Test case 5: assert mismatched lengths raise error
+    with pytest.raises(ValueError):
+        scorer.ratios(['a', 'b'], ['a', 'b', 'c'])
+
+
+def test_memo_bound():
+    scorer = FuzzScorer(max_size=3)
+    scorer.ratios(['a', 'b', 'c', 'd'], ['x'])
+    # Test case 1: check memo bounded by max_size
+    assert len(scorer) == 3
+    # Test case 2: check least recently used pairs evicted first
+    scorer.ratio('b', 'x')
+    scorer.ratio('e', 'x')
+    scorer.misses = 0
+    scorer.ratios(['b', 'e'], ['x'])
+    assert scorer.misses == 0
+    # Test case 3: check memo can be disabled and cleared
+    assert len(FuzzScorer(max_size=0).ratios(['a'], ['b'])) == 1
+    scorer.clear()
+    assert len(scorer) == 0
+    # Test case 4: check counters consistent when scoring from many threads
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda n: scorer.ratios(['a', 'b', str(n % 5)], ['x']), range(400)))
+    assert scorer.hits + scorer.misses == 1200
+
+
+def test_ratio_lower_bound():
+    random.seed(2)
+    for _ in range(2000):
+        text_1 = ''.join(random.choice('abc') for _ in range(random.randint(0, 12)))
+        text_2 = ''.join(random.choice('abc') for _ in range(random.randint(0, 12)))
+        # Test case 1: check bound never exceeds the fuzz ratio
+        assert ratio_lower_bound(text_1, text_2) <= fuzz.ratio(text_1, text_2)
+    # Test case 2: check common prefix and suffix bound
+    assert ratio_lower_bound('hello', 'help') == round(200 * 3 / 9)
+    assert ratio_lower_bound('cat', 'hat') == round(200 * 2 / 6)
+    # Test case 3: check no bound for long or empty strings
+    assert ratio_lower_bound('a' * 200, 'a' * 200) == 0
+    assert ratio_lower_bound('', '') == 0
@@ -0,0 +1,253 @@
+from word_store import WordStore, WordIndex
+import random
+import shutil
+import json
+import os
+import helpers
+import text_scorer
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope='module')
+def test_df():
+    """
+    Test Pandas Dataframe.
+    """
+    data = {'page': [1,1,2,2],
+            'bounds': [[1,2,3,4], [5,6,7,8], [9,1,2,3], [4,5,6,7]],
+            'text': ['testing', 'one', 'twö', 'testing']}
+    df = pd.DataFrame(data)
+    return df
+
+
+@pytest.fixture(scope='module')
+def store(test_df):
+    """
+    Test word store.
+    """
+    return WordStore.from_frame(test_df)
+
+
+def test_from_frame(store):
+    # Test case 1: check compact column types
+    assert store.bounds.dtype == np.int32 and store.bounds.shape == (4, 4)
+    assert store.pages.dtype == np.int32
+    # Test case 2: check repeated text is interned once
+    assert store.vocab == ['testing', 'one', 'twö']
+    assert store.text_ids.tolist() == [0, 1, 2, 0]
+    # Test case 3: check text read back from offset buffer
+    assert store.text.tolist() == ['testing', 'one', 'twö', 'testing']
+
+
+def test_load_json():
+    store = WordStore.load_json('tests/assets/test_1.json')
+    frame = pd.read_json('tests/assets/test_1.json')
+    # Test case 1: check all records loaded
+    assert len(store) == len(frame)
+    # Test case 2: check DataFrame view matches source records
+    assert store.frame['bounds'].tolist() == frame['bounds'].tolist()
+    assert store.frame['text'].tolist() == frame['text'].tolist()
+
+
+def test_word(store):
+    # Test case 1: check single record read back as plain values
+    assert store.word(2) == (2, [9,1,2,3], 'twö')
+
+
+def test_page_indices(store):
+    # Test case 1: check words grouped by page
+    assert store.page_indices(2).tolist() == [2, 3]
+    # Test case 2: check missing page gives no words
+    assert len(store.page_indices(3)) == 0
+
+
+def test_region_indices():
+    random.seed(0)
+    records = []
+    for _ in range(2000):
+        x, y = random.randint(0, 900), random.randint(0, 900)
+        records.append({'bounds': [x, y, x + random.randint(1, 80), y + random.randint(1, 60)],
+                        'page': random.randint(1, 3), 'text': 'w'})
+    store = WordStore.from_records(records)
+    for _ in range(100):
+        region = [random.randint(-50, 1000) for _ in range(4)]
+        page = random.randint(1, 4)
+        expected = np.flatnonzero((store.pages == page) &
+                                  helpers.in_region(store.bounds, helpers.as_region(region)))
+        # Test case 1: check region query matches a full scan
+        assert store.region_indices(page, region).tolist() == expected.tolist()
+    # Test case 2: check tall boxes found without widening the band
+    tall = WordStore.from_records(records + [{'bounds': [400, 0, 420, 1000], 'page': 1,
+                                              'text': 'figure'}])
+    assert tall.region_indices(1, (405, 900, 410, 905)).tolist()[-1] == 2000
+    assert tall._region_index[1][2] <= 60 and tall._region_index[1][3].tolist() == [2000]
+    assert tall.region_indices(1, (0, 0, 5, 5)).tolist() == \
+        store.region_indices(1, (0, 0, 5, 5)).tolist()
+    # Test case 3: check boxes touching the region edge excluded
+    edge = WordStore.from_records([{'bounds': [0, 0, 10, 10], 'page': 1, 'text': 'a'}])
+    assert edge.region_indices(1, (10, 0, 20, 10)).tolist() == []
+    assert edge.region_indices(1, (9, 9, 20, 20)).tolist() == [0]
+
+
+def test_frame(store, test_df):
+    # Test case 1: check DataFrame view matches source table
+    assert store.frame[['page', 'bounds', 'text']].values.tolist() == \
+        test_df[['page', 'bounds', 'text']].values.tolist()
+
+
+def test_helpers_on_store(store, test_df):
+    # Test case 1: check extract_page matches DataFrame version
+    assert helpers.extract_page(store, 1).frame['text'].tolist() == \
+        helpers.extract_page(test_df, 1)['text'].tolist()
+    # Test case 2: check find_boundaries matches DataFrame version
+    for word, threshold in [('testing', 100), ('testin', 90), ('tow', 60), ('x', 100)]:
+        assert helpers.find_boundaries(store, word, threshold) == \
+            helpers.find_boundaries(test_df, word, threshold)
+
+
+def test_word_index(store, test_df):
+    index = WordIndex(store)
+    # Test case 1: check exact match
+    assert index.search(2, 'testing', 100).tolist() == [3]
+    # Test case 2: check relaxed match
+    assert index.search(1, 'testin', 90).tolist() == [0]
+    # Test case 3: check no match on missing page
+    assert len(index.search(3, 'testing', 100)) == 0
+    random.seed(0)
+    words = [''.join(random.choice('abcTt') for i in range(random.randint(0, 6)))
+             for j in range(300)]
+    data = pd.DataFrame({'page': [random.randint(1, 3) for w in words],
+                         'bounds': [[i, i, i+1, i+1] for i in range(len(words))],
+                         'text': words})
+    index = WordIndex(WordStore.from_frame(data))
+    for word in words[:15] + ['', 'ab', 'tatat']:
+        for threshold in [0, 50, 75, 100]:
+            for page in [1, 2, 3]:
+                page_data = helpers.extract_page(data, page)
+                expected = helpers.find_boundaries(page_data, word, threshold)
+                # Test case 4: check index returns the same boxes as a full scan
+                assert [data['bounds'][i] for i in index.search(page, word, threshold)] == expected
+
+
+def test_save_load(store, tmp_path):
+    path = str(tmp_path / 'words.wordstore')
+    store.save(path)
+    for mmap in [True, False]:
+        loaded = WordStore.load(path, mmap=mmap)
+        # Test case 1: check arrays read back unchanged
+        assert (loaded.bounds == store.bounds).all() and loaded.bounds.dtype == np.int32
+        assert (loaded.pages == store.pages).all()
+        # Test case 2: check interned text read back unchanged
+        assert loaded.text.tolist() == store.text.tolist()
+    empty = str(tmp_path / 'empty.wordstore')
+    WordStore.from_records([]).save(empty)
+    # Test case 3: check empty store round trip
+    assert len(WordStore.load(empty)) == 0
+    # Test case 4: assert other files rejected
+    with pytest.raises(ValueError):
+        WordStore.load('tests/assets/test_1.json')
+
+
+def test_open_json(tmp_path):
+    path = str(tmp_path / 'test_1.json')
+    shutil.copy('tests/assets/test_1.json', path)
+    store = WordStore.open_json(path)
+    # Test case 1: check sidecar written on first load
+    assert os.path.exists(path + '.wordstore')
+    # Test case 2: check sidecar used on second load
+    reopened = WordStore.open_json(path)
+    assert isinstance(reopened.bounds, np.memmap)
+    assert reopened.frame.values.tolist() == store.frame.values.tolist()
+    # Test case 3: check stale sidecar ignored when JSON is newer
+    with open(path, 'w') as ocr_file:
+        json.dump([{'page': 1, 'bounds': [1, 2, 3, 4], 'text': 'new'}], ocr_file)
+    os.utime(path + '.wordstore', ns=(0, 0))
+    assert WordStore.open_json(path).text.tolist() == ['new']
+    # Test case 4: check sidecar not used when disabled
+    assert not isinstance(WordStore.open_json(path, sidecar=False).bounds, np.memmap)
+    # Test case 5: check sidecar ignored when JSON replaced by an older file
+    older = str(tmp_path / 'older.json')
+    with open(older, 'w') as ocr_file:
+        json.dump([{'page': 1, 'bounds': [1, 2, 3, 4], 'text': 'old'}], ocr_file)
+    os.utime(older, ns=(0, 0))
+    WordStore.open_json(path)
+    os.replace(older, path)
+    assert WordStore.open_json(path).text.tolist() == ['old']
+    # Test case 6: check truncated and corrupt sidecars rebuilt
+    for size in [len(b'OCRWORDS1\n') + 2, 40]:
+        with open(path + '.wordstore', 'r+b') as sidecar_file:
+            sidecar_file.truncate(size)
+        assert WordStore.open_json(path).text.tolist() == ['old']
+        assert isinstance(WordStore.open_json(path).bounds, np.memmap)
+    header = json.dumps({'source': None}).encode()
+    with open(path + '.wordstore', 'wb') as sidecar_file:
+        sidecar_file.write(b'OCRWORDS1\n' + len(header).to_bytes(4, 'little') + header)
+    assert WordStore.open_json(path).text.tolist() == ['old']
+
+
+def test_float_coordinates(tmp_path):
+    records = [{'bounds': [0, 0, 10, 10], 'page': 1, 'text': 'a'},
+               {'bounds': [0.25, 0.5, 10.75, 9.5], 'page': 1, 'text': 'b'},
+               {'bounds': [2**40, 0, 2**40 + 5, 5], 'page': 2**40, 'text': 'c'}]
+    store = WordStore.from_records(records)
+    # Test case 1: check fractional and 64-bit values stored without loss
+    assert store.bounds.dtype == np.float64 and store.pages.dtype == np.int64
+    assert [store.word(n) for n in range(3)] == \
+        [(r['page'], r['bounds'], r['text']) for r in records]
+    # Test case 2: check float stores survive a sidecar round trip
+    path = str(tmp_path / 'store.wordstore')
+    store.save(path)
+    assert WordStore.load(path).bounds.tolist() == store.bounds.tolist()
+    # Test case 3: check region queries on float boxes
+    assert store.region_indices(1, (10.6, 0, 11, 1)).tolist() == [1]
+    # Test case 4: check unscaled boxes keep their fractional coordinates
+    assert helpers.apply_transform(store.bounds[1:2], helpers.IDENTITY_TRANSFORM).tolist() == \
+        [records[1]['bounds']]
+    # Test case 5: assert unsupported coordinate and page types raise clear errors
+    with pytest.raises(ValueError, match='coordinate type: str'):
+        WordStore.from_records(records[:1] + [{'bounds': ['0', 0, 1, 1], 'page': 1, 'text': 'x'}])
+    with pytest.raises(ValueError, match='page number type: str'):
+        WordStore.from_records([{'bounds': [0, 0, 1, 1], 'page': '1', 'text': 'x'}])
+    # Test case 6: assert boxes without exactly 4 coordinates raise error
+    with pytest.raises(ValueError, match='4 coordinates, got 8'):
+        WordStore.from_records(records[:1] + [{'bounds': [0, 0, 1, 0, 1, 1, 0, 1],
+                                               'page': 1, 'text': 'x'}])
+
+
+def test_save_failure(store, tmp_path, monkeypatch):
+    path = str(tmp_path / 'test.json.wordstore')
+    def replace(source, destination):
+        raise OSError('No space left on device')
+    monkeypatch.setattr(os, 'replace', replace)
+    # Test case 1: check a failed write leaves no temporary file behind
+    with pytest.raises(OSError):
+        store.save(path)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_word_index_region(monkeypatch):
+    random.seed(1)
+    words = ['alpha', 'alpine', 'beta', 'betta', 'gamma', 'delta', 'Delta']
+    records = []
+    for n in range(3000):
+        x, y = random.randint(0, 900), random.randint(0, 900)
+        text = random.choice(words) + (str(n) if n % 3 == 0 else '')
+        records.append({'bounds': [x, y, x + 40, y + 20], 'page': 1, 'text': text})
+    store = WordStore.from_records(records)
+    index = WordIndex(store)
+    region = (100, 100, 300, 250)
+    candidates = store.region_indices(1, region)
+    scored = []
+    ratios = text_scorer.default_scorer.ratios
+    monkeypatch.setattr(text_scorer.default_scorer, 'ratios',
+                        lambda texts_1, texts_2: scored.extend(texts_1) or ratios(texts_1, texts_2))
+    for word, fuzz_threshold in [('delta', 100), ('alpha', 80), ('beta1', 60)]:
+        scored.clear()
+        found = index.search(1, word, fuzz_threshold, candidates)
+        # Test case 1: check only tokens inside the region scored
+        assert set(scored) <= set(text.lower() for text in store.text[candidates])
+        # Test case 2: check region search matches the page search within the region
+        expected = index.search(1, word, fuzz_threshold)
+        assert found.tolist() == expected[np.isin(expected, candidates)].tolist()
@@ -0,0 +1,146 @@
+"""
+Memoized text similarity scoring for compare_ocr.py
+"""
+
+from collections import OrderedDict
+import threading
+import numpy as np
+
+
+class FuzzScorer:
+    """
+    Memoized, batched fuzz.ratio scorer.
+
+    OCR text is highly repetitive, so the same string pairs are scored many
+    times over a run. Each batch is reduced to its distinct pairs, and only
+    pairs not already in the memo are scored. The memo is a least recently
+    used cache bounded by max_size pairs. Scores are identical to fuzz.ratio.
+
+    Arguments:
+    max_size (Int) -- maximum number of memoized pairs, default is 65536
+    """
+
+    def __init__(self, max_size=2**16):
+        if max_size < 0:
+            raise ValueError('Memo size must not be negative.')
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._memo)
+
+
+    def ratio(self, text_1, text_2):
+        """
+        Score one pair of strings.
+
+        Arguments:
+        text_1 (String) -- first string
+        text_2 (String) -- second string
+
+        Returns:
+        (Int) -- fuzz ratio of both strings
+        """
+
+        return int(self.ratios([text_1], [text_2])[0])
+
+
+    def ratios(self, texts_1, texts_2):
+        """
+        Score pairs of strings elementwise.
+
+        A single string on either side is compared against every string on
+        the other side.
+
+        Arguments:
+        texts_1 (List) -- first strings of each pair
+        texts_2 (List) -- second strings of each pair
+
+        Returns:
+        (np.array) -- fuzz ratio of each pair
+        """
+
+        texts_1, texts_2 = list(texts_1), list(texts_2)
+        if len(texts_1) == 1 and len(texts_2) != 1:
+            texts_1 = texts_1 * len(texts_2)
+        elif len(texts_2) == 1 and len(texts_1) != 1:
+            texts_2 = texts_2 * len(texts_1)
+        if len(texts_1) != len(texts_2):
+            raise ValueError('Text sequences must be the same length.')
+
+        pairs = list(zip(texts_1, texts_2))
+        scores = dict.fromkeys(pairs)
+        with self._lock:
+            for pair in scores:
+                if pair in self._memo:
+                    self._memo.move_to_end(pair)
+                    scores[pair] = self._memo[pair]
+            missing = [pair for pair, score in scores.items() if score is None]
+            self.hits += len(scores) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # Imported on first use, as comparisons without scoring never need it.
+            from fuzzywuzzy import fuzz
+            for pair in missing:
+                scores[pair] = fuzz.ratio(*pair)
+        if missing and self.max_size:
+            with self._lock:
+                for pair in missing[-self.max_size:]:
+                    self._memo[pair] = scores[pair]
+                while len(self._memo) > self.max_size:
+                    self._memo.popitem(last=False)
+
+        return np.array([scores[pair] for pair in pairs], dtype=np.int64)
+
+
+    def clear(self):
+        """
+        Drop all memoized scores.
+        """
+
+        with self._lock:
+            self._memo.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def ratio_lower_bound(text_1, text_2, max_length=200):
+    """
+    Cheap lower bound on the fuzz ratio of two strings.
+
+    The matching characters counted by fuzz.ratio include the longest
+    common substring, which is at least as long as the common prefix or
+    the common suffix. Strings of max_length or more characters get a bound
+    of 0, as SequenceMatcher then ignores popular characters as junk.
+
+    Arguments:
+    text_1 (String) -- first string
+    text_2 (String) -- second string
+    max_length (Int) -- length from which no bound is given, default is 200
+
+    Returns:
+    (Int) -- value the fuzz ratio of both strings is at least
+    """
+
+    total = len(text_1) + len(text_2)
+    if not total or max(len(text_1), len(text_2)) >= max_length:
+        return 0
+    shortest = min(len(text_1), len(text_2))
+    prefix = 0
+    while prefix < shortest and text_1[prefix] == text_2[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < shortest and text_1[-1 - suffix] == text_2[-1 - suffix]:
+        suffix += 1
+
+    return int(round(200 * max(prefix, suffix) / total))
+
+
+# Shared by every comparison and search in a process, so repeated pairs are
+# scored once across pages and documents.
+default_scorer = FuzzScorer()
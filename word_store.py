@@ -0,0 +1,615 @@
+"""
+Columnar word storage for compare_ocr.py
+"""
+
+from helpers import (group_pages, iter_json_records, as_boxes, as_region, in_region, float_bits,
+                     box_values)
+from text_scorer import default_scorer
+from array import array
+from collections import Counter
+import json
+import os
+import struct
+import numpy as np
+
+
+SIDECAR_SUFFIX = '.wordstore'
+SIDECAR_MAGIC = b'OCRWORDS1\n'
+SIDECAR_ARRAYS = ['bounds', 'pages', 'text_ids', 'vocab_buffer', 'vocab_offsets', 'float_bits']
+
+
+class WordStore:
+    """
+    Compact columnar store of OCR word records.
+
+    Boundary boxes and page numbers are held in int32 arrays. Boxes with
+    fractional or out of range coordinates, such as normalised or sub-pixel
+    output, are held as float64 instead, with a bitmask per word flagging
+    the coordinates given as floats so that read back words keep their
+    original number types. Word text is interned: each distinct string is
+    stored once in a UTF-8 buffer indexed by offsets, and every word refers
+    to its string by id.
+
+    Arguments:
+    bounds (np.array) -- (N, 4) int32 or float64 array of boundary boxes
+    pages (np.array) -- (N,) int32 or int64 array of page numbers
+    text_ids (np.array) -- (N,) int32 array of vocabulary ids
+    vocab_buffer (np.array) -- uint8 array of UTF-8 encoded distinct strings
+    vocab_offsets (np.array) -- (K+1,) int64 array of string offsets into vocab_buffer
+    float_bits (np.array) -- (N,) uint8 array of float coordinate bitmasks, empty
+                             unless bounds are float64
+    """
+
+    def __init__(self, bounds, pages, text_ids, vocab_buffer, vocab_offsets, float_bits=None):
+        self.bounds = bounds
+        self.float_bits = np.zeros(0, dtype=np.uint8) if float_bits is None else float_bits
+        self.pages = pages
+        self.text_ids = text_ids
+        self.vocab_buffer = vocab_buffer
+        self.vocab_offsets = vocab_offsets
+        self._vocab = None
+        self._text = None
+        self._page_index = None
+        self._region_index = {}
+        self._frame = None
+        self.source = None
+
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a store from an iterable of word records.
+
+        Records are consumed one at a time, so a streamed iterable never
+        needs to be held in memory as a whole.
+
+        Arguments:
+        records (Iterable) -- dicts with 'page', 'bounds' and 'text' fields
+
+        Returns:
+        (WordStore) -- store holding the records
+        """
+
+        bounds, pages, text_ids = array('i'), array('i'), array('i')
+        bits = None
+        vocab = {}
+        for record in records:
+            if len(record['bounds']) != 4:
+                raise ValueError('Boundary boxes must have 4 coordinates, got %d.'
+                                 % len(record['bounds']))
+            size = len(bounds)
+            try:
+                bounds.extend(record['bounds'])
+            except (TypeError, OverflowError):
+                # Hold every box as float64 from the first non-int32 coordinate on.
+                del bounds[size:]
+                bounds = widen(bounds, 'd', record['bounds'], 'coordinate')
+                if bits is None:
+                    bits = array('B', bytes(len(pages)))
+            if bits is not None:
+                bits.append(float_bits(record['bounds']))
+            try:
+                pages.append(record['page'])
+            except OverflowError:
+                pages = widen(pages, 'q', [record['page']], 'page number')
+            except TypeError:
+                raise ValueError('Unsupported page number type: %s'
+                                 % type(record['page']).__name__)
+            text_ids.append(vocab.setdefault(record['text'], len(vocab)))
+
+        bounds_dtype = np.float64 if bounds.typecode == 'd' else np.int32
+        pages_dtype = np.int64 if pages.typecode == 'q' else np.int32
+
+        return cls(np.frombuffer(bounds, dtype=bounds_dtype).reshape(-1, 4),
+                   np.frombuffer(pages, dtype=pages_dtype),
+                   np.frombuffer(text_ids, dtype=np.int32),
+                   *encode_vocab(list(vocab)),
+                   float_bits=None if bits is None else np.frombuffer(bits, dtype=np.uint8))
+
+
+    @classmethod
+    def from_frame(cls, table):
+        """
+        Build a store from a table of word records.
+
+        Arguments:
+        table (pd.DataFrame) -- table containing page, bounds and text fields
+
+        Returns:
+        (WordStore) -- store holding the table's records
+        """
+
+        return cls.from_records(table[['page', 'bounds', 'text']].to_dict('records'))
+
+
+    @classmethod
+    def load_json(cls, path):
+        """
+        Build a store from an OCR JSON file, parsing one record at a time.
+
+        Arguments:
+        path (String) -- path to OCR JSON file
+
+        Returns:
+        (WordStore) -- store holding the file's records
+        """
+
+        with open(path) as ocr_file:
+            return cls.from_records(iter_json_records(ocr_file))
+
+
+    @classmethod
+    def open_json(cls, path, sidecar=True):
+        """
+        Load an OCR JSON file through its binary sidecar file.
+
+        The sidecar ('<path>.wordstore') records the size, modification time
+        and inode of the JSON file it was built from, and is only used when
+        all three still match exactly; otherwise, or if the sidecar can not
+        be read, the JSON is parsed and a new sidecar is written. Failure to
+        write the sidecar, e.g. in a read-only directory, is ignored.
+
+        Arguments:
+        path (String) -- path to OCR JSON file
+        sidecar (Bool) -- read and write the sidecar file, default is True
+
+        Returns:
+        (WordStore) -- store holding the file's records
+        """
+
+        if not sidecar:
+            return cls.load_json(path)
+        sidecar_path = path + SIDECAR_SUFFIX
+        source = file_signature(path)
+        try:
+            store = cls.load(sidecar_path)
+            if store.source == source:
+                return store
+        except (OSError, ValueError, KeyError, struct.error):
+            pass
+        store = cls.load_json(path)
+        try:
+            store.save(sidecar_path, source)
+        except OSError:
+            pass
+
+        return store
+
+
+    def save(self, path, source=None):
+        """
+        Write the store to a binary file that can be memory-mapped.
+
+        The file holds a small JSON header followed by each raw array,
+        aligned to 64 bytes. It is written to a temporary name and renamed
+        into place; the temporary file is removed if writing fails.
+
+        Arguments:
+        path (String) -- output path
+        source (List) -- optional file_signature of the file the store was read from
+        """
+
+        arrays = [np.ascontiguousarray(getattr(self, name)) for name in SIDECAR_ARRAYS]
+        header, offset = {'source': source}, 0
+        for name, data in zip(SIDECAR_ARRAYS, arrays):
+            header[name] = [data.dtype.str, list(data.shape), offset]
+            offset += -(-data.nbytes // 64) * 64
+        offsets = [header[name][2] for name in SIDECAR_ARRAYS]
+        header = json.dumps(header).encode('utf-8')
+        start = -(-(len(SIDECAR_MAGIC) + 4 + len(header)) // 64) * 64
+
+        temp_path = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            with open(temp_path, 'wb') as sidecar_file:
+                sidecar_file.write(SIDECAR_MAGIC + struct.pack('<I', len(header)) + header)
+                for array_offset, data in zip(offsets, arrays):
+                    sidecar_file.seek(start + array_offset)
+                    sidecar_file.write(data.tobytes())
+                sidecar_file.truncate(start + offset)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Read a store written by save().
+
+        Arrays are memory-mapped read-only by default, so opening is
+        near-instant and pages are shared between processes through the
+        OS page cache. The signature of the file the store was built from,
+        if saved, is kept in the source attribute.
+
+        Arguments:
+        path (String) -- path to store file
+        mmap (Bool) -- memory-map the arrays rather than reading them, default is True
+
+        Returns:
+        (WordStore) -- store held in the file
+        """
+
+        with open(path, 'rb') as sidecar_file:
+            if sidecar_file.read(len(SIDECAR_MAGIC)) != SIDECAR_MAGIC:
+                raise ValueError('Not a word store file.')
+            header_size, = struct.unpack('<I', sidecar_file.read(4))
+            header = json.loads(sidecar_file.read(header_size).decode('utf-8'))
+        start = -(-(len(SIDECAR_MAGIC) + 4 + header_size) // 64) * 64
+
+        arrays = []
+        for name in SIDECAR_ARRAYS:
+            if name == 'float_bits' and name not in header:
+                # Sidecars written before float coordinates were supported.
+                arrays.append(None)
+                continue
+            dtype, shape, offset = header[name]
+            size = int(np.prod(shape))
+            if size == 0:
+                arrays.append(np.empty(shape, dtype=dtype))
+            elif mmap:
+                arrays.append(np.memmap(path, dtype=dtype, mode='r',
+                                        offset=start + offset, shape=tuple(shape)))
+            else:
+                arrays.append(np.fromfile(path, dtype=dtype, count=size,
+                                          offset=start + offset).reshape(shape))
+
+        store = cls(*arrays)
+        store.source = header.get('source')
+
+        return store
+
+
+    def __len__(self):
+        return len(self.pages)
+
+
+    @property
+    def vocab(self):
+        """
+        (List) -- distinct strings, indexed by text id
+        """
+
+        if self._vocab is None:
+            buffer = self.vocab_buffer.tobytes()
+            offsets = self.vocab_offsets.tolist()
+            self._vocab = [buffer[start:end].decode('utf-8')
+                           for start, end in zip(offsets[:-1], offsets[1:])]
+        return self._vocab
+
+
+    @property
+    def text(self):
+        """
+        (np.array) -- (N,) object array with the text of every word
+        """
+
+        if self._text is None:
+            self._text = np.array(self.vocab, dtype=object)[self.text_ids]
+        return self._text
+
+
+    @property
+    def page_index(self):
+        """
+        (Dict) -- mapping of page number to ascending array of word indices
+        """
+
+        if self._page_index is None:
+            self._page_index = group_pages(self.pages)
+        return self._page_index
+
+
+    def page_indices(self, page):
+        """
+        Find the words on a page.
+
+        Arguments:
+        page (Int) -- page value
+
+        Returns:
+        (np.array) -- ascending array of word indices
+        """
+
+        return self.page_index.get(page, np.empty(0, dtype=np.intp))
+
+
+    def region_indices(self, page, region):
+        """
+        Find the words on a page overlapping a rectangular region.
+
+        Each page is indexed on first use by sorting its words by top edge,
+        so a query only inspects the band of words whose top edge lies
+        within the tallest word height above the region, down to its bottom.
+        Boxes more than four times the median height, such as figures or
+        vertical text, are kept out of the band and tested on every query,
+        so they do not widen the band to the whole page.
+
+        Arguments:
+        page (Int) -- page value
+        region (Tuple) -- (x1, y1, x2, y2) corners of the region
+
+        Returns:
+        (np.array) -- ascending array of word indices
+        """
+
+        x1, y1, x2, y2 = as_region(region)
+        if page not in self._region_index:
+            indices = self.page_indices(page)
+            boxes = as_boxes(self.bounds[indices])
+            heights = boxes[:, 3] - boxes[:, 1]
+            tall = heights > 4 * max(np.median(heights), 1) if len(heights) else heights > 0
+            order = np.argsort(boxes[~tall, 1], kind='stable')
+            height = max(heights[~tall].max(initial=0), 0)
+            self._region_index[page] = (indices[~tall][order], boxes[~tall][order, 1], height,
+                                        indices[tall])
+        indices, tops, height, tall = self._region_index[page]
+
+        start = np.searchsorted(tops, y1 - height, side='right')
+        stop = np.searchsorted(tops, y2, side='left')
+        band = np.concatenate([indices[start:stop], tall])
+
+        return np.sort(band[in_region(self.bounds[band], (x1, y1, x2, y2))])
+
+
+    def word(self, index):
+        """
+        Read back a single word record.
+
+        Arguments:
+        index (Int) -- word index
+
+        Returns:
+        (Tuple) -- (page, bounds, text) with bounds as a list of ints, or of floats
+                   where the source gave floats
+        """
+
+        bounds = self.bounds[index].tolist()
+        if len(self.float_bits):
+            bounds = box_values(bounds, int(self.float_bits[index]))
+
+        return (int(self.pages[index]),
+                bounds,
+                self.vocab[self.text_ids[index]])
+
+
+    def take(self, indices):
+        """
+        Select a subset of words, sharing the vocabulary.
+
+        Arguments:
+        indices (np.array) -- word indices or boolean mask
+
+        Returns:
+        (WordStore) -- store holding the selected words
+        """
+
+        store = WordStore(self.bounds[indices], self.pages[indices], self.text_ids[indices],
+                          self.vocab_buffer, self.vocab_offsets,
+                          self.float_bits[indices] if len(self.float_bits) else None)
+        store._vocab = self._vocab
+
+        return store
+
+
+    def with_bounds(self, bounds):
+        """
+        Copy of the store with replaced boundary boxes.
+
+        Arguments:
+        bounds (np.array) -- (N, 4) array of boundary boxes
+
+        Returns:
+        (WordStore) -- store sharing pages and text with this store
+        """
+
+        store = WordStore(np.asarray(bounds, dtype=np.int32), self.pages, self.text_ids,
+                          self.vocab_buffer, self.vocab_offsets)
+        store._vocab, store._text, store._page_index = self._vocab, self._text, self._page_index
+
+        return store
+
+
+    @property
+    def frame(self):
+        """
+        (pd.DataFrame) -- cached table view of the store, with bounds held as lists
+        """
+
+        if self._frame is None:
+            import pandas as pd
+            bounds = self.bounds.tolist()
+            if len(self.float_bits):
+                bounds = [box_values(box, bits)
+                          for box, bits in zip(bounds, self.float_bits.tolist())]
+            self._frame = pd.DataFrame({'bounds': bounds,
+                                        'page': self.pages.astype(np.int64),
+                                        'text': self.text.tolist()})
+        return self._frame
+
+
+def file_signature(path):
+    """
+    Identify the current contents of a file by its metadata.
+
+    Arguments:
+    path (String) -- path to file
+
+    Returns:
+    (List) -- size, modification time in nanoseconds and inode of the file
+    """
+
+    stat = os.stat(path)
+
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def widen(values, typecode, extra, name):
+    """
+    Copy an array.array to a wider type and append more values.
+
+    Arguments:
+    values (array) -- values read so far
+    typecode (String) -- array type code to widen to
+    extra (List) -- values to append
+    name (String) -- name of the values, used in errors
+
+    Returns:
+    (array) -- widened array holding every value
+    """
+
+    try:
+        widened = array(typecode, values)
+        widened.extend(extra)
+    except (TypeError, OverflowError):
+        types = set()
+        for value in extra:
+            try:
+                array(typecode, [value])
+            except (TypeError, OverflowError):
+                types.add(type(value).__name__)
+        raise ValueError('Unsupported %s type: %s' % (name, ', '.join(sorted(types))))
+
+    return widened
+
+
+def encode_vocab(strings):
+    """
+    Encode distinct strings into a UTF-8 buffer with offsets.
+
+    Arguments:
+    strings (List) -- distinct strings
+
+    Returns:
+    vocab_buffer (np.array) -- uint8 array of the encoded strings
+    vocab_offsets (np.array) -- (K+1,) int64 array of string offsets
+    """
+
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+class WordIndex:
+    """
+    Fuzzy search index over the words of a store.
+
+    Word text is lowercased once into token ids, with a hash lookup for
+    exact matches, and each page keeps its distinct token ids. A search
+    bounds the fuzz ratio of every distinct token from its length in one
+    array operation, then only scores tokens whose length, and then whose
+    character counts, allow a fuzz ratio at or above the threshold. Pages
+    are indexed on first search.
+
+    Arguments:
+    store (WordStore) -- words to index
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.token_ids = {}
+        self.lower_ids = np.array([self.token_ids.setdefault(text.lower(), len(self.token_ids))
+                                   for text in store.vocab], dtype=np.int32)
+        self.tokens = list(self.token_ids)
+        self.lengths = np.array([len(token) for token in self.tokens], dtype=np.int64)
+        self._pages = {}
+
+
+    def _distinct(self, indices):
+        """
+        Reduce words to their distinct lowercased tokens.
+
+        Arguments:
+        indices (np.array) -- word indices
+
+        Returns:
+        unique (np.array) -- ascending array of distinct token ids
+        inverse (np.array) -- position in unique of each word's token
+        """
+
+        unique, inverse = np.unique(self.lower_ids[self.store.text_ids[indices]],
+                                    return_inverse=True)
+        return unique, inverse.reshape(-1)
+
+
+    def _page(self, page):
+        """
+        Index the distinct tokens of a page.
+        """
+
+        if page not in self._pages:
+            indices = self.store.page_indices(page)
+            self._pages[page] = (indices,) + self._distinct(indices)
+        return self._pages[page]
+
+
+    def _match_tokens(self, unique, word, fuzz_threshold):
+        """
+        Score distinct tokens against a search word.
+
+        Arguments:
+        unique (np.array) -- distinct token ids
+        word (String) -- search word
+        fuzz_threshold (Int) -- accepted closeness between string values
+
+        Returns:
+        (np.array) -- boolean mask of the tokens matching the search word
+        """
+
+        hits = unique == self.token_ids.get(word, -1)
+
+        # fuzz.ratio is at most 2 * min(len_a, len_b) / (len_a + len_b).
+        lengths = self.lengths[unique]
+        n = len(word)
+        total = np.maximum(lengths + n, 1)
+        bound = np.round(100 * (2 * np.minimum(lengths, n) / total))
+        bound[(lengths == 0) | (n == 0)] = 0
+        candidates = np.flatnonzero((bound >= fuzz_threshold) & ~hits)
+
+        if len(candidates):
+            word_counts = Counter(word)
+            scored = []
+            for position in candidates.tolist():
+                token = self.tokens[unique[position]]
+                # Matching characters are at most the shared character counts.
+                common = sum(min(count, word_counts[char])
+                             for char, count in Counter(token).items())
+                if int(round(100 * (2 * common / (len(token) + n)))) >= fuzz_threshold:
+                    scored.append(position)
+            if scored:
+                tokens = [self.tokens[unique[position]] for position in scored]
+                hits[scored] = default_scorer.ratios(tokens, [word]) >= fuzz_threshold
+
+        return hits
+
+
+    def search(self, page, word, fuzz_threshold, indices=None):
+        """
+        Find the words on a page matching a search word.
+
+        Gives the same matches as helpers.find_boundaries, comparing each
+        lowercased word against the search word with fuzz.ratio. Searching
+        given words, such as those of a region, only scores their tokens.
+
+        Arguments:
+        page (Int) -- page to search
+        word (String) -- search word
+        fuzz_threshold (Int) -- accepted closeness between string values
+        indices (np.array) -- optional ascending word indices of the page to search
+
+        Returns:
+        (np.array) -- ascending array of matching word indices
+        """
+
+        if indices is None:
+            indices, unique, inverse = self._page(page)
+        else:
+            unique, inverse = self._distinct(indices)
+        hits = self._match_tokens(unique, word, fuzz_threshold)
+
+        return indices[hits[inverse]]